@@ -6,12 +6,14 @@
 """This file starts the application."""
 import datetime
 import os
+import re
+import threading
+import time
 
 from threading import Thread
 
-import jwt
 import uvicorn
-from fastapi import FastAPI, HTTPException, Security, Depends
+from fastapi import FastAPI, HTTPException, Security, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security.api_key import APIKeyCookie, APIKeyHeader, APIKey
 from pydantic import BaseModel
@@ -19,10 +21,18 @@ from pydantic import BaseModel
 from lifecycle_manager.api_customization import FASTAPI_TITLE, FASTAPI_DESCRIPTION, ORIGINS
 from lifecycle_manager.api_customization import FASTAPI_VERSION, FASTAPI_DOCS_URL, FASTAPI_ROOT_PATH
 from lifecycle_manager.api_customization import API_KEY, SECRET
+from lifecycle_manager.client.session_pool import get_session_pool
+from lifecycle_manager.client.trial_cache import get_trial_cache
+from lifecycle_manager.config.services import Settings
+from lifecycle_manager.executor.failure_reports import get_failure_sink
 from lifecycle_manager.run_scheduler import RunScheduler
+from lifecycle_manager.utils.metrics import REGISTRY, CONTENT_TYPE, Gauge
+from lifecycle_manager.utils.token_store import TokenStore
+from lifecycle_manager.utils.tracing import TRACER
 
 root_dir = os.path.dirname(os.path.abspath(__file__))
-TOKENS = []
+TOKENS = TokenStore(SECRET, Settings().callback_token_ttl, Settings().callback_token_sweep_interval)
+TRACED_PATH = re.compile(r'/trial/(?P<trial_id>[^/]+)/(?P<name>callback/\w+|active|finish)$')
 API_KEY_NAME = "Authorization"
 _apikey_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 _apikey_cookie = APIKeyCookie(name=API_KEY_NAME, auto_error=False)
@@ -33,6 +43,41 @@ app = FastAPI(title=FASTAPI_TITLE,
               docs_url=FASTAPI_DOCS_URL,
               root_path=FASTAPI_ROOT_PATH)
 
+
+class CallbackTraceMiddleware:
+    """ASGI middleware recording trace spans of callbacks and trial commands.
+
+    Only authenticated requests of trials with an engine are recorded, so that requests for made-up trial IDs can't
+    evict the traces of running trials.
+    """
+
+    def __init__(self, app):  # pylint: disable=W0621
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        match = TRACED_PATH.search(scope["path"]) if scope["type"] == "http" else None
+        if match is None:
+            await self.app(scope, receive, send)
+            return
+        response = {"status": None}
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            await send(message)
+
+        start = time.time()
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            trial_id = match.group('trial_id')
+            if response["status"] != 401 and run_scheduler.get_executor_engine_instance(trial_id) is not None:
+                TRACER.record(trial_id, 'callback', start, time.monotonic() - started,
+                              path=match.group('name'), status=response["status"])
+
+
+app.add_middleware(CallbackTraceMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ORIGINS,
@@ -44,22 +89,28 @@ app.add_middleware(
 run_scheduler = RunScheduler()
 
 
+def count_engines_by_status():
+    """Return number of engine instances by status for the lcm_engines gauge."""
+    return {(status,): count for status, count in run_scheduler.count_executor_engine_instances().items()}
+
+
+REGISTRY.register(Gauge('lcm_engines', 'Executor engine instances by status.', ('status',), count_engines_by_status))
+REGISTRY.register(Gauge('lcm_trial_reads_coalesced', 'trial_repository reads served by a concurrent identical read.',
+                        (), lambda: {(): get_trial_cache(Settings().trial_cache_ttl).stats()["coalesced"]}))
+REGISTRY.register(Gauge('lcm_callback_tokens', 'Callback tokens accepted by LCM.', (), lambda: {(): len(TOKENS)}))
+REGISTRY.register(Gauge('lcm_threads', 'Threads of the LCM process.', (), lambda: {(): threading.active_count()}))
+
+
 class TrialItem(BaseModel):
     """Class model for schedule_trial_with_trial_id_and_start_time request body."""
     trial_id: str
     start_time: str
+    priority: int = 0
 
 
-def create_token_with_id(secret: str, trial_id: str):
-    """Create jwt token for engine callbacks."""
-    key = jwt.encode({"trial_id": trial_id}, secret, "HS256").decode('utf-8')
-    return key
-
-
-def decode_token(secret: str, token, trial_id):
-    """Decode token"""
-    token_trial_id = jwt.decode(token, secret, algorithms=['HS256'])["trial_id"]
-    if str(token_trial_id) == str(trial_id):
+def check_token(token, trial_id):
+    """Test that token was issued for trial_id. The token was verified when it was issued or recovered."""
+    if TOKENS.validate(token) == str(trial_id):
         return
     raise HTTPException(
         status_code=401, detail="Unauthorized")
@@ -67,12 +118,9 @@ def decode_token(secret: str, token, trial_id):
 
 def engine_valid(trial_id: str):
     """Test that engine is still relevant"""
-    engines = run_scheduler.get_executor_engine_instances()
-    for engine in engines:
-        if engine.id == trial_id:
-            if not engine.finished and not engine.failed:
-                return
-            break
+    engine = run_scheduler.get_executor_engine_instance(trial_id)
+    if engine is not None and not engine.finished and not engine.failed:
+        return
     raise HTTPException(
         status_code=403, detail="Unauthorized")
 
@@ -90,11 +138,10 @@ async def get_key(apikey_header: str = Security(_apikey_header), apikey_cookie:
 async def get_key_callback(apikey_header: str = Security(_apikey_header),
                            apikey_cookie: str = Security(_apikey_cookie)):
     """Get token from headers or cookies."""
-    for key in TOKENS:
-        if str(apikey_header) == str(key):
-            return apikey_header
-        if apikey_cookie == str(key):
-            return apikey_cookie
+    if apikey_header is not None and TOKENS.validate(apikey_header) is not None:
+        return apikey_header
+    if apikey_cookie is not None and TOKENS.validate(apikey_cookie) is not None:
+        return apikey_cookie
     raise HTTPException(
         status_code=401, detail="Unauthorized")
 
@@ -107,9 +154,17 @@ def get_message_from_status_page(api_key: APIKey = Depends(get_key)):
             "Automatic_scheduling": run_scheduler.get_automatic_scheduling(),
             "scheduled_trials": str(run_scheduler.get_scheduled_jobs()),
             "Executor_Engine_instances": str(run_scheduler.get_executor_engine_instance_statuses()),
+            "Admission": run_scheduler.get_admission_stats(),
+            "Circuit_breakers": run_scheduler.get_circuit_breakers(),
             "Heartbeat_instances": str(run_scheduler.get_heartbeat_instances())}
 
 
+@app.get('/metrics', tags=["Status"])
+def get_metrics():
+    """Metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.post('/trial/scheduling', tags=["Status"])
 def toggle_automatic_scheduling(api_key: APIKey = Depends(get_key)):
     """Toggle automatic scheduling on/off"""
@@ -120,113 +175,104 @@ def toggle_automatic_scheduling(api_key: APIKey = Depends(get_key)):
 @app.post('/trial/{trial_id}/callback/slice', tags=["Trial Callback"])
 def post_callback_slice(trial_id: str, api_key: APIKey = Depends(get_key_callback)):
     """Callback from trialenforcement, to advance the execution."""
-    decode_token(SECRET, api_key, trial_id)
-    engines = run_scheduler.get_executor_engine_instances()
-    for engine in engines:
-        if engine.id == trial_id:
-            if not engine.executor.get_slice_created:
-                engine.executor.add_response('SliceCallback', 200)
-                engine.executor.set_slice_created()
-                if engine.set_executor_state('UpdateDeploymentSlice'):
-                    return {"message": "State change registered"}
-            else:
-                engine.executor.add_response('SliceDeleteCallback', 200)
-                if engine.set_executor_state('UpdateStatusFinish'):
-                    return {"message": "State change registered"}
-            raise HTTPException(status_code=400, detail="Executor not ready for state change.")
-    raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    check_token(api_key, trial_id)
+    engine = run_scheduler.get_executor_engine_instance(trial_id)
+    if engine is None:
+        raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    if not engine.executor.get_slice_created:
+        engine.executor.add_response('SliceCallback', 200)
+        engine.executor.set_slice_created()
+        if engine.set_executor_state('UpdateDeploymentSlice'):
+            return {"message": "State change registered"}
+    else:
+        engine.executor.add_response('SliceDeleteCallback', 200)
+        if engine.set_executor_state('UpdateStatusFinish'):
+            return {"message": "State change registered"}
+    raise HTTPException(status_code=400, detail="Executor not ready for state change.")
 
 
 @app.post('/trial/{trial_id}/callback/cloudvnfboarding',
           tags=["Trial Callback"])
 def post_callback_cloudvnfboarding(trial_id: str, api_key: APIKey = Depends(get_key_callback)):
     """Callback from trialenforcement, to advance the execution."""
-    decode_token(SECRET, api_key, trial_id)
-    engines = run_scheduler.get_executor_engine_instances()
-    for engine in engines:
-        if engine.id == trial_id:
-            if engine.set_executor_state('UpdateCloudVnfBoardingStatus'):
-                return {"message": "State change registered"}
-            raise HTTPException(status_code=400, detail="Executor not ready for state change.")
-    raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    check_token(api_key, trial_id)
+    engine = run_scheduler.get_executor_engine_instance(trial_id)
+    if engine is None:
+        raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    if engine.set_executor_state('UpdateCloudVnfBoardingStatus'):
+        return {"message": "State change registered"}
+    raise HTTPException(status_code=400, detail="Executor not ready for state change.")
 
 
 @app.post('/trial/{trial_id}/callback/cloudvnfdeployment', tags=["Trial Callback"])
 def post_callback_cloudvnfdeployment(trial_id: str, api_key: APIKey = Depends(get_key_callback)):
     """Callback from trialenforcement, to advance the execution."""
-    decode_token(SECRET, api_key, trial_id)
-    engines = run_scheduler.get_executor_engine_instances()
-    for engine in engines:
-        if engine.id == trial_id:
-            if engine.set_executor_state('UpdateCloudVnfDeploymentStatus'):
-                return {"message": "State change registered"}
-            raise HTTPException(status_code=400, detail="Executor not ready for state change.")
-    raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    check_token(api_key, trial_id)
+    engine = run_scheduler.get_executor_engine_instance(trial_id)
+    if engine is None:
+        raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    if engine.set_executor_state('UpdateCloudVnfDeploymentStatus'):
+        return {"message": "State change registered"}
+    raise HTTPException(status_code=400, detail="Executor not ready for state change.")
 
 
 @app.post('/trial/{trial_id}/callback/edgevnfonboarding', tags=["Trial Callback"])
 def post_callback_edgevnfonboarding(trial_id: str, api_key: APIKey = Depends(get_key_callback)):
     """Callback from trialenforcement, to advance the execution."""
-    decode_token(SECRET, api_key, trial_id)
-    engines = run_scheduler.get_executor_engine_instances()
-    for engine in engines:
-        if engine.id == trial_id:
-            if engine.set_executor_state('UpdateEdgeVnfBoardingStatus'):
-                return {"message": "State change registered"}
-            raise HTTPException(status_code=400, detail="Executor not ready for state change.")
-    raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    check_token(api_key, trial_id)
+    engine = run_scheduler.get_executor_engine_instance(trial_id)
+    if engine is None:
+        raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    if engine.set_executor_state('UpdateEdgeVnfBoardingStatus'):
+        return {"message": "State change registered"}
+    raise HTTPException(status_code=400, detail="Executor not ready for state change.")
 
 
 @app.post('/trial/{trial_id}/callback/edgevnfdeployment', tags=["Trial Callback"])
 def post_callback_edgevnfdeployment(trial_id: str, api_key: APIKey = Depends(get_key_callback)):
     """Callback from trialenforcement, to advance the execution."""
-    decode_token(SECRET, api_key, trial_id)
-    engines = run_scheduler.get_executor_engine_instances()
-    for engine in engines:
-        if engine.id == trial_id:
-            if engine.set_executor_state('UpdateEdgeVnfDeploymentStatus'):
-                return {"message": "State change registered"}
-            raise HTTPException(status_code=400, detail="Executor not ready for state change.")
-    raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    check_token(api_key, trial_id)
+    engine = run_scheduler.get_executor_engine_instance(trial_id)
+    if engine is None:
+        raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    if engine.set_executor_state('UpdateEdgeVnfDeploymentStatus'):
+        return {"message": "State change registered"}
+    raise HTTPException(status_code=400, detail="Executor not ready for state change.")
 
 
 @app.post('/trial/{trial_id}/active', tags=["Trial"])
 def post_trial_kpi_status(trial_id: str, api_key: APIKey = Depends(get_key)):
     """Receive status message and forward it to executor."""
-    engines = run_scheduler.get_executor_engine_instances()
-    for engine in engines:
-        if engine.id == trial_id:
-            if engine.executor.get_kpi_status == "Idle":
-                if engine.set_executor_state("SendKpiActive"):
-                    return {"message": "State change registered"}
-                raise HTTPException(status_code=400, detail="Executor not ready for state change.")
-            raise HTTPException(status_code=400, detail="Current label not Idle. Can't mark KPI's as Active.")
-
-    raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    engine = run_scheduler.get_executor_engine_instance(trial_id)
+    if engine is None:
+        raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    if engine.executor.get_kpi_status == "Idle":
+        if engine.set_executor_state("SendKpiActive"):
+            return {"message": "State change registered"}
+        raise HTTPException(status_code=400, detail="Executor not ready for state change.")
+    raise HTTPException(status_code=400, detail="Current label not Idle. Can't mark KPI's as Active.")
 
 
 @app.post('/trial/{trial_id}/finish', tags=["Trial"])
 def post_data_finish(trial_id: str, api_key: APIKey = Depends(get_key)):
     """Receive finish request and forward it to executor."""
-    engines = run_scheduler.get_executor_engine_instances()
-    for engine in engines:
-        if engine.id == trial_id:
-            if engine.set_executor_state_force('UpdateStatusStopping'):
-                return {"message": "State change registered"}
-            raise HTTPException(status_code=400, detail="Executor not ready for state change.")
-    raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    engine = run_scheduler.get_executor_engine_instance(trial_id)
+    if engine is None:
+        raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    if engine.set_executor_state_force('UpdateStatusStopping'):
+        return {"message": "State change registered"}
+    raise HTTPException(status_code=400, detail="Executor not ready for state change.")
 
 
 @app.get('/trial/{trial_id}/status', tags=["Trial"])
 def get_engine_state(trial_id: str, api_key: APIKey = Depends(get_key)):
     """Get executor status and state."""
-    engines = run_scheduler.get_executor_engine_instances()
-    for engine in engines:
-        if engine.id == trial_id:
-            status = engine.get_executor_status()
-            state = engine.get_executor_state()
-            return {"message": "Status: " + status + " State: " + state}
-    raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    engine = run_scheduler.get_executor_engine_instance(trial_id)
+    if engine is None:
+        raise HTTPException(status_code=400, detail="Engine with requested ID does not exist")
+    status = engine.get_executor_status()
+    state = engine.get_executor_state()
+    return {"message": "Status: " + status + " State: " + state}
 
 
 @app.post('/debug/trial/schedule-all', tags=['Debug/Trial scheduling'])
@@ -260,14 +306,12 @@ def schedule_trial_with_trial_id_and_start_time(trial: TrialItem, api_key: APIKe
             from date_format_exception
 
     # Check that an Engine instance with the given trial ID does not already exist
-    current_engine_instances = run_scheduler.get_executor_engine_instances()
-    for engine in current_engine_instances:
-        if engine.id == trial.trial_id:
-            raise HTTPException(status_code=400,
-                                detail="Executor Engine with ID: {} already exists.".format(trial.trial_id))
+    if run_scheduler.get_executor_engine_instance(trial.trial_id) is not None:
+        raise HTTPException(status_code=400,
+                            detail="Executor Engine with ID: {} already exists.".format(trial.trial_id))
 
     # Try and add as a scheduled job
-    if run_scheduler.add_new_job(trial.start_time, trial.trial_id):
+    if run_scheduler.add_new_job(trial.start_time, trial.trial_id, trial.priority):
         return {"message": "Trial scheduling added with trial ID: {}".format(trial.trial_id)}
     raise HTTPException(status_code=400, detail="Trial scheduling with ID: {} already exists.".format(trial.trial_id))
 
@@ -283,24 +327,20 @@ def delete_scheduled_trial(trial_id: str, api_key: APIKey = Depends(get_key)):
 @app.delete('/debug/engine/{trial_id}', tags=['Debug/Trial execution'])
 def delete_engine_instance(trial_id: str, api_key: APIKey = Depends(get_key)):
     """Remove an existing Engine instance."""
-    current_engine_instances = run_scheduler.get_executor_engine_instances()
-    for engine in current_engine_instances:
-        if engine.id == trial_id:
-            if run_scheduler.remove_engine_instance(trial_id=trial_id):
-                return {"message": "Engine instance removed with trial ID: {}".format(trial_id)}
+    if run_scheduler.get_executor_engine_instance(trial_id) is not None:
+        if run_scheduler.remove_engine_instance(trial_id=trial_id):
+            return {"message": "Engine instance removed with trial ID: {}".format(trial_id)}
     raise HTTPException(status_code=400, detail="Engine instance with trial ID: {} does not exist.".format(trial_id))
 
 
 @app.post('/debug/engine/{trial_id}/restore', tags=['Debug/Trial execution'])
 def restore_engine_instance(trial_id: str, api_key: APIKey = Depends(get_key)):
     """Restore an Engine instance."""
-    current_engine_instances = run_scheduler.get_executor_engine_instances()
-    for instance in current_engine_instances:
-        if instance.id == trial_id:
-            if run_scheduler.restore_engine_instance(trial_id):
-                return {"message: Engine instance restored for trial ID: {}".format(trial_id)}
-            raise HTTPException(status_code=500,
-                                detail="Failed to restore the Engine instance with ID: {}".format(trial_id))
+    if run_scheduler.get_executor_engine_instance(trial_id) is not None:
+        if run_scheduler.restore_engine_instance(trial_id):
+            return {"message: Engine instance restored for trial ID: {}".format(trial_id)}
+        raise HTTPException(status_code=500,
+                            detail="Failed to restore the Engine instance with ID: {}".format(trial_id))
     raise HTTPException(status_code=404,
                         detail="Engine instance with trial ID: {} does not exist.".format(trial_id))
 
@@ -323,32 +363,66 @@ def delete_heartbeat_instance(trial_id: str, api_key: APIKey = Depends(get_key))
     raise HTTPException(status_code=400, detail="Heartbeat instance with trial ID: {} does not exist.".format(trial_id))
 
 
+@app.get('/debug/http-sessions', tags=['Debug/HTTP'])
+def get_http_session_statistics(api_key: APIKey = Depends(get_key)):
+    """Get connection reuse statistics of the pooled HTTP sessions."""
+    return get_session_pool().stats()
+
+
+@app.get('/debug/failures', tags=['Debug/Trial execution'])
+def get_failure_reports(limit: int = 20, trial_id: str = None, api_key: APIKey = Depends(get_key)):
+    """Get latest executor failure reports, newest first."""
+    return get_failure_sink(Settings().failure_reports).recent(limit, trial_id)
+
+
+@app.get('/debug/trace/{trial_id}', tags=['Debug/Trial execution'])
+def get_trial_trace(trial_id: str, otlp: bool = False, export: bool = False, api_key: APIKey = Depends(get_key)):
+    """Get trace spans of a trial as a timeline, or in the OTLP JSON format. export writes the OTLP file."""
+    if trial_id not in TRACER.trials():
+        raise HTTPException(status_code=404, detail="No trace for trial ID: {}".format(trial_id))
+    if export:
+        path = TRACER.export_otlp(trial_id, os.path.join(Settings().trace_dir, 'trial_{}.otlp.json'.format(trial_id)))
+        return {"message": "Trace exported to: {}".format(path)}
+    if otlp:
+        return TRACER.to_otlp(trial_id)
+    return TRACER.timeline(trial_id)
+
+
 @app.post('/token/{trial_id}', tags=['Token'])
 def post_token(trial_id: str, api_key: APIKey = Depends(get_key)):
     """Create token for callbacks."""
-    token = create_token_with_id(SECRET, trial_id)
-    TOKENS.append(token)
+    token = TOKENS.issue(trial_id)
     return {"Authorization": str(token)}
 
 
 @app.delete('/token/{trial_id}', tags=['Token'])
 def delete_token(trial_id: str, api_key: APIKey = Depends(get_key_callback)):
     """Delete token from LCM"""
-    TOKENS.remove(api_key)
+    check_token(api_key, trial_id)
+    TOKENS.revoke(api_key)
     return {"message": "Success"}
 
 
 @app.get('/token/{trial_id}', tags=['Token'])
 def test_token(trial_id: str, api_key: APIKey = Depends(get_key_callback)):
     """Test endpoint for token auth."""
-    decode_token(SECRET, api_key, trial_id)
+    check_token(api_key, trial_id)
     return {"message": "Success"}
 
 
+def recover_engines():
+    """Recreate engines of the previous run from checkpoints and accept callbacks with their tokens."""
+    for engine in run_scheduler.recover_engine_instances():
+        token = engine.executor.get_token
+        if token is not None and token not in TOKENS:
+            TOKENS.add(token)
+
+
 if __name__ == "__main__":
     run_scheduler.set_logging()
     run_scheduler_handler_thread = Thread(target=run_scheduler.run_scheduler())
     run_scheduler_handler_thread.start()
+    recover_engines()
     run_heartbeat_handler_thread = Thread(target=run_scheduler.run_heartbeat_handler())
     run_heartbeat_handler_thread.start()
     uvicorn.run(app, host="0.0.0.0", port=5000)
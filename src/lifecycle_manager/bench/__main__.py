@@ -0,0 +1,10 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Run the end-to-end trial benchmark, see bench/trials.py."""
+from lifecycle_manager.bench.trials import main
+
+if __name__ == "__main__":
+    main()
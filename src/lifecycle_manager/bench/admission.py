@@ -0,0 +1,168 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Benchmark of trials sharing a start time, with and without the admission limit.
+
+Run with: python -m lifecycle_manager.bench.admission [--trials N] [--limit N] [--output results.json]
+
+Each trial is a real Engine and Executor running one state that deploys a slice on a simulated trial enforcement.
+The simulated service deploys capacity slices at a time, each taking service_time seconds, and rejects a deployment
+that has waited longer than timeout for its turn. Reported: trials and deployed slices per second, deployments
+rejected, deployment latency, peak threads and peak memory allocated by Python (tracemalloc, without thread stacks).
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+from threading import BoundedSemaphore, Event, Lock
+
+from lifecycle_manager.executor.engine import Engine
+from lifecycle_manager.executor.state_graph import StateGraph
+from lifecycle_manager.executor.states import State, Finish, Fail, Waiting
+from lifecycle_manager.scheduler.admission import AdmissionQueue
+
+
+class SimulatedEnforcement:
+    """Trial enforcement deploying capacity slices at a time."""
+
+    def __init__(self, capacity, service_time, timeout):
+        self.service_time = service_time
+        self.timeout = timeout
+        self._slots = BoundedSemaphore(capacity)
+        self._lock = Lock()
+        self.latencies = []
+        self.rejected = 0
+
+    def deploy(self):
+        """Deploy a slice. Return False if the deployment was rejected."""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            return False
+        try:
+            time.sleep(self.service_time)
+        finally:
+            self._slots.release()
+        with self._lock:
+            self.latencies.append(time.perf_counter() - started)
+        return True
+
+
+class BenchDeployment(State):
+    """Deploy slice on the simulated trial enforcement of the benchmark."""
+    next_states = ('Finish',)
+    enforcement = None
+
+    def run(self, executor):
+        """State code."""
+        self.enforcement.deploy()
+        return 0, 'Finish'
+
+
+def _graph(enforcement):
+    """Return state graph of the benchmark trial."""
+    BenchDeployment.enforcement = enforcement
+    graph = StateGraph({'BenchDeployment': BenchDeployment, 'Waiting': Waiting, 'Finish': Finish, 'Fail': Fail})
+    graph.delays = {}
+    return graph
+
+
+def run_trials(trials, limit, capacity, service_time, timeout):
+    """Start trials at the same time and wait until all have finished. Return measurements as a dict."""
+    enforcement = SimulatedEnforcement(capacity, service_time, timeout)
+    graph = _graph(enforcement)
+    engines = []
+    done = Event()
+    finished = [0]
+    lock = Lock()
+
+    def on_event(engine, event):
+        if event == 'finished':
+            with lock:
+                finished[0] += 1
+                if finished[0] == trials:
+                    done.set()
+        admission.release(engine.id)
+
+    def start(trial_id):
+        engine = Engine(trial_id, None)
+        engine.executor._graph = graph
+        engine.executor._states = graph.states
+        engine.executor._set_current_state('BenchDeployment')
+        engine.add_listener(on_event)
+        engines.append(engine)
+        engine.start()
+        engine.set_execute_event()
+
+    admission = AdmissionQueue(start, limit)
+    baseline_threads = threading.active_count()
+    peak_threads = [baseline_threads]
+
+    def sample_threads():
+        while not done.wait(0.01):
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+    sampler = threading.Thread(target=sample_threads)
+    tracemalloc.start()
+    started = time.perf_counter()
+    sampler.start()
+    for number in range(trials):
+        admission.submit('bench-{}'.format(number))
+    done.wait()
+    elapsed = time.perf_counter() - started
+    _current, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    sampler.join()
+    for engine in engines:
+        engine.set_stop_event()
+    for engine in engines:
+        engine.join()
+    latencies = sorted(enforcement.latencies) or [0.0]
+    return {
+        "limit": limit,
+        "trials_per_second": round(trials / elapsed, 2),
+        "deployed_per_second": round((trials - enforcement.rejected) / elapsed, 2),
+        "elapsed_s": round(elapsed, 3),
+        "rejected_deployments": enforcement.rejected,
+        "deployment_p50_s": round(statistics.median(latencies), 3),
+        "deployment_p99_s": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)], 3),
+        "peak_threads": peak_threads[0] - baseline_threads,
+        "peak_traced_kib": round(peak_memory / 1024, 1),
+        "admission": admission.stats(),
+    }
+
+
+def run(trials, limit, capacity, service_time, timeout):
+    """Run without and with the limit. Return results as a dict."""
+    return {
+        "trials": trials,
+        "enforcement": {"capacity": capacity, "service_time_s": service_time, "timeout_s": timeout},
+        "unlimited": run_trials(trials, 0, capacity, service_time, timeout),
+        "limited": run_trials(trials, limit, capacity, service_time, timeout),
+    }
+
+
+def main():
+    """Parse arguments, run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trials', type=int, default=200, help="Trials sharing the start time.")
+    parser.add_argument('--limit', type=int, default=20, help="max_active_engines of the limited run.")
+    parser.add_argument('--capacity', type=int, default=10, help="Concurrent deployments of the service.")
+    parser.add_argument('--service-time', type=float, default=0.05, help="Seconds per deployment.")
+    parser.add_argument('--timeout', type=float, default=0.5, help="Seconds a deployment may wait for its turn.")
+    parser.add_argument('--output', help="Write results as JSON to this file.")
+    args = parser.parse_args()
+    results = run(args.trials, args.limit, args.capacity, args.service_time, args.timeout)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
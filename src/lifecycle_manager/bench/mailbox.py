@@ -0,0 +1,158 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Micro-benchmark of Mailbox against AnyEvent for waking up an executor thread.
+
+Run with: python -m lifecycle_manager.bench.mailbox [--messages N] [--output results.json]
+
+Wake-up latency: time from a signal in one thread until the waiting thread handles it, one signal at a time.
+Throughput: signals handled per second when the producer does not wait for the consumer. AnyEvent coalesces
+signals set while the consumer is busy, so it reports both sent and handled signals.
+"""
+import argparse
+import json
+import statistics
+import time
+from threading import Thread, Event
+
+from lifecycle_manager.utils.any_event import AnyEvent
+from lifecycle_manager.utils.mailbox import Mailbox, RUN, STOP
+
+
+def _percentiles(samples):
+    """Return p50 and p99 of samples in microseconds."""
+    samples = sorted(samples)
+    return {"p50_us": round(statistics.median(samples) * 1e6, 2),
+            "p99_us": round(samples[int(len(samples) * 0.99) - 1] * 1e6, 2)}
+
+
+def any_event_latency(count):
+    """Measure wake-up latency of AnyEvent."""
+    run_event = Event()
+    stop_event = Event()
+    any_event = AnyEvent(run_event, stop_event)
+    handled = Event()
+    samples = []
+    sent_at = [0.0]
+
+    def consumer():
+        while any_event.wait():
+            if stop_event.is_set():
+                break
+            if run_event.is_set():
+                run_event.clear()
+                samples.append(time.perf_counter() - sent_at[0])
+                handled.set()
+
+    thread = Thread(target=consumer)
+    thread.start()
+    for _ in range(count):
+        handled.clear()
+        sent_at[0] = time.perf_counter()
+        run_event.set()
+        handled.wait()
+    stop_event.set()
+    thread.join()
+    return _percentiles(samples)
+
+
+def mailbox_latency(count):
+    """Measure wake-up latency of Mailbox."""
+    mailbox = Mailbox()
+    handled = Event()
+    samples = []
+
+    def consumer():
+        while True:
+            message = mailbox.get()
+            if message.kind == STOP:
+                break
+            samples.append(time.perf_counter() - message.target)
+            handled.set()
+
+    thread = Thread(target=consumer)
+    thread.start()
+    for _ in range(count):
+        handled.clear()
+        mailbox.put(RUN, time.perf_counter())
+        handled.wait()
+    mailbox.put(STOP, urgent=True)
+    thread.join()
+    return _percentiles(samples)
+
+
+def any_event_throughput(count):
+    """Measure throughput of AnyEvent."""
+    run_event = Event()
+    stop_event = Event()
+    any_event = AnyEvent(run_event, stop_event)
+    handled = [0]
+
+    def consumer():
+        while any_event.wait():
+            if run_event.is_set():
+                run_event.clear()
+                handled[0] += 1
+            if stop_event.is_set():
+                break
+
+    thread = Thread(target=consumer)
+    started = time.perf_counter()
+    thread.start()
+    for _ in range(count):
+        run_event.set()
+    stop_event.set()
+    thread.join()
+    elapsed = time.perf_counter() - started
+    return {"sent": count, "handled": handled[0], "per_second": round(count / elapsed)}
+
+
+def mailbox_throughput(count):
+    """Measure throughput of Mailbox."""
+    mailbox = Mailbox(maxsize=count + 1)
+    handled = [0]
+
+    def consumer():
+        while True:
+            message = mailbox.get()
+            if message.kind == STOP:
+                break
+            handled[0] += 1
+
+    thread = Thread(target=consumer)
+    started = time.perf_counter()
+    thread.start()
+    for number in range(count):
+        mailbox.put(RUN, number)
+    mailbox.put(STOP)
+    thread.join()
+    elapsed = time.perf_counter() - started
+    return {"sent": count, "handled": handled[0], "per_second": round(count / elapsed)}
+
+
+def run(count):
+    """Run all measurements. Return results as a dict."""
+    return {
+        "messages": count,
+        "latency": {"any_event": any_event_latency(count), "mailbox": mailbox_latency(count)},
+        "throughput": {"any_event": any_event_throughput(count), "mailbox": mailbox_throughput(count)},
+    }
+
+
+def main():
+    """Parse arguments, run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=10000, help="Signals per measurement.")
+    parser.add_argument('--output', help="Write results as JSON to this file.")
+    args = parser.parse_args()
+    results = run(args.messages)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
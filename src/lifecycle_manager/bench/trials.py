@@ -0,0 +1,247 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""End-to-end benchmark of concurrent trials run by one LCM against the service simulator.
+
+Run with: python -m lifecycle_manager.bench [--trials N] [--executor-mode thread|asyncio] [--output results.json]
+
+The simulator runs in a subprocess and LCM, with its API, in this process. N trials are scheduled to start at the same
+time through RunScheduler.add_new_job and run the whole default workflow: slice deployment callbacks from the
+simulator and the /active and /finish commands it sends when the trial turns IDLE and ACTIVE. Reported: trials per
+second, p50/p99 duration of each state, latency from a callback or command arriving at LCM to the start of the state
+it requested, peak threads and peak RSS of the LCM process. Results are written as JSON for comparing versions.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import requests
+from tzlocal import get_localzone
+
+SERVICES = ('trial_enforcement', 'trial_repository', 'kpi_monitoring', 'abstraction_layer')
+
+
+def _free_port():
+    """Return a free loopback port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentiles(samples):
+    """Return count, p50 and p99 of samples in milliseconds, by nearest rank."""
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0, "p50_ms": 0.0, "p99_ms": 0.0}
+    return {"count": len(samples), "p50_ms": round(samples[_rank(len(samples), 0.5)] * 1e3, 2),
+            "p99_ms": round(samples[_rank(len(samples), 0.99)] * 1e3, 2)}
+
+
+def _rank(count, percentile):
+    """Return index of the nearest rank percentile of count sorted samples."""
+    return min(max(math.ceil(count * percentile) - 1, 0), count - 1)
+
+
+def _rss_kib():
+    """Return resident set size of this process in KiB, peak RSS where the current one is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def start_simulator(options, port):
+    """Start simulator subprocess on port with SimulatorSettings options. Return process and config file name."""
+    config = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+    with config:
+        json.dump(options, config)
+    process = subprocess.Popen([sys.executable, '-m', 'lifecycle_manager.simulator', '--port', str(port),
+                                '--config', config.name])
+    url = 'http://127.0.0.1:{}'.format(port)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url + '/simulator/stats', timeout=1)
+            return process, config.name
+        except requests.ConnectionError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Simulator did not start.")
+
+
+def configure_lcm(simulator_url, lcm_url, workdir, executor_mode, max_active):
+    """Point the services of Settings to the simulator through environment variables. Call before importing app."""
+    from lifecycle_manager.config.services import Settings  # pylint: disable=C0415
+    defaults = Settings()
+    for name in SERVICES:
+        service = dict(getattr(defaults, name), url=simulator_url)
+        if "auth_url" in service:
+            service["auth_url"] = simulator_url + '/monitoring/token'
+        os.environ[name.upper()] = json.dumps(service)
+    os.environ['LCM'] = json.dumps(dict(defaults.lcm, url=lcm_url))
+    os.environ['CHECKPOINT_PATH'] = os.path.join(workdir, 'executor.db')
+    os.environ['FAILURE_REPORTS'] = json.dumps(dict(defaults.failure_reports,
+                                                    path=os.path.join(workdir, 'failures.jsonl')))
+    os.environ['EXECUTOR_MODE'] = executor_mode
+    os.environ['MAX_ACTIVE_ENGINES'] = str(max_active)
+
+
+def analyse(tracer, trial_ids):
+    """Return trials/s, state durations and callback to transition latencies from the spans of the trials."""
+    states = defaultdict(list)
+    transitions = defaultdict(list)
+    first_start, last_end = None, None
+    for trial_id in trial_ids:
+        timeline = tracer.timeline(trial_id)
+        state_spans = [span for span in timeline if span["name"] == 'state']
+        for span in state_spans:
+            states[span["attributes"]["state"]].append(span["duration"])
+        if state_spans:
+            start, end = state_spans[0]["start"], state_spans[-1]["start"] + state_spans[-1]["duration"]
+            first_start = start if first_start is None else min(first_start, start)
+            last_end = end if last_end is None else max(last_end, end)
+        for span in timeline:
+            if span["name"] != 'callback' or span["attributes"].get("status") != 200:
+                continue
+            resumed = next((state for state in state_spans if state["start"] >= span["start"]), None)
+            if resumed is not None:
+                transitions[span["attributes"]["path"]].append(resumed["start"] - span["start"])
+    elapsed = (last_end - first_start) if first_start is not None else 0.0
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "states": {state: _percentiles(durations) for state, durations in sorted(states.items())},
+        "callback_to_transition": {path: _percentiles(latencies) for path, latencies in sorted(transitions.items())},
+    }
+
+
+def run(trials, executor_mode='thread', max_active=0, start_delay=5.0, timeout=300.0, simulator_options=None):
+    """Run trials through LCM against the simulator. Return results as a dict."""
+    simulator_port, lcm_port = _free_port(), _free_port()
+    simulator_url = 'http://127.0.0.1:{}'.format(simulator_port)
+    lcm_url = 'http://127.0.0.1:{}'.format(lcm_port)
+    options = {"trials": 0, "lcm_url": lcm_url}
+    options.update(simulator_options or {})
+    workdir = tempfile.mkdtemp(prefix='lcm-bench-')
+    configure_lcm(simulator_url, lcm_url, workdir, executor_mode, max_active)
+    # pylint: disable=C0415
+    from lifecycle_manager import app as lcm_app
+    from lifecycle_manager.api_customization import FASTAPI_VERSION
+    from lifecycle_manager.simulator.app import AppServer
+    from lifecycle_manager.utils.tracing import TRACER
+
+    TRACER.max_trials = max(TRACER.max_trials, trials)
+    simulator, config_name = start_simulator(options, simulator_port)
+    server = AppServer(lcm_app.app, port=lcm_port, name='lcm')
+    try:
+        server.start()
+        run_scheduler = lcm_app.run_scheduler
+        run_scheduler.run_scheduler()
+        baseline_threads = threading.active_count()
+        baseline_rss = _rss_kib()
+        peaks = {"threads": baseline_threads, "rss": baseline_rss}
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(0.05):
+                peaks["threads"] = max(peaks["threads"], threading.active_count())
+                peaks["rss"] = max(peaks["rss"], _rss_kib())
+
+        sampler = threading.Thread(target=sample, name='bench-sampler', daemon=True)
+        sampler.start()
+        start_time = (datetime.now(get_localzone()) + timedelta(seconds=start_delay)) \
+            .replace(microsecond=0).isoformat()
+        trial_ids = ['bench-{}'.format(number) for number in range(trials)]
+        for trial_id in trial_ids:
+            run_scheduler.add_new_job(start_time, trial_id)
+        deadline = time.monotonic() + start_delay + timeout
+        finished = failed = 0
+        while time.monotonic() < deadline:
+            counts = run_scheduler.count_executor_engine_instances()
+            finished, failed = counts.get('Finished', 0), counts.get('Failed', 0)
+            if finished + failed >= trials:
+                break
+            time.sleep(0.1)
+        done.set()
+        sampler.join()
+        simulator_stats = requests.get(simulator_url + '/simulator/stats', timeout=5).json()
+        results = analyse(TRACER, trial_ids)
+        elapsed = results.pop("elapsed_s")
+        return {
+            "version": FASTAPI_VERSION,
+            "python": platform.python_version(),
+            "date": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "parameters": {"trials": trials, "executor_mode": executor_mode, "max_active_engines": max_active,
+                           "simulator": options},
+            "finished": finished,
+            "failed": failed,
+            "timed_out": trials - finished - failed,
+            "elapsed_s": elapsed,
+            "trials_per_second": round(finished / elapsed, 2) if elapsed else 0.0,
+            "peak_threads": peaks["threads"],
+            "baseline_threads": baseline_threads,
+            "peak_rss_mib": round(peaks["rss"] / 1024, 1),
+            "baseline_rss_mib": round(baseline_rss / 1024, 1),
+            "states": results["states"],
+            "callback_to_transition": results["callback_to_transition"],
+            "simulator": simulator_stats,
+        }
+    finally:
+        handler = lcm_app.run_scheduler.scheduler_handler
+        handler.stop_all_engine_instances()
+        if handler.is_alive():
+            handler.shutdown()
+            handler.join()
+        server.shutdown()
+        simulator.terminate()
+        simulator.wait()
+        os.remove(config_name)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    """Parse arguments, run benchmark and print results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trials', type=int, default=50, help="Trials sharing the start time.")
+    parser.add_argument('--executor-mode', choices=('thread', 'asyncio'), default='thread')
+    parser.add_argument('--max-active', type=int, default=0, help="max_active_engines, 0 for no limit.")
+    parser.add_argument('--start-delay', type=float, default=5.0, help="Seconds from scheduling to trial start.")
+    parser.add_argument('--timeout', type=float, default=300.0, help="Seconds to wait for the trials to end.")
+    parser.add_argument('--latency', type=float, default=0.01, help="Median service latency in seconds.")
+    parser.add_argument('--callback-delay', type=float, default=0.2, help="Median callback delay in seconds.")
+    parser.add_argument('--active-time', type=float, default=1.0, help="Seconds trials stay active.")
+    parser.add_argument('--simulator-config', help="JSON file of SimulatorSettings fields, overriding the above.")
+    parser.add_argument('--output', help="Write results as JSON to this file.")
+    args = parser.parse_args()
+    simulator_options = {
+        "seed": 1,
+        "latency": {"distribution": "lognormal", "median": args.latency, "sigma": 0.5},
+        "callback_delay": {"distribution": "lognormal", "median": args.callback_delay, "sigma": 0.5},
+        "command_delay": {"distribution": "constant", "value": 0.1},
+        "command_delays": {"finish": {"distribution": "constant", "value": args.active_time}},
+    }
+    if args.simulator_config:
+        with open(args.simulator_config) as config:
+            simulator_options.update(json.load(config))
+    results = run(args.trials, args.executor_mode, args.max_active, args.start_delay, args.timeout,
+                  simulator_options)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
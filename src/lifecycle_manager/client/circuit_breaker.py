@@ -0,0 +1,129 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Circuit breakers of downstream services, shared by all executors.
+
+closed: requests pass. The outcomes of the latest window requests are kept, and when at least min_requests of them
+have failed at failure_rate or more, the circuit opens.
+open: requests fail fast with CircuitOpen until cooldown seconds have passed.
+half-open: up to half_open_requests probe requests pass. A successful probe closes the circuit, a failed one opens it
+again for another cooldown. A probe that is not sent after all must be released, or the circuit stays half-open.
+"""
+import logging
+import time
+from collections import deque
+from threading import Lock
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpen(Exception):
+    """Raised when a request is not sent because the circuit of the service is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__("Circuit of {} is open, retry after {:.1f} s.".format(name, retry_after))
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Circuit breaker of one service."""
+
+    def __init__(self, name, failure_rate=0.5, min_requests=5, window=20, cooldown=30.0, half_open_requests=1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.half_open_requests = half_open_requests
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._half_opened = 0
+        self._rejected = 0
+        self._lock = Lock()
+
+    @property
+    def state(self):
+        """Current state, open turning to half-open after the cooldown."""
+        with self._lock:
+            self._check_cooldown()
+            return self._state
+
+    def before_request(self):
+        """Raise CircuitOpen if a request may not be sent now.
+
+        Return probe ID if the request is a probe of the half-open circuit, else None. Pass the probe ID to release
+        if the request ends without its outcome being recorded.
+        """
+        with self._lock:
+            self._check_cooldown()
+            if self._state == CLOSED:
+                return None
+            if self._state == HALF_OPEN and self._probes < self.half_open_requests:
+                self._probes += 1
+                return self._half_opened
+            self._rejected += 1
+            retry_after = max(self._opened_at + self.cooldown - time.monotonic(), 0.0) or self.cooldown
+        raise CircuitOpen(self.name, retry_after)
+
+    def release(self, probe):
+        """Free the slot of probe. Nothing is done if the outcome of a probe has been recorded since."""
+        with self._lock:
+            if self._state == HALF_OPEN and probe == self._half_opened:
+                self._probes = max(self._probes - 1, 0)
+
+    def record(self, success):
+        """Record outcome of a request that was sent."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+                if success:
+                    self._transition(CLOSED)
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (self._state == CLOSED and failures >= self.min_requests
+                    and failures >= self.failure_rate * len(self._outcomes)):
+                self._open()
+
+    def _check_cooldown(self):
+        """Turn open circuit half-open after the cooldown. Called with lock held."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._transition(HALF_OPEN)
+            self._probes = 0
+            self._half_opened += 1
+
+    def _open(self):
+        """Open the circuit. Called with lock held."""
+        self._opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, state):
+        """Change state. Called with lock held."""
+        if state != self._state:
+            logging.getLogger('__executor__').warning("Circuit of %s: %s -> %s", self.name, self._state, state)
+            self._state = state
+
+    def stats(self):
+        """Return state, failures in the window and requests rejected while open."""
+        with self._lock:
+            self._check_cooldown()
+            return {"state": self._state, "failures": self._outcomes.count(False),
+                    "requests": len(self._outcomes), "rejected": self._rejected}
+
+
+def create_circuit_breaker(settings, name):
+    """Return circuit breaker of service name from settings or None if disabled for the service."""
+    options = dict(getattr(settings, 'circuit_breaker', {}))
+    options.update(getattr(settings, 'circuit_breakers', {}).get(name, {}))
+    if not options.pop("enabled", True):
+        return None
+    return CircuitBreaker(name, **options)
@@ -0,0 +1,91 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Token bucket rate limiters shared by all executors, per service and optionally per endpoint.
+
+Requests over the rate are not dropped. Each request reserves the next free token and sleeps until it is due, so
+waiting requests are served in arrival order.
+"""
+import time
+from threading import Lock
+
+from lifecycle_manager.utils.metrics import RATE_LIMIT_WAIT
+
+
+class TokenBucket:
+    """Bucket refilled with rate tokens per second, holding at most burst tokens."""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = Lock()
+
+    def reserve(self):
+        """Take a token. Return seconds until it is due, 0 if it is available now."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class ServiceRateLimiter:
+    """Rate limits of one service, configured with {"rate": ..., "burst": ..., "endpoints": {prefix: {...}}}.
+
+    A request takes a token of the longest endpoint prefix matching its path, if any, and a token of the service.
+    clock and sleep can be replaced in tests.
+    """
+
+    def __init__(self, name, options, clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self._sleep = sleep
+        self.bucket = TokenBucket(options["rate"], options.get("burst", 1), clock) if options.get("rate") else None
+        self.endpoints = sorted(((prefix, TokenBucket(limit["rate"], limit.get("burst", 1), clock))
+                                 for prefix, limit in options.get("endpoints", {}).items()),
+                                key=lambda item: len(item[0]), reverse=True)
+        self._waited = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._lock = Lock()
+
+    def acquire(self, path):
+        """Wait until path of the service may be requested. Return seconds waited."""
+        prefix = ''
+        wait = 0.0
+        for endpoint, bucket in self.endpoints:
+            if path.startswith(endpoint):
+                prefix = endpoint
+                wait = bucket.reserve()
+                break
+        if self.bucket is not None:
+            wait = max(wait, self.bucket.reserve())
+        if wait > 0:
+            self._sleep(wait)
+            with self._lock:
+                self._waited += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+        RATE_LIMIT_WAIT.observe(wait, self.name, prefix)
+        return wait
+
+    def stats(self):
+        """Return number of delayed requests and their total and longest wait in seconds."""
+        with self._lock:
+            return {"delayed": self._waited, "wait_total_s": round(self._wait_total, 3),
+                    "wait_max_s": round(self._wait_max, 3)}
+
+
+def create_rate_limiter(settings, name):
+    """Return rate limiter of service name from settings.rate_limits or None if the service is not limited."""
+    options = getattr(settings, 'rate_limits', {}).get(name)
+    if not options:
+        return None
+    return ServiceRateLimiter(name, options)
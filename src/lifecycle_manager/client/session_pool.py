@@ -0,0 +1,210 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Pooled keep-alive HTTP sessions, one per service entry in config/services.Settings."""
+import logging
+import time
+from contextlib import contextmanager
+from threading import Lock
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from lifecycle_manager.client.circuit_breaker import create_circuit_breaker
+from lifecycle_manager.client.rate_limiter import create_rate_limiter
+from lifecycle_manager.client.timeouts import TimeoutPolicy
+
+SERVICE_NAMES = ('lcm', 'trial_enforcement', 'trial_repository', 'kpi_monitoring', 'abstraction_layer')
+
+_SESSION_POOL = None
+_SESSION_POOL_LOCK = Lock()
+
+
+def service_name(settings, service):
+    """Return the name of the service entry in settings. Falls back to the service url."""
+    for name in SERVICE_NAMES:
+        if getattr(settings, name, None) is service:
+            return name
+    for name in SERVICE_NAMES:
+        if getattr(settings, name, None) == service:
+            return name
+    return service["url"]
+
+
+class ServiceSession:
+    """Pooled session for one service. Authentication and certificate settings are computed once."""
+
+    def __init__(self, name, service, settings):
+        self.name = name
+        self.url = service["url"]
+        pool = dict(settings.http_pool)
+        pool.update(service.get("pool", {}))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool["pool_connections"], pool_maxsize=pool["pool_maxsize"],
+                              pool_block=pool["pool_block"])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._adapter = adapter
+        if not pool["keep_alive"]:
+            self.session.headers['Connection'] = 'close'
+        self.auth = None
+        self.uses_token = False
+        if not service["apikey"] == "":
+            self.session.headers['Authorization'] = service["apikey"]
+        elif not service["username"] == "" and not service["token"]:
+            self.auth = HTTPBasicAuth(service["username"], service["password"])
+        elif service["token"]:
+            self.uses_token = True
+        if service["url"].startswith("https") and not settings.disable_cert_verification:
+            self.session.verify = settings.ca_bundle_path
+        else:
+            self.session.verify = False
+        self.rate_limiter = create_rate_limiter(settings, name)
+        self.circuit_breaker = create_circuit_breaker(settings, name)
+        self.timeouts = TimeoutPolicy(name, settings)
+        self._requests = 0
+        self._lock = Lock()
+
+    @contextmanager
+    def permit(self, url):
+        """Let one request to url be sent in the with block. Yield seconds waited for the rate limiter.
+
+        Raise CircuitOpen without waiting if the circuit of the service is open. If the circuit is half-open and the
+        block exits without the outcome of its request being recorded, e.g. because getting an access token failed,
+        the probe slot is freed for the next request.
+        """
+        probe = None
+        if self.circuit_breaker is not None:
+            probe = self.circuit_breaker.before_request()
+        try:
+            yield self.throttle(url)
+        finally:
+            if probe is not None:
+                self.circuit_breaker.release(probe)
+
+    def throttle(self, url):
+        """Wait until the rate limits of the service allow a request to url. Return seconds waited."""
+        if self.rate_limiter is None:
+            return 0.0
+        return self.rate_limiter.acquire(self._path(url))
+
+    def _path(self, url):
+        """Return path of url relative to the service url, without query."""
+        if url.startswith(self.url):
+            return url[len(self.url):].split('?')[0]
+        return urlparse(url).path
+
+    def request(self, method, url, headers=None, throttle=True, record=True, **kwargs):
+        """Send request through the pooled session. Return response object.
+
+        The request gets a permit of the circuit breaker and rate limiter of the service unless throttle is False,
+        e.g. because the caller already holds one. Connection errors, timeouts and 5xx responses count as failures
+        of the service unless record is False. Without an explicit timeout the connect and read timeouts of the
+        endpoint are used.
+        """
+        if throttle:
+            with self.permit(url):
+                return self.request(method, url, headers, throttle=False, record=record, **kwargs)
+        if 'auth' not in kwargs:
+            kwargs['auth'] = None if headers and 'Authorization' in headers else self.auth
+        endpoint = None
+        if 'timeout' not in kwargs:
+            endpoint = self.timeouts.endpoint(method, self._path(url))
+            kwargs['timeout'] = (endpoint.connect, endpoint.read_timeout())
+        with self._lock:
+            self._requests += 1
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, url, headers=headers, **kwargs)
+        except requests.Timeout:
+            if endpoint is not None:
+                endpoint.observe(kwargs['timeout'][1])
+            if record:
+                self._record(False)
+            raise
+        except requests.RequestException:
+            if record:
+                self._record(False)
+            raise
+        if endpoint is not None:
+            endpoint.observe(time.monotonic() - started)
+        if record:
+            self._record(response.status_code < 500)
+        return response
+
+    def _record(self, success):
+        """Record outcome of a request in the circuit breaker."""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(success)
+
+    def stats(self):
+        """Return request and connection counts of this session."""
+        connections = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            connections += pools[key].num_connections
+        with self._lock:
+            sent = self._requests
+        stats = {"url": self.url, "requests": sent, "connections": connections,
+                 "reused": max(sent - connections, 0)}
+        if self.rate_limiter is not None:
+            stats["rate_limit"] = self.rate_limiter.stats()
+        if self.circuit_breaker is not None:
+            stats["circuit"] = self.circuit_breaker.stats()
+        stats["timeouts"] = self.timeouts.stats()
+        return stats
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+
+class SessionPool:
+    """Process wide collection of service sessions shared by all executors."""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = Lock()
+
+    def session(self, settings, service):
+        """Return session for service. Created on first use."""
+        name = service_name(settings, service)
+        key = (name, service["url"])
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    logging.getLogger('__executor__').info("Creating pooled session for %s", name)
+                    session = ServiceSession(name, service, settings)
+                    self._sessions[key] = session
+        return session
+
+    def stats(self):
+        """Return connection reuse statistics per service."""
+        return {session.name: session.stats() for session in list(self._sessions.values())}
+
+    def circuits(self):
+        """Return circuit breaker state per service."""
+        return {session.name: session.circuit_breaker.stats() for session in list(self._sessions.values())
+                if session.circuit_breaker is not None}
+
+    def close(self):
+        """Close and forget all sessions."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+def get_session_pool():
+    """Return the process wide session pool."""
+    global _SESSION_POOL  # pylint: disable=W0603
+    with _SESSION_POOL_LOCK:
+        if _SESSION_POOL is None:
+            _SESSION_POOL = SessionPool()
+        return _SESSION_POOL
@@ -0,0 +1,68 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module provides SingleFlight class, sharing one call between concurrent callers asking for the same key.
+
+Example usage:
+flights = SingleFlight()
+status, document = flights.do(trial_id, lambda: fetch_and_parse(trial_id))
+
+The first caller of a key runs the function. Callers arriving while it runs wait and get its result, or its exception.
+"""
+from threading import Event, Lock
+
+
+class _Call:
+    """Call in flight."""
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls by key. saved counts the calls that were not made."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+        self.saved = 0
+
+    def do(self, key, function):
+        """Return result of function(), shared with concurrent callers of key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.saved += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+        except Exception as _err:
+            call.error = _err
+            raise
+        finally:
+            self.forget(key, call)
+            call.done.set()
+        return call.result
+
+    def forget(self, key, call=None):
+        """Let the next caller of key make a new call, even if one is in flight."""
+        with self._lock:
+            if call is None or self._calls.get(key) is call:
+                self._calls.pop(key, None)
+
+    def in_flight(self):
+        """Return number of calls in flight."""
+        with self._lock:
+            return len(self._calls)
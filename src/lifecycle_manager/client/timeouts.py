@@ -0,0 +1,99 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Connect and read timeouts of requests to a service, per endpoint and optionally adapted to observed latency.
+
+Endpoints are path prefixes. A request without a configured prefix belongs to the endpoint named by its method and
+first path segment, e.g. "POST /markKPIData", so that trial IDs in paths do not create endpoints of their own.
+Adaptive read timeout: multiplier * the percentile of the latest window latencies of the endpoint, kept between
+floor and cap, once min_samples have been observed. Until then the configured read timeout is used.
+"""
+from collections import deque
+from threading import Lock
+
+ADAPTIVE_DEFAULTS = {"enabled": False, "percentile": 0.99, "multiplier": 2.0, "floor": 2.0, "cap": 120.0,
+                     "min_samples": 20, "window": 200}
+
+
+class EndpointTimeout:
+    """Timeouts of one endpoint."""
+
+    def __init__(self, connect, read, adaptive):
+        self.connect = connect
+        self.read = read
+        self.adaptive = adaptive
+        self._latencies = deque(maxlen=adaptive["window"])
+        self._lock = Lock()
+
+    def observe(self, seconds):
+        """Add latency of a request. A timed out request is observed with its timeout."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def read_timeout(self):
+        """Return read timeout in seconds."""
+        if not self.adaptive["enabled"]:
+            return self.read
+        with self._lock:
+            if len(self._latencies) < self.adaptive["min_samples"]:
+                return self.read
+            latencies = sorted(self._latencies)
+        index = min(int(len(latencies) * self.adaptive["percentile"]), len(latencies) - 1)
+        timeout = latencies[index] * self.adaptive["multiplier"]
+        return min(max(timeout, self.adaptive["floor"]), self.adaptive["cap"])
+
+    def stats(self):
+        """Return configured and current timeouts and number of observed latencies."""
+        with self._lock:
+            samples = len(self._latencies)
+        return {"connect": self.connect, "read": self.read, "current_read": round(self.read_timeout(), 3),
+                "samples": samples}
+
+
+class TimeoutPolicy:
+    """Timeouts of the endpoints of one service.
+
+    Configured with settings.http_timeout, settings.adaptive_timeouts and the service entry of settings.http_timeouts:
+    {"connect": ..., "read": ..., "adaptive": {...}, "endpoints": {prefix: {"connect": ..., "read": ..., "adaptive":
+    {...}}}}. Each level overrides the one above it.
+    """
+
+    def __init__(self, name, settings):
+        self.name = name
+        options = getattr(settings, 'http_timeouts', {}).get(name, {})
+        self._defaults = dict(getattr(settings, 'http_timeout', {"connect": 5, "read": 30}))
+        self._defaults.update({key: options[key] for key in ("connect", "read") if key in options})
+        self._adaptive = dict(ADAPTIVE_DEFAULTS)
+        self._adaptive.update(getattr(settings, 'adaptive_timeouts', {}))
+        self._adaptive.update(options.get("adaptive", {}))
+        self._prefixes = sorted(options.get("endpoints", {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self._endpoints = {}
+        self._lock = Lock()
+
+    def endpoint(self, method, path):
+        """Return EndpointTimeout of request method and path."""
+        path = path.split('?')[0]
+        for prefix, options in self._prefixes:
+            if path.startswith(prefix):
+                return self._get(prefix, options)
+        return self._get('{} /{}'.format(method.upper(), path.lstrip('/').split('/')[0]), {})
+
+    def _get(self, key, options):
+        """Return EndpointTimeout of key, created on first use."""
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            with self._lock:
+                endpoint = self._endpoints.get(key)
+                if endpoint is None:
+                    adaptive = dict(self._adaptive)
+                    adaptive.update(options.get("adaptive", {}))
+                    endpoint = EndpointTimeout(options.get("connect", self._defaults["connect"]),
+                                               options.get("read", self._defaults["read"]), adaptive)
+                    self._endpoints[key] = endpoint
+        return endpoint
+
+    def stats(self):
+        """Return timeouts by endpoint."""
+        return {key: endpoint.stats() for key, endpoint in list(self._endpoints.items())}
@@ -0,0 +1,125 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Process wide cache of OAuth access tokens for token authenticated services."""
+import logging
+import time
+from threading import Lock, Timer
+
+_TOKEN_CACHE = None
+_TOKEN_CACHE_LOCK = Lock()
+
+
+class AccessToken:
+    """Access token and its expiry time."""
+
+    def __init__(self, value, expires_in):
+        self.value = value
+        self.expires_in = expires_in
+        self.expires_at = time.monotonic() + expires_in
+
+    def valid(self):
+        """Return True if the token has not expired."""
+        return time.monotonic() < self.expires_at
+
+
+class TokenCache:
+    """Access tokens keyed by service.
+
+    Only one request per service fetches a token while others wait for it (single-flight).
+    Tokens are refreshed in the background refresh_margin seconds before they expire, if they have been used since
+    they were fetched. Tokens of idle services expire and are fetched again by the next get().
+    """
+
+    def __init__(self, refresh_margin=30, default_ttl=60):
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self._tokens = {}
+        self._locks = {}
+        self._timers = {}
+        self._used = set()
+        self._lock = Lock()
+        self.fetches = 0
+
+    def _key_lock(self, key):
+        """Return lock for key."""
+        with self._lock:
+            if key not in self._locks:
+                self._locks[key] = Lock()
+            return self._locks[key]
+
+    def get(self, key, fetch):
+        """Return a valid access token for key. fetch() must return the token response as a dict."""
+        token = self._tokens.get(key)
+        if token is not None and token.valid():
+            self._used.add(key)
+            return token.value
+        with self._key_lock(key):
+            token = self._tokens.get(key)
+            if token is None or not token.valid():
+                token = self._fetch(key, fetch)
+        return token.value
+
+    def invalidate(self, key):
+        """Forget the token of key, e.g. when the service rejects it."""
+        with self._lock:
+            self._tokens.pop(key, None)
+            self._used.discard(key)
+            timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+    def clear(self):
+        """Forget all tokens."""
+        for key in list(self._tokens):
+            self.invalidate(key)
+
+    def _fetch(self, key, fetch):
+        """Fetch and store a new token. Called with key lock held."""
+        payload = fetch()
+        self.fetches += 1
+        token = AccessToken(payload["access_token"], float(payload.get("expires_in") or self.default_ttl))
+        self._tokens[key] = token
+        self._used.discard(key)
+        self._schedule_refresh(key, fetch, token)
+        return token
+
+    def _schedule_refresh(self, key, fetch, token):
+        """Start timer refreshing the token before it expires."""
+        delay = token.expires_in - self.refresh_margin
+        if delay <= 0:
+            return
+        timer = Timer(delay, self._refresh, args=[key, fetch])
+        timer.daemon = True
+        with self._lock:
+            previous = self._timers.pop(key, None)
+            self._timers[key] = timer
+        if previous is not None:
+            previous.cancel()
+        timer.start()
+
+    def _refresh(self, key, fetch):
+        """Refresh token in the background if it has been used. The old token stays in use if refreshing fails."""
+        with self._key_lock(key):
+            if key not in self._used:
+                with self._lock:
+                    self._timers.pop(key, None)
+                logging.getLogger('__executor__').debug("Access token for %s not used, not refreshed", key)
+                return
+            try:
+                self._fetch(key, fetch)
+                logging.getLogger('__executor__').debug("Refreshed access token for %s", key)
+            except Exception as refresh_error:
+                logging.getLogger('__executor__').warning("Refreshing access token for %s failed: %s",
+                                                          key, str(refresh_error))
+
+
+def get_token_cache(refresh_margin=30, default_ttl=60):
+    """Return the process wide token cache."""
+    global _TOKEN_CACHE  # pylint: disable=W0603
+    with _TOKEN_CACHE_LOCK:
+        if _TOKEN_CACHE is None:
+            _TOKEN_CACHE = TokenCache(refresh_margin, default_ttl)
+        return _TOKEN_CACHE
@@ -0,0 +1,151 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Process wide cache of trial documents from trial_repository with conditional GET revalidation.
+
+Concurrent reads of the same trial share one request (client/single_flight.py).
+"""
+import ast
+import logging
+import time
+from threading import Lock
+
+from lifecycle_manager.client.single_flight import SingleFlight
+
+_TRIAL_CACHE = None
+_TRIAL_CACHE_LOCK = Lock()
+
+
+class TrialDocument:
+    """Trial document and the fields parsed from it. Shared between threads, do not modify."""
+
+    def __init__(self, data, etag=None, last_modified=None):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+        self.flights = data.get("flights")
+        self.nst = self._parse_nst(data.get("nst"))
+
+    @staticmethod
+    def _parse_nst(nst):
+        """Parse network slice template string. Return None if it can't be parsed."""
+        if not isinstance(nst, str):
+            return nst
+        try:
+            return ast.literal_eval(nst)
+        except (ValueError, SyntaxError) as parse_error:
+            logging.getLogger('__executor__').warning("Failed to parse nst of trial: %s", str(parse_error))
+            return None
+
+    def age(self):
+        """Seconds since the document was fetched or revalidated."""
+        return time.monotonic() - self.fetched_at
+
+    def touch(self):
+        """Mark the document revalidated."""
+        self.fetched_at = time.monotonic()
+
+
+class TrialCache:
+    """Trial documents keyed by trial ID.
+
+    Documents younger than ttl seconds are served from the cache. Older ones are revalidated with
+    If-None-Match/If-Modified-Since. Entries must be invalidated after updating the trial.
+    flights coalesces concurrent reads, also reads of the trial list through read_shared.
+    """
+
+    def __init__(self, ttl=10):
+        self.ttl = ttl
+        self._documents = {}
+        self._reads = {}  # Trial ID: token of the read whose document is cached, only while the read is in flight.
+        self._lock = Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0}
+        self.flights = SingleFlight()
+
+    def get(self, trial_id, fetch):
+        """Return status code and trial document. fetch(headers) must send the GET and return the response.
+
+        Callers missing the cache at the same time share the request of the first one.
+        """
+        trial_id = str(trial_id)
+        document = self._documents.get(trial_id)
+        if document is not None and document.age() < self.ttl:
+            self._count("hits")
+            return 200, document
+        return self.flights.do(('trial', trial_id), lambda: self._fetch(trial_id, document, fetch))
+
+    def read_shared(self, key, read):
+        """Return result of read(), shared with concurrent callers of key. For uncached reads, e.g. all trials."""
+        return self.flights.do(('read', key), read)
+
+    def _fetch(self, trial_id, document, fetch):
+        """Fetch or revalidate document of trial. Return status code and trial document."""
+        read = object()
+        with self._lock:
+            self._reads[trial_id] = read
+        try:
+            return self._read(trial_id, document, fetch, read)
+        finally:
+            with self._lock:
+                if self._reads.get(trial_id) is read:
+                    del self._reads[trial_id]
+
+    def _read(self, trial_id, document, fetch, read):
+        """Send the GET of trial. Cache the new document unless the trial was invalidated during read."""
+        headers = {}
+        if document is not None:
+            if document.etag:
+                headers['If-None-Match'] = document.etag
+            if document.last_modified:
+                headers['If-Modified-Since'] = document.last_modified
+        response = fetch(headers)
+        if response is None:
+            return None, None
+        if response.status_code == 304 and document is not None:
+            self._count("revalidated")
+            document.touch()
+            return 200, document
+        self._count("misses")
+        if response.status_code != 200:
+            return response.status_code, None
+        document = TrialDocument(response.json(), response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        with self._lock:
+            if self._reads.get(trial_id) is read:
+                self._documents[trial_id] = document
+        return 200, document
+
+    def invalidate(self, trial_id):
+        """Drop the cached document of trial. A read in flight is not shared with later callers or cached."""
+        trial_id = str(trial_id)
+        with self._lock:
+            self._documents.pop(trial_id, None)
+            self._reads.pop(trial_id, None)
+        self.flights.forget(('trial', trial_id))
+
+    def clear(self):
+        """Drop all cached documents. Reads in flight are not cached."""
+        with self._lock:
+            self._documents = {}
+            self._reads = {}
+
+    def stats(self):
+        """Return cache statistics."""
+        with self._lock:
+            return dict(self._stats, size=len(self._documents), coalesced=self.flights.saved)
+
+    def _count(self, key):
+        """Increment a statistics counter."""
+        with self._lock:
+            self._stats[key] += 1
+
+
+def get_trial_cache(ttl=10):
+    """Return the process wide trial document cache."""
+    global _TRIAL_CACHE  # pylint: disable=W0603
+    with _TRIAL_CACHE_LOCK:
+        if _TRIAL_CACHE is None:
+            _TRIAL_CACHE = TrialCache(ttl)
+        return _TRIAL_CACHE
@@ -4,6 +4,8 @@
 # SPDX-License-Identifier: Apache-2.0
 
 # Configure URL:s and authentication credentials here
+import os
+
 from pydantic import BaseSettings
 from lifecycle_manager.api_customization import API_KEY
 class Settings(BaseSettings):
@@ -17,7 +19,104 @@ class Settings(BaseSettings):
     ca_bundle_path = "/etc/ssl/certs/ca-certificates.crt"  # Path set up for docker usage. No need to change, unless you are not using Docker.
 
     # Executor
-    disable_vnf = True  # Default True to skip vnf requests
+    disable_vnf = True  # Default True to skip vnf requests. False uses the "vnf" workflow as default.
+    executor_mode = "thread"  # "thread": threads per trial. "asyncio": all trials on one shared event loop.
+    async_worker_threads = 32  # Worker pool size for blocking requests in asyncio mode.
+    kpi_marking_workers = 8  # Worker pool size for the trial KPI markings sent next to the slice markings.
+
+    # Admission of scheduled trials. Trials over the limit wait in a queue until a running engine ends.
+    max_active_engines = 0  # Engines executing at the same time. 0 for no limit.
+    admission_policy = "fifo"  # "fifo": in arrival order. "priority": lower priority of the scheduled trial first.
+
+    checkpoint_path = "checkpoints/executor.db"  # SQLite journal of executor checkpoints. None disables checkpoints.
+    checkpoint_compact_interval = 60  # Minimum seconds between compactions of the journal after trials are closed.
+
+    trace_dir = "traces"  # Directory of the OTLP JSON files written by GET /debug/trace/{trial_id}?export=true.
+
+    # Failure reports of executors, written as JSON lines in the background.
+    failure_reports = {
+        "path": "logs/executor_failures.jsonl",
+        "max_bytes": 10 * 1024 * 1024,  # File size after which the file is compressed to <path>.1.gz.
+        "backup_count": 5,  # Compressed files kept.
+        "queue_size": 1000,  # Reports waiting to be written. Reports over this are not written.
+        "recent": 100  # Latest reports kept in memory for GET /debug/failures.
+    }
+
+    # Pooled HTTP sessions. Override per service with a "pool" entry in the service dict.
+    http_pool = {
+        "pool_connections": 10,  # Number of hosts to keep connection pools for.
+        "pool_maxsize": 20,  # Connections kept alive per host.
+        "pool_block": False,  # True: wait for a free connection instead of opening an extra one.
+        "keep_alive": True
+    }
+
+    # Token bucket rate limits of requests to downstream services, shared by all executors. Requests over the rate
+    # wait for their turn. Services not listed are not limited. "endpoints" limits requests whose path starts with
+    # the prefix on top of the service limit, e.g.
+    # {"trial_enforcement": {"rate": 5, "burst": 10, "endpoints": {"/slice": {"rate": 1, "burst": 2}}}}
+    rate_limits = {}  # {service name: {"rate": requests per second, "burst": requests, "endpoints": {...}}}
+
+    # Connect and read timeouts in seconds of requests to downstream services. See client/timeouts.py.
+    http_timeout = {"connect": 5, "read": 30}
+    # Overrides by service name and endpoint path prefix, e.g.
+    # {"trial_enforcement": {"endpoints": {"/sliceDeployment": {"read": 120, "adaptive": {"enabled": False}}}},
+    #  "kpi_monitoring": {"endpoints": {"/markKPIData": {"read": 10}}}}
+    http_timeouts = {}
+    # Adaptive read timeout: multiplier * percentile of the latest window latencies of the endpoint, between floor and
+    # cap, once min_samples latencies have been observed. Enable globally here or per service or endpoint.
+    adaptive_timeouts = {
+        "enabled": False,
+        "percentile": 0.99,
+        "multiplier": 2.0,
+        "floor": 2.0,
+        "cap": 120.0,
+        "min_samples": 20,
+        "window": 200
+    }
+
+    # Circuit breaker of each downstream service. See client/circuit_breaker.py. While the circuit is open, requests
+    # fail fast and executors are parked in their current state until the cooldown has passed.
+    circuit_breaker = {
+        "failure_rate": 0.5,  # Fraction of failed requests in the window that opens the circuit.
+        "min_requests": 5,  # Failed requests in the window needed to open the circuit.
+        "window": 20,  # Latest requests whose outcomes are counted.
+        "cooldown": 30,  # Seconds the circuit stays open before probe requests are let through.
+        "half_open_requests": 1  # Concurrent probe requests while half-open.
+    }
+    circuit_breakers = {}  # Overrides by service name, e.g. {"kpi_monitoring": {"enabled": False}}
+
+    # Access token cache for services with "token": True
+    token_refresh_margin = 30  # Seconds before expiry when a token is refreshed in the background.
+    token_default_ttl = 60  # Token lifetime in seconds when the auth server does not return expires_in.
+
+    # Callback tokens issued by POST /token/{trial_id}. See utils/token_store.py.
+    callback_token_ttl = 7 * 24 * 3600  # Seconds a callback token is valid, 0 for no expiry. Must cover a trial.
+    callback_token_sweep_interval = 60  # Seconds between removals of expired callback tokens.
+
+    # Trial document cache for trial_repository
+    trial_cache_ttl = 10  # Seconds a trial document is used without revalidating it with a conditional GET.
+
+    # Trial workflows, compiled from the JSON files of workflow_dir. See executor/workflow.py.
+    workflow_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workflows")
+    default_workflow = "default"  # Workflow of trials whose facility or trial document doesn't select one.
+    facility_workflows = {}  # Workflow by facility of the trial document, e.g. {"EUR": "vnf"}
+
+    # Retry policy of failed states. Delay before retry n is base_delay * 2 ** (n - 1) seconds, capped to max_delay,
+    # of which the jitter fraction is randomized. Retries are off by default, because states such as SliceDeployment
+    # create resources and a retry after a lost response duplicates them. The idempotent states of the shipped
+    # workflows enable retries in config/workflows.
+    retry_policy = {
+        "max_attempts": 1,  # Runs of a state in total. 1 disables retries.
+        "base_delay": 1.0,
+        "max_delay": 30.0,
+        "jitter": 1.0,  # 0: fixed delays, 1: full jitter.
+        "retry_statuses": [408, 425, 429, 500, 502, 503, 504],  # Status codes of the last response to retry.
+        "retry_unanswered": False  # Retry states that failed without a response. Only for idempotent states.
+    }
+    retry_policies = {}  # Per state overrides, e.g. {"SliceDeployment": {"max_attempts": 5}}
+
+    # Seconds to wait for a callback after a state before the executor fails, e.g. {"SliceDeployment": 600}.
+    wait_timeouts = {}
 
     # Facilites mapping
     facilities = {
@@ -56,7 +155,8 @@ class Settings(BaseSettings):
         "apikey": "",
         "token": True,
         "auth_url": "http://localhost:5001/monitoring/token",
-        "token_payload": {"grant_type": "client_credentials", "client_id": "test", "client_secret": "test"}
+        "token_payload": {"grant_type": "client_credentials", "client_id": "test", "client_secret": "test"},
+        "batch_markings": False  # True: send trial and slice markings as one list to /markKPIData
     }
     abstraction_layer = {
         "url": "http://localhost:5001",
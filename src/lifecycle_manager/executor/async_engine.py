@@ -0,0 +1,216 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Asyncio engine mode. Executors of all trials run as coroutines on one shared event loop."""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Thread, Event, Lock
+
+from lifecycle_manager.executor.engine import Engine
+from lifecycle_manager.executor.executor import Executor, UnfinishedExecution
+from lifecycle_manager.utils.mailbox import Mailbox, RUN, STATE, FAIL, STOP, BRANCH
+from lifecycle_manager.utils.metrics import STATE_DURATION
+from lifecycle_manager.utils.tracing import TRACER
+
+_RUNTIME = None
+_RUNTIME_LOCK = Lock()
+
+
+class EventLoopRuntime(Thread):
+    """Thread running the event loop shared by all asyncio engines.
+
+    Blocking state code is run in a bounded worker pool, so the number of threads does not grow with trials.
+    """
+
+    def __init__(self, max_workers=32):
+        super().__init__(name='executor-event-loop', daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='executor-worker')
+        self._ready = Event()
+
+    def run(self):
+        """Run the event loop forever."""
+        asyncio.set_event_loop(self.loop)
+        self.loop.set_default_executor(self.pool)
+        self._ready.set()
+        self.loop.run_forever()
+
+    def wait_ready(self, timeout=None):
+        """Block until the event loop is running."""
+        return self._ready.wait(timeout)
+
+    def call_soon(self, callback, *args):
+        """Schedule callback on the event loop from any thread."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def submit(self, coroutine):
+        """Submit coroutine to the event loop from any thread. Return concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+def get_runtime(max_workers=32):
+    """Return the process wide event loop runtime. Started on first use."""
+    global _RUNTIME  # pylint: disable=W0603
+    with _RUNTIME_LOCK:
+        if _RUNTIME is None:
+            _RUNTIME = EventLoopRuntime(max_workers)
+            _RUNTIME.start()
+            _RUNTIME.wait_ready()
+        return _RUNTIME
+
+
+class AsyncExecutor(Executor):
+    """State machine coroutine. Provides the same interface as the Executor thread."""
+
+    def __init__(self, engine, _id, services, restore_dict=None):
+        self._runtime = engine.runtime
+        self._wakeup = None
+        self._future = None
+        super().__init__(engine, _id, services, restore_dict)
+
+    def _create_mailbox(self):
+        """Create mailbox that wakes up the executor coroutine on new messages."""
+        return Mailbox(notify=self._wake)
+
+    def _wake(self):
+        """Wake up the executor coroutine."""
+        if self._wakeup is not None:
+            self._runtime.call_soon(self._wakeup.set)
+
+    def start(self):
+        """Start executor coroutine on the shared event loop. Return the future of the coroutine."""
+        self._future = self._runtime.submit(self._run_async())
+        return self._future
+
+    def is_alive(self):
+        """Return True while the executor coroutine is running."""
+        return self._future is not None and not self._future.done()
+
+    def join(self, timeout=None):
+        """Wait until the executor coroutine has finished. Do not call from the event loop."""
+        if self._future is not None:
+            wait([self._future], timeout)
+
+    async def _run_async(self):
+        """Start executor routine."""
+        logging.getLogger('__executor__').warning('%s Hello', self.name)
+        self._wakeup = asyncio.Event()
+        self._checkpoint()
+        self._schedule_run()
+        self._resume_branches()
+        try:
+            await self._main_logic_async()
+        except UnfinishedExecution:
+            logging.getLogger('__executor__').warning('%s Stopped before finish flag set.', self.name)
+        finally:
+            self.engine.executor_stopped(self)
+
+    async def _main_logic_async(self):
+        """Handle messages in order until stopped."""
+        loop = asyncio.get_event_loop()
+        while True:
+            message = self.mailbox.get_nowait()
+            if message is None:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            if self._is_stale(message):
+                continue
+
+            if message.kind == STOP:
+                self._handle_stop_event()
+                break
+
+            if message.kind == FAIL:
+                await loop.run_in_executor(None, self._handle_fail_event)
+
+            if message.kind == STATE:
+                self._handle_state_event(message.target)
+
+            if message.kind == RUN:
+                await self._handle_run_event_async()
+
+            if message.kind == BRANCH:
+                await self._handle_branch_event_async(message.target)
+
+    async def _handle_run_event_async(self):
+        """Run one state."""
+        try:
+            current_state = self._prepare_run()
+            if current_state is not None:
+                started = time.monotonic()
+                try:
+                    with TRACER.span(self.get_id, 'state', state=current_state) as span:
+                        result, _next = await self._states[current_state].run_async(self)
+                        span.update(result=result, next=_next)
+                finally:
+                    STATE_DURATION.observe(time.monotonic() - started, current_state)
+                self._complete_run(current_state, result, _next)
+        except Exception as _err:
+            logging.getLogger('__executor__').debug("Error: %s", _err)
+            self.set_fail_event()
+
+    async def _handle_branch_event_async(self, branch):
+        """Run one state of branch."""
+        try:
+            state = self._prepare_branch(branch)
+            if state is not None:
+                started = time.monotonic()
+                try:
+                    with TRACER.span(self.get_id, 'state', state=state, branch=branch) as span:
+                        result, _next = await self._states[state].run_async(self)
+                        span.update(result=result, next=_next)
+                finally:
+                    STATE_DURATION.observe(time.monotonic() - started, state)
+                self._complete_branch(branch, state, result, _next)
+        except Exception as _err:
+            logging.getLogger('__executor__').debug("Error: %s", _err)
+            self._fail_branch(branch)
+
+
+class AsyncEngine(Engine):
+    """Engine driving an AsyncExecutor. Provides the same interface as the Engine thread without own threads."""
+    executor_class = AsyncExecutor
+
+    def __init__(self, _id, services, restore_dict=None):
+        max_workers = services.async_worker_threads if services is not None else 32
+        self.runtime = get_runtime(max_workers)
+        super().__init__(_id, services, restore_dict)
+        self._engine_started = False
+        self._stop_requested = False
+        self._done = Event()
+
+    def start(self):
+        """Mark the engine started. Nothing runs until execute event is set."""
+        logging.getLogger('__executor__').info("Handler running...")
+        self._engine_started = True
+
+    def is_alive(self):
+        """Return True between start and stop."""
+        return self._engine_started and not self._done.is_set()
+
+    def join(self, timeout=None):
+        """Wait until the engine has stopped."""
+        self._done.wait(timeout)
+
+    def set_execute_event(self):
+        """Start executor coroutine."""
+        future = self.executor.start()
+        future.add_done_callback(self._executor_done)
+
+    def set_stop_event(self):
+        """Stop executor and engine."""
+        logging.getLogger('__executor__').info("Stopping executor if still alive.")
+        self._stop_requested = True
+        self.executor.set_stop_event()
+        if not self.executor.is_alive():
+            self._done.set()
+
+    def _executor_done(self, _future):
+        """Called when executor coroutine returns."""
+        if self._stop_requested:
+            self._done.set()
@@ -0,0 +1,136 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Durable checkpoints of executors in an append-only SQLite journal (WAL mode)."""
+import json
+import logging
+import os
+import sqlite3
+import time
+from queue import Queue
+from threading import Event, Lock, Thread
+
+ACTIVE = 'active'
+FAILED = 'failed'
+CLOSED = 'closed'
+
+_CHECKPOINT_STORES = {}
+_CHECKPOINT_STORES_LOCK = Lock()
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS checkpoints (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    trial_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    state TEXT,
+    data TEXT,
+    created REAL NOT NULL)"""
+
+
+class CheckpointStore(Thread):
+    """Journal of executor checkpoints.
+
+    save() serializes the checkpoint in the calling thread and returns. A writer thread appends waiting checkpoints
+    in one transaction, so executors do not wait for the disk. The latest row of each trial is its current checkpoint.
+    After a trial is closed, the writer compacts the journal, at most once in compact_interval seconds.
+    """
+
+    def __init__(self, path, compact_interval=60):
+        super().__init__(name='checkpoint-writer', daemon=True)
+        self.path = path
+        self.compact_interval = compact_interval
+        self._compacted = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(_SCHEMA)
+        self._connection.execute('CREATE INDEX IF NOT EXISTS checkpoints_trial ON checkpoints (trial_id, seq)')
+        self._connection.commit()
+        self._lock = Lock()
+        self._queue = Queue()
+        self._closed = False
+        self.start()
+
+    def save(self, trial_id, snapshot, status=ACTIVE):
+        """Append checkpoint of trial. snapshot is a dict of executor variables, see Executor.snapshot."""
+        state = snapshot.get('_run_params', {}).get('current_state')
+        data = json.dumps(snapshot, default=str)
+        self._queue.put((str(trial_id), status, state, data, time.time()))
+
+    def close_trial(self, trial_id):
+        """Mark trial closed, e.g. finished or removed. Closed trials are not recovered."""
+        self._queue.put((str(trial_id), CLOSED, None, None, time.time()))
+
+    def flush(self, timeout=None):
+        """Block until all checkpoints saved so far are written. Return True if they were."""
+        written = Event()
+        self._queue.put(written)
+        return written.wait(timeout)
+
+    def run(self):
+        """Write checkpoints from the queue."""
+        while True:
+            rows, events = [], []
+            item = self._queue.get()
+            while True:
+                if isinstance(item, Event):
+                    events.append(item)
+                else:
+                    rows.append(item)
+                if self._queue.empty():
+                    break
+                item = self._queue.get()
+            self._write(rows)
+            if any(row[1] == CLOSED for row in rows):
+                self._closed = True
+            if self._closed and time.monotonic() - self._compacted >= self.compact_interval:
+                self._compact_in_writer()
+            for event in events:
+                event.set()
+
+    def _write(self, rows):
+        """Append rows in one transaction."""
+        if not rows:
+            return
+        try:
+            with self._lock, self._connection:
+                self._connection.executemany(
+                    'INSERT INTO checkpoints (trial_id, status, state, data, created) VALUES (?, ?, ?, ?, ?)', rows)
+        except sqlite3.Error as write_error:
+            logging.getLogger('__executor__').error("Writing %d checkpoints failed: %s", len(rows), str(write_error))
+
+    def _compact_in_writer(self):
+        """Compact the journal from the writer thread."""
+        try:
+            self.compact()
+        except sqlite3.Error as compact_error:
+            logging.getLogger('__executor__').error("Compacting checkpoints failed: %s", str(compact_error))
+        self._closed = False
+        self._compacted = time.monotonic()
+
+    def latest(self, statuses=(ACTIVE,)):
+        """Return {trial_id: snapshot} of the latest checkpoint of each trial with one of statuses."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT trial_id, status, data FROM checkpoints WHERE seq IN '
+                '(SELECT MAX(seq) FROM checkpoints GROUP BY trial_id)').fetchall()
+        return {trial_id: json.loads(data) for trial_id, status, data in rows if status in statuses}
+
+    def compact(self):
+        """Delete superseded checkpoints and closed trials."""
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM checkpoints WHERE seq NOT IN '
+                                     '(SELECT MAX(seq) FROM checkpoints GROUP BY trial_id)')
+            self._connection.execute('DELETE FROM checkpoints WHERE status = ?', (CLOSED,))
+
+
+def get_checkpoint_store(path, compact_interval=60):
+    """Return the process wide checkpoint store of path."""
+    with _CHECKPOINT_STORES_LOCK:
+        if path not in _CHECKPOINT_STORES:
+            _CHECKPOINT_STORES[path] = CheckpointStore(path, compact_interval)
+        return _CHECKPOINT_STORES[path]
@@ -6,23 +6,28 @@
 
 """Handler thread for executor a executor instance."""
 import logging
-import time
-from threading import Thread, Event
+from threading import Thread
 
+from lifecycle_manager.executor.checkpoint import get_checkpoint_store, FAILED
 from lifecycle_manager.executor.executor import Executor
 from lifecycle_manager.executor.executor import UnhandledException
-from lifecycle_manager.utils.any_event import AnyEvent
+from lifecycle_manager.utils.mailbox import Mailbox, EXECUTE, STOP
 
 
 class Engine(Thread):
     """Thread to handle one executor instance. Provides functions to communicate to """
-    def __init__(self, _id, services):
+    executor_class = Executor
+
+    def __init__(self, _id, services, restore_dict=None):
         super().__init__()
         self.id = _id
         self.services = services
-        self.executor = Executor(self, _id, services)
-        self.process_check_thread = Thread(target=self.is_process_alive, args=[Event()])
-        self.events = self._create_events()
+        self.checkpoints = None
+        if services is not None and services.checkpoint_path:
+            self.checkpoints = get_checkpoint_store(services.checkpoint_path, services.checkpoint_compact_interval)
+        self.executor = self.executor_class(self, _id, services, restore_dict)
+        self.mailbox = Mailbox()
+        self._listeners = []
         self.backup = None
         self._shutdown = False
         self._failed = False
@@ -38,42 +43,58 @@ class Engine(Thread):
         """Getter for parameter self._finished."""
         return self._finished
 
-    @property
-    def _stop_event(self):
-        return self.events["stop"]
-
-    @property
-    def _execute_event(self):
-        return self.events["execute"]
-
-    @property
-    def _any_event(self):
-        return self.events["any"]
-
     def set_failed(self):
         """Set self._failed state to True"""
         self._failed = True
+        if self.checkpoints is not None:
+            self.checkpoints.save(self.id, self.executor.snapshot(), FAILED)
+        self._notify('failed')
 
     def set_finished(self):
         """Set self._finished state to True"""
         self._finished = True
+        self.close_checkpoints()
+        self._notify('finished')
+
+    def save_checkpoint(self, snapshot):
+        """Interface for the executor to save a durable checkpoint after a state transition."""
+        if self.checkpoints is not None:
+            self.checkpoints.save(self.id, snapshot)
+
+    def close_checkpoints(self):
+        """Mark the checkpoints of this trial closed, so that it is not recovered after restart."""
+        if self.checkpoints is not None:
+            self.checkpoints.close_trial(self.id)
+
+    def add_listener(self, callback):
+        """Register callback(engine, event) for executor notifications.
+
+        Events are 'finished', 'failed', 'stopped' (executor ended without finishing or failing) and 'restored'.
+        Callbacks are called from the executor, keep them short.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, event):
+        """Call listeners with event."""
+        for listener in list(self._listeners):
+            try:
+                listener(self, event)
+            except Exception as _err:
+                logging.getLogger('__executor__').error("Engine listener failed: %s", str(_err))
+
+    def executor_stopped(self, executor):
+        """Interface for the executor to tell that it has stopped."""
+        if executor is self.executor and not self._finished and not self._failed:
+            logging.getLogger('__executor__').info("Executor process is NOT alive.")
+            self._notify('stopped')
 
     def set_stop_event(self):
-        """Interface for other threads to set stop event."""
-        self._stop_event.set()
+        """Interface for other threads to stop the engine. Handled before other messages."""
+        self.mailbox.put(STOP, urgent=True)
 
     def set_execute_event(self):
-        """Interface for other threads to set execute event."""
-        self._execute_event.set()
-
-    @staticmethod
-    def _create_events():
-        """Create instances of needed events."""
-        stop_event = Event()
-        execute_event = Event()
-        fail_event = Event()
-        any_event = AnyEvent(stop_event, execute_event, fail_event)
-        return {"stop": stop_event, "execute": execute_event, "fail": fail_event, "any": any_event}
+        """Interface for other threads to start the executor."""
+        self.mailbox.put(EXECUTE, coalesce=True)
 
     def get_executor_responses(self):
         """Return executor responses."""
@@ -107,55 +128,41 @@ class Engine(Thread):
     def restore(self):
         """Create a new executor object and restore the state from previous backup."""
         logging.getLogger('__executor__').debug("Restoring executor status")
-        self.executor = Executor(self, '', self.services, self.backup)
+        self.executor = self.executor_class(self, self.id, self.services, self.backup)
         self._failed = False
+        self._notify('restored')
         self.set_execute_event()
 
     def _wait_and_handle_events(self):
-        """Wait until an event is set."""
+        """Handle messages in order until stopped."""
         try:
-            while self._any_event.wait():
-                if self._stop_event.is_set():
+            while True:
+                message = self.mailbox.get()
+                if message.kind == STOP:
                     self._handle_stop_event()
                     break
 
-                if self._execute_event.is_set():
-                    self._execute_event.clear()
+                if message.kind == EXECUTE:
                     self._handle_execute_event()
         except Exception as _err:
             logging.getLogger('__executor__').error(str(_err))
             raise UnhandledException() from _err
 
     def _handle_fail_event(self):
-        """Stop executor and check thread and restore."""
+        """Stop executor and restore."""
         logging.getLogger('__executor__').error("Executor failed!")
         if self.executor.is_alive():
             self.executor.set_stop_event()
             self.executor.join()
-        if self.process_check_thread.is_alive():
-            self.process_check_thread.join()
         self._failed = True
 
     def _handle_execute_event(self):
-        """Start executor and process check thread."""
+        """Start executor."""
         self.executor.start()
-        self.process_check_thread = Thread(target=self.is_process_alive, args=[Event()])
-        self.process_check_thread.start()
 
     def _handle_stop_event(self):
-        """Stop executor and check thread."""
+        """Stop executor."""
         logging.getLogger('__executor__').info("Stopping executor if still alive.")
         if self.executor.is_alive():
             self.executor.set_stop_event()
             self.executor.join()
-        if self.process_check_thread.is_alive():
-            self.process_check_thread.join()
-
-    def is_process_alive(self, stop_event):
-        """Check that executor processes are alive."""
-        logging.getLogger('__executor__').info("Process check thread started")
-        while not stop_event.is_set():
-            time.sleep(1)
-            if not self.executor.is_alive():
-                logging.getLogger('__executor__').info("CheckThread: Executor process is NOT alive.")
-                stop_event.set()
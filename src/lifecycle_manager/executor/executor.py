@@ -5,11 +5,17 @@
 
 """Executor thread (state machine)."""
 import logging
-import importlib
-import os
-from threading import Thread, Event
+import time
+from threading import Thread
 
-from lifecycle_manager.utils.any_event import AnyEvent
+from lifecycle_manager.executor.failure_reports import get_failure_sink
+from lifecycle_manager.executor.retry import RetryPolicy
+from lifecycle_manager.executor.state_graph import STATE_GRAPH
+from lifecycle_manager.executor.workflow import select_workflow, workflow_graph
+from lifecycle_manager.utils.metrics import STATE_DURATION
+from lifecycle_manager.utils.timer_service import get_timer_service
+from lifecycle_manager.utils.tracing import TRACER
+from lifecycle_manager.utils.mailbox import Mailbox, MailboxFull, RUN, STATE, FAIL, STOP, BRANCH
 
 
 class UnhandledException(Exception):
@@ -30,40 +36,28 @@ class Executor(Thread):
     def __init__(self, engine, _id, services, restore_dict=None):
         super().__init__()
         self.engine = engine
-        self._states = None
-        self._create_states()
         self.id = _id
         self.services = services
         self._trial_info = {"trialID": _id}
         self._run_params = {'current_state': 'GetCallbackToken', 'wanted_state': None,
                             'retries': 0, 'state_lock': False, 'finished': False, 'kpi_status': None,
-                            'status': 'Stopped', 'token': None, 'slice_created': False}
+                            'status': 'Stopped', 'token': None, 'slice_created': False, 'previous_state': None,
+                            'last_status': None, 'workflow': None, 'branches': {}, 'join': None,
+                            'parked': None}
+        self._graph = None
+        self._states = None
+        self._create_states()
+        if self._graph.start is not None:
+            self._set_current_state(self._graph.start)
         self._responses = {}
         self._shutdown = False
-        self.events = self._create_events()
+        self._timer = None
+        self._timer_generation = 0
+        self._wait_started = None
+        self.mailbox = self._create_mailbox()
         if restore_dict is not None:
             self._restore(restore_dict)
 
-    @property
-    def _stop_event(self):
-        return self.events['stop']
-
-    @property
-    def _run_event(self):
-        return self.events['run']
-
-    @property
-    def _fail_event(self):
-        return self.events['fail']
-
-    @property
-    def _state_event(self):
-        return self.events['state']
-
-    @property
-    def _any_event(self):
-        return self.events['any']
-
     @property
     def get_trial_information(self):
         """Get parameter."""
@@ -140,6 +134,18 @@ class Executor(Thread):
         """Set parameter."""
         self._run_params['retries'] = retries
 
+    def set_last_status(self, status_code):
+        """Set status code of the last response received by the current state."""
+        self._run_params['last_status'] = status_code
+
+    def _get_last_status(self):
+        """Get parameter."""
+        return self._run_params.get('last_status')
+
+    def park(self, service, retry_after):
+        """Park the current state instead of failing it, because the circuit of service is open."""
+        self._run_params['parked'] = {'service': service, 'retry_after': retry_after}
+
     def _set_finished(self):
         """Set parameter."""
         self._run_params['finished'] = True
@@ -160,68 +166,86 @@ class Executor(Thread):
             self._run_params['state_lock'] = True
 
     def set_stop_event(self):
-        """Interface for other threads to set stop event."""
-        self._stop_event.set()
+        """Interface for other threads to stop the executor. Handled before other messages."""
+        self.mailbox.put(STOP, urgent=True)
 
     def set_run_event(self):
-        """Interface for other threads to set collect event."""
-        self._run_event.set()
+        """Interface for other threads to run the current state."""
+        self.mailbox.put(RUN, coalesce=True)
 
     def set_fail_event(self):
-        """Interface for other threads to set collect event."""
-        self._fail_event.set()
+        """Interface for other threads to signal failure of the current state."""
+        self.mailbox.put(FAIL, coalesce=True)
 
-    def set_state_event(self):
-        """Interface for other threads to set collect event."""
-        self._state_event.set()
+    def set_state_event(self, _state):
+        """Interface for other threads to request a state change."""
+        self.mailbox.put(STATE, _state)
+
+    def set_branch_event(self, branch):
+        """Run the current state of branch."""
+        self.mailbox.put(BRANCH, branch, coalesce=True)
 
     @staticmethod
-    def _create_events():
-        """Create instances of needed events."""
-        stop_event = Event()
-        run_event = Event()
-        fail_event = Event()
-        state_event = Event()
-        any_event = AnyEvent(stop_event, run_event, state_event, fail_event)
-        return {"stop": stop_event, "run": run_event, "fail": fail_event, "state": state_event, "any": any_event}
+    def _create_mailbox():
+        """Create mailbox for messages to the executor."""
+        return Mailbox()
 
     def set_state(self, _state):
-        """Interface for other threads to set next state for the state machine."""
-        self._run_params['wanted'] = _state
+        """Interface for other threads to set next state for the state machine.
+
+        Return 1 if the executor is not waiting or the workflow does not allow the state after the waited state.
+        The state is checked again when the message is handled, in case the executor has moved on.
+        """
         if self.is_alive() and self.get_status == 'Waiting':
-            logging.getLogger('__executor__').debug('Setting next state to: %s', _state)
-            self.set_state_event()
-            return 0
+            if not self._allows_request(_state):
+                logging.getLogger('__executor__').warning("Transition from %s to %s is not allowed.",
+                                                          self._run_params.get('previous_state'), _state)
+                return 1
+            return self._post_state(_state)
         logging.getLogger('__executor__').debug('Executor is not ready for state change.')
         return 1
 
+    def _allows_request(self, wanted):
+        """Return True if wanted state may be requested by a callback now."""
+        if wanted not in self._states:
+            return False
+        if self._waiting_branch(wanted) is not None:
+            return True
+        return self._graph.allows_request(self._run_params.get('previous_state'), wanted)
+
     def set_state_force(self, _state):
         """Interface for other threads to set next state for the state machine."""
-        self._run_params['wanted'] = _state
         if self.is_alive():
-            logging.getLogger('__executor__').debug('Setting next state to: %s', _state)
-            self.set_state_event()
-            return 0
+            return self._post_state(_state)
         logging.getLogger('__executor__').debug('Executor is not alive.')
         return 1
 
+    def _post_state(self, _state):
+        """Post state change message. Return 0 if successful."""
+        try:
+            self.set_state_event(_state)
+        except MailboxFull:
+            logging.getLogger('__executor__').error('Mailbox full, state change to %s rejected.', _state)
+            return 1
+        logging.getLogger('__executor__').debug('Setting next state to: %s', _state)
+        return 0
+
     def _create_states(self, statelist=None):
-        """Create states and return a dict of instantiated objects."""
-        _dict = {}
+        """Use the graph of the workflow of this executor, or a subset of the shared state graph with the listed
+        states only."""
         if statelist is None:
-            statelist = ['GetCallbackToken', 'RemoveCallbackToken', 'GetTrialInfo', 'Waiting',
-                         'SliceDeployment', 'UpdateDeploymentSlice', 'CloudVnfOnboarding',
-                         'UpdateCloudVnfBoardingStatus', 'CloudVnfDeployment',
-                         'UpdateCloudVnfDeploymentStatus', 'EdgeVnfOnboarding', 'UpdateEdgeVnfBoardingStatus',
-                         'EdgeVnfDeployment', 'UpdateEdgeVnfDeploymentStatus', 'Start5GresourceTesting',
-                         'EnforceUavPlan', 'UpdateUavPlanStatus', 'CreateMeasurementJob',
-                         'UpdateStatusIdle', 'SendKpiIdle', 'UpdateStatusActive', 'SendKpiActive',
-                         'UpdateStatusStopping', 'SendKpiFinish', 'DeleteMeasurementJob',
-                         'CloseService', 'UpdateStatusFinish', 'Finish', 'Fail']
-        for state in statelist:
-            _state = getattr(importlib.import_module("lifecycle_manager.executor.states"), state)
-            _dict[state] = _state()
-        self._states = _dict
+            self._graph = workflow_graph(self.services, self._run_params.get('workflow'))
+        else:
+            self._graph = STATE_GRAPH.subset(statelist)
+        self._states = self._graph.states
+
+    def select_workflow(self, facility=None, requested=None):
+        """Switch to the workflow of the facility or the requested workflow of the trial."""
+        if self.services is None:
+            return
+        self._run_params['workflow'] = select_workflow(self.services, facility, requested)
+        self._create_states()
+        logging.getLogger('__executor__').info("Using workflow %s.", self._run_params['workflow'])
 
     def add_response(self, endpoint, status_code):
         """Add response to collection."""
@@ -258,90 +282,172 @@ class Executor(Thread):
     def run(self):
         """Start executor routine."""
         logging.getLogger('__executor__').warning('%s Hello', self.name)
-        self.set_run_event()
+        self._checkpoint()
+        self._schedule_run()
+        self._resume_branches()
         try:
             self._main_logic()
         except UnfinishedExecution:
             logging.getLogger('__executor__').warning('%s Stopped before finish flag set.', self.name)
+        finally:
+            self.engine.executor_stopped(self)
+
+    def snapshot(self):
+        """Return variables needed to restore this executor."""
+        return {'_trial_info': self._trial_info, '_run_params': self._run_params, '_responses': self._responses}
 
     def _backup(self):
         """Get current status of needed variables and save them to engine thread."""
         logging.getLogger('__executor__').warning("Backing up current state of executor")
-        backup = {}
-        for item in vars(self):
-            if item in ['_trial_info', '_run_params', '_responses']:
-                backup[str(item)] = vars(self)[item]
-        self.engine.backup = backup
+        self.engine.backup = self.snapshot()
+
+    def _checkpoint(self):
+        """Save durable checkpoint of this executor through the engine."""
+        self.engine.save_checkpoint(self.snapshot())
 
     def _restore(self, restore_dict):
         """Restore backed up variables to current instance."""
         logging.getLogger('__executor__').info("Restoring from backup")
         for item in restore_dict:
             setattr(self, item, restore_dict[item])
+        self._set_retries(0)
+        self._run_params.pop('failed_state', None)
+        self._create_states()
         logging.getLogger('__executor__').debug("Restoring complete.")
 
     def _main_logic(self):
-        """Wait until an event is set."""
-        while self._any_event.wait():
-            if self._stop_event.is_set():
+        """Handle messages in order until stopped."""
+        while True:
+            message = self.mailbox.get()
+            if self._is_stale(message):
+                continue
+            if message.kind == STOP:
                 self._handle_stop_event()
                 break
 
-            if self._fail_event.is_set():
-                self._fail_event.clear()
+            if message.kind == FAIL:
                 self._handle_fail_event()
 
-            if self._state_event.is_set():
-                self._state_event.clear()
-                self._handle_state_event()
+            if message.kind == STATE:
+                self._handle_state_event(message.target)
 
-            if self._run_event.is_set():
-                self._run_event.clear()
+            if message.kind == RUN:
                 self._handle_run_event()
 
-    def _handle_state_event(self):
+            if message.kind == BRANCH:
+                self._handle_branch_event(message.target)
+
+    def _handle_state_event(self, wanted):
         """Set next state."""
         try:
-            logging.getLogger('__executor__').debug('Set next is: %s', self._run_params['wanted'])
-            if self._run_params['wanted'] in str(self._states):
-                self._run_params['current_state'] = self._run_params['wanted']
-                self._run_params['wanted'] = None
-                self.set_status('Running')
-                self._spin_state_lock()
-                self.set_run_event()
+            logging.getLogger('__executor__').debug('Set next is: %s', wanted)
+            branch = self._waiting_branch(wanted)
+            if branch is not None:
+                self._resume_branch(branch, wanted)
+                return
+            if self.get_current_state == 'Waiting':
+                allowed = self._graph.allows_request(self._run_params.get('previous_state'), wanted)
             else:
+                allowed = wanted in self._graph.forced
+            if wanted not in self._states:
                 logging.getLogger('__executor__').error("Requested state doesn't exist.")
+            elif not allowed:
+                logging.getLogger('__executor__').error("Transition from %s to %s is not allowed.",
+                                                        self.get_current_state, wanted)
+            else:
+                self._cancel_timer()
+                self._set_retries(0)
+                self._trace_wait(wanted)
+                self._run_params['previous_state'] = self.get_current_state
+                self._run_params['current_state'] = wanted
+                self._run_params['branches'] = {}
+                self._run_params['join'] = None
+                self.set_status('Running')
+                self._spin_state_lock()
+                self._checkpoint()
+                self._schedule_run()
         except Exception:
             logging.getLogger('__executor__').error("Processing state change failed.")
 
     def _handle_fail_event(self):
-        """Handle failure state."""
-        retries = self._get_retries()
-        if retries > 0:
-            self._set_retries(retries - 1)
-            self.set_run_event()
-        else:
-            self._backup()
-            try:
-                result, _next = self._states['Fail'].run(self)
-            except Exception:
-                logging.getLogger('__executor__').warning("%s", "Couldn't update repository status to failed." +
-                                                          "Probably connection issue or testing.")
-            try:
-                os.mkdir("logs")
-            except FileExistsError:
-                logging.getLogger('__executor__').info("log folder seems to already exist.")
-            except Exception:
-                logging.getLogger('__executor__').error("")
-            log = open('logs/executor_' + self.id + '_fail.log', 'w')
-            log.write("PARAMETERS: " + str(self._run_params) + "\n" + "RESPONSES: " + str(self._responses))
-            log.close()
+        """Handle failure state. Retry the current state later if its retry policy allows it.
+
+        A state that failed in a branch has used its retries already and fails the trial.
+        """
+        failed_state = self._run_params.get('failed_state')
+        if failed_state is None:
+            parked = self._run_params.get('parked')
+            if parked is not None and self.get_current_state != 'Waiting':
+                self._park(parked)
+                return
+            attempt = self._get_retries() + 1
+            policy = RetryPolicy.for_state(self.services, self.get_current_state, self._graph)
+            if self.get_current_state != 'Waiting' and policy.should_retry(attempt, self._get_last_status()):
+                delay = policy.delay(attempt)
+                logging.getLogger('__executor__').warning("%s failed (status %s), retry %d/%d in %.1f s.",
+                                                          self.get_current_state, self._get_last_status(), attempt,
+                                                          policy.max_attempts - 1, delay)
+                self._set_retries(attempt)
+                TRACER.event(self.get_id, 'retry', state=self.get_current_state, attempt=attempt, delay=delay,
+                             status=self._get_last_status())
+                self.set_status('Retrying')
+                self._start_timer(delay, RUN)
+                return
+            failed_state = self.get_current_state
+        self._backup()
+        TRACER.event(self.get_id, 'fail', state=failed_state, status=self._get_last_status())
+        try:
+            result, _next = self._states['Fail'].run(self)
+        except Exception:
+            logging.getLogger('__executor__').warning("%s", "Couldn't update repository status to failed." +
+                                                      "Probably connection issue or testing.")
+        options = self.services.failure_reports if self.services is not None else None
+        get_failure_sink(options).report(self.get_id, failed_state, self._run_params, self._responses)
         self.engine.set_failed()
-        self._stop_event.set()
+        self.set_stop_event()
+
+    def _park(self, parked):
+        """Run the current state again when the circuit of the service lets requests through. Not a retry."""
+        logging.getLogger('__executor__').warning("%s parked, circuit of %s is open. Running it again in %.1f s.",
+                                                  self.get_current_state, parked['service'], parked['retry_after'])
+        TRACER.event(self.get_id, 'park', state=self.get_current_state, **parked)
+        self.set_status('Parked')
+        self._checkpoint()
+        self._start_timer(parked['retry_after'], RUN)
+
+    def _schedule_run(self):
+        """Post run message for the current state, after the delay of the state if it has one."""
+        delay = self._graph.delays.get(self.get_current_state, 0)
+        if delay > 0:
+            self.set_status('Running')
+            self._start_timer(delay, RUN)
+        else:
+            self.set_run_event()
+
+    def _start_timer(self, delay, kind):
+        """Post RUN or FAIL message after delay seconds from the shared timer service without blocking the executor.
+
+        The message carries the generation of the timer. It is dropped if the timer was cancelled or replaced before
+        the message was handled, e.g. when a wait timeout fires while a state change is already in the mailbox.
+        """
+        self._cancel_timer()
+        self._timer = get_timer_service().call_later(delay, self.mailbox.put, kind, self._timer_generation, False, True)
+
+    def _is_stale(self, message):
+        """Return True if message was posted by a timer that has been cancelled or replaced since."""
+        return message.kind in (RUN, FAIL) and message.target is not None and message.target != self._timer_generation
+
+    def _cancel_timer(self):
+        """Cancel scheduled timer. Messages it has posted already become stale."""
+        self._timer_generation += 1
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
 
     def _handle_stop_event(self):
         """Stop this instance."""
         logging.getLogger('__executor__').info("Stopping executor.")
+        self._cancel_timer()
         self.set_status('Stopped')
         if self._get_finished():
             self.engine.set_finished()
@@ -352,27 +458,201 @@ class Executor(Thread):
     def _handle_run_event(self):
         """Run one state."""
         try:
-            current_state = self.get_current_state
-            if self._get_spinlock():
-                self._spin_state_lock()
-            self.set_status('Running')
-            logging.getLogger('__executor__').debug('Running: %s in: %s', str(self.get_current_state), self.name)
-            if current_state == 'Waiting':
-                self.set_status('Waiting')
-                logging.getLogger('__executor__').debug("Waiting for signal")
+            current_state = self._prepare_run()
+            if current_state is not None:
+                started = time.monotonic()
+                try:
+                    with TRACER.span(self.get_id, 'state', state=current_state) as span:
+                        result, _next = self._states[current_state].run(self)
+                        span.update(result=result, next=_next)
+                finally:
+                    STATE_DURATION.observe(time.monotonic() - started, current_state)
+                self._complete_run(current_state, result, _next)
+        except Exception as _err:
+            logging.getLogger('__executor__').debug("Error: %s", _err)
+            self.set_fail_event()
+
+    def _prepare_run(self):
+        """Prepare running the current state. Return its name or None when waiting for a signal."""
+        current_state = self.get_current_state
+        self.set_last_status(None)
+        self._run_params['parked'] = None
+        if self._get_spinlock():
+            self._spin_state_lock()
+        self.set_status('Running')
+        logging.getLogger('__executor__').debug('Running: %s in: %s', str(self.get_current_state), self.name)
+        if current_state == 'Waiting':
+            self.set_status('Waiting')
+            logging.getLogger('__executor__').debug("Waiting for signal")
+            if self._wait_started is None:
+                self._wait_started = (time.time(), time.monotonic())
+            self._start_wait_timeout()
+            return None
+        return current_state
+
+    def _trace_wait(self, resumed):
+        """Record span of waiting for a state change."""
+        if self._wait_started is not None:
+            start, started = self._wait_started
+            TRACER.record(self.get_id, 'wait', start, time.monotonic() - started,
+                          after=self._run_params.get('previous_state'), resumed=resumed)
+            self._wait_started = None
+
+    def _start_wait_timeout(self):
+        """Fail if no state change is requested in the wait timeout of the state waited after."""
+        if self.services is None:
+            return
+        waited_after = self._run_params.get('previous_state')
+        timeout = self.services.wait_timeouts.get(waited_after, self._graph.wait_timeouts.get(waited_after))
+        if timeout is not None:
+            self._start_timer(timeout, FAIL)
+
+    def _complete_run(self, current_state, result, _next):
+        """Handle the result of a state and move on to the next one."""
+        if result != 0:
+            self.set_fail_event()
+        else:
+            if current_state == "Finish":
+                self._set_finished()
+                self.set_stop_event()
             else:
-                result, _next = self._states[current_state].run(self)
-                if result != 0:
-                    self.set_fail_event()
-                else:
-                    if current_state == "Finish":
-                        self._set_finished()
-                        self.set_stop_event()
-                    else:
-                        self._set_retries(0)
-                        if not self._get_spinlock():
-                            self._set_current_state(_next)
-                            self.set_run_event()
+                self._set_retries(0)
+                if not self._get_spinlock():
+                    _next = self._graph.next_state(current_state, _next)
+                    if not self._graph.allows_next(current_state, _next):
+                        logging.getLogger('__executor__').error("State %s returned %s, which is not an allowed "
+                                                                "next state.", current_state, _next)
+                        self.set_fail_event()
+                        return
+                    self._run_params['previous_state'] = current_state
+                    self._set_current_state(_next)
+                    if current_state in self._graph.forks:
+                        self._fork(current_state)
+                    self._checkpoint()
+                    self._schedule_run()
+                    self._resume_branches()
+
+    def _fork(self, state):
+        """Start the branches of state. The executor waits until all of them have ended."""
+        self._run_params['branches'] = {start: {'current': start, 'previous': None, 'ended': False, 'retries': 0}
+                                        for start in self._graph.forks[state]}
+        self._run_params['join'] = self._graph.joins[state]
+        TRACER.event(self.get_id, 'fork', state=state, branches=list(self._run_params['branches']))
+
+    def _resume_branches(self):
+        """Post run message for each branch that is not waiting or ended."""
+        for branch, info in self._run_params.get('branches', {}).items():
+            if not info['ended'] and info['current'] != 'Waiting':
+                self.set_branch_event(branch)
+
+    def _waiting_branch(self, wanted):
+        """Return the branch waiting for wanted state or None."""
+        for branch, info in list(self._run_params.get('branches', {}).items()):
+            if info['current'] == 'Waiting' and wanted in self._graph.resumes.get(info['previous'], ()):
+                return branch
+        return None
+
+    def _resume_branch(self, branch, wanted):
+        """Continue waiting branch from wanted state."""
+        info = self._run_params['branches'][branch]
+        TRACER.event(self.get_id, 'resume', branch=branch, after=info['previous'], resumed=wanted)
+        info['current'] = wanted
+        self._checkpoint()
+        self.set_branch_event(branch)
+
+    def _prepare_branch(self, branch):
+        """Return the state to run in branch or None if the branch is waiting or has ended."""
+        info = self._run_params.get('branches', {}).get(branch)
+        if info is None or info['ended'] or info['current'] == 'Waiting':
+            return None
+        self.set_last_status(None)
+        self._run_params['parked'] = None
+        logging.getLogger('__executor__').debug('Running: %s in branch %s of %s', info['current'], branch,
+                                                self.name)
+        return info['current']
+
+    def _handle_branch_event(self, branch):
+        """Run one state of branch."""
+        try:
+            state = self._prepare_branch(branch)
+            if state is not None:
+                started = time.monotonic()
+                try:
+                    with TRACER.span(self.get_id, 'state', state=state, branch=branch) as span:
+                        result, _next = self._states[state].run(self)
+                        span.update(result=result, next=_next)
+                finally:
+                    STATE_DURATION.observe(time.monotonic() - started, state)
+                self._complete_branch(branch, state, result, _next)
         except Exception as _err:
             logging.getLogger('__executor__').debug("Error: %s", _err)
+            self._fail_branch(branch)
+
+    def _complete_branch(self, branch, state, result, _next):
+        """Handle the result of a branch state. Join when the last branch ends."""
+        if result != 0:
+            logging.getLogger('__executor__').error("%s failed in branch %s.", state, branch)
+            self._fail_branch(branch)
+            return
+        info = self._run_params['branches'][branch]
+        if state in self._graph.ends:
+            info['ended'] = True
+            if all(other['ended'] for other in self._run_params['branches'].values()):
+                self._join()
+            else:
+                self._checkpoint()
+            return
+        _next = self._graph.next_state(state, _next)
+        if not self._graph.allows_next(state, _next):
+            logging.getLogger('__executor__').error("State %s returned %s, which is not an allowed "
+                                                    "next state.", state, _next)
+            self._run_params['failed_state'] = state
             self.set_fail_event()
+            return
+        info['previous'] = state
+        info['current'] = _next
+        info['retries'] = 0
+        self._checkpoint()
+        if _next != 'Waiting':
+            self.set_branch_event(branch)
+
+    def _fail_branch(self, branch):
+        """Run the state of branch again later if it was parked or its retry policy allows it, else fail the trial."""
+        parked = self._run_params.get('parked')
+        if parked is not None:
+            logging.getLogger('__executor__').warning("Branch %s parked, circuit of %s is open.", branch,
+                                                      parked['service'])
+            TRACER.event(self.get_id, 'park', branch=branch, **parked)
+            get_timer_service().call_later(parked['retry_after'], self.set_branch_event, branch)
+            return
+        info = self._run_params['branches'][branch]
+        state = info['current']
+        attempt = info.get('retries', 0) + 1
+        policy = RetryPolicy.for_state(self.services, state, self._graph)
+        if policy.should_retry(attempt, self._get_last_status()):
+            delay = policy.delay(attempt)
+            logging.getLogger('__executor__').warning("%s failed in branch %s (status %s), retry %d/%d in %.1f s.",
+                                                      state, branch, self._get_last_status(), attempt,
+                                                      policy.max_attempts - 1, delay)
+            info['retries'] = attempt
+            TRACER.event(self.get_id, 'retry', state=state, branch=branch, attempt=attempt, delay=delay,
+                         status=self._get_last_status())
+            self._checkpoint()
+            get_timer_service().call_later(delay, self.set_branch_event, branch)
+            return
+        self._run_params['failed_state'] = state
+        self.set_fail_event()
+
+    def _join(self):
+        """Continue from the join state after all branches have ended."""
+        join = self._run_params['join']
+        TRACER.event(self.get_id, 'join', state=join)
+        self._cancel_timer()
+        self._trace_wait(join)
+        self._run_params['branches'] = {}
+        self._run_params['join'] = None
+        self._run_params['previous_state'] = self.get_current_state
+        self._set_current_state(join)
+        self.set_status('Running')
+        self._checkpoint()
+        self._schedule_run()
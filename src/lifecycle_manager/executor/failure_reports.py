@@ -0,0 +1,124 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Failure reports of executors written as JSON lines to size rotated, gzip compressed files."""
+import gzip
+import json
+import logging
+import os
+import shutil
+from collections import deque
+from datetime import datetime
+from queue import Queue, Full
+from threading import Event, Lock, Thread
+
+from lifecycle_manager.config.services import Settings
+
+_FAILURE_SINKS = {}
+_FAILURE_SINKS_LOCK = Lock()
+
+
+class FailureReportSink(Thread):
+    """Writer thread for failure reports.
+
+    report() returns immediately. Reports are queued, at most queue_size of them, and written in batches. When the
+    file grows over max_bytes it is compressed to <path>.1.gz and older files are shifted, keeping backup_count.
+    The latest reports are kept in memory for recent().
+    """
+
+    def __init__(self, path, max_bytes, backup_count, queue_size, recent):
+        super().__init__(name='failure-report-writer', daemon=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue = Queue(queue_size)
+        self._recent = deque(maxlen=recent)
+        self._lock = Lock()
+        self.dropped = 0
+        self.start()
+
+    def report(self, trial_id, state, run_params, responses):
+        """Queue failure report of trial. Return the report."""
+        report = {"trialID": str(trial_id), "time": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S%z"),
+                  "state": state, "run_params": dict(run_params), "responses": dict(responses)}
+        line = json.dumps(report, default=str) + "\n"
+        with self._lock:
+            self._recent.append(report)
+        try:
+            self._queue.put_nowait(line)
+        except Full:
+            with self._lock:
+                self.dropped += 1
+            logging.getLogger('__executor__').error("Failure report queue full, report of %s not written.",
+                                                    trial_id)
+        return report
+
+    def recent(self, limit=None, trial_id=None):
+        """Return latest failure reports, newest first. Optionally only the reports of trial_id."""
+        with self._lock:
+            reports = list(reversed(self._recent))
+        if trial_id is not None:
+            reports = [report for report in reports if report["trialID"] == str(trial_id)]
+        return reports[:limit]
+
+    def flush(self, timeout=None):
+        """Block until all reports queued so far are written. Return True if they were."""
+        written = Event()
+        self._queue.put(written)
+        return written.wait(timeout)
+
+    def run(self):
+        """Write reports from the queue."""
+        while True:
+            lines, events = [], []
+            item = self._queue.get()
+            while True:
+                if isinstance(item, Event):
+                    events.append(item)
+                else:
+                    lines.append(item)
+                if self._queue.empty():
+                    break
+                item = self._queue.get()
+            try:
+                self._write(lines)
+            except OSError as write_error:
+                logging.getLogger('__executor__').error("Writing %d failure reports failed: %s",
+                                                        len(lines), str(write_error))
+            for event in events:
+                event.set()
+
+    def _write(self, lines):
+        """Append lines to the report file and rotate it when full."""
+        if not lines:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a') as report_file:
+            for line in lines:
+                report_file.write(line)
+        if os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        """Compress the report file to <path>.1.gz and shift older files."""
+        for index in range(self.backup_count - 1, 0, -1):
+            source = "{}.{}.gz".format(self.path, index)
+            if os.path.exists(source):
+                os.replace(source, "{}.{}.gz".format(self.path, index + 1))
+        if self.backup_count > 0:
+            with open(self.path, 'rb') as source, gzip.open(self.path + ".1.gz", 'wb') as target:
+                shutil.copyfileobj(source, target)
+        os.remove(self.path)
+
+
+def get_failure_sink(options=None):
+    """Return the process wide failure report sink of options. Missing options use Settings.failure_reports."""
+    options = dict(Settings().failure_reports, **(options or {}))
+    with _FAILURE_SINKS_LOCK:
+        if options["path"] not in _FAILURE_SINKS:
+            _FAILURE_SINKS[options["path"]] = FailureReportSink(**options)
+        return _FAILURE_SINKS[options["path"]]
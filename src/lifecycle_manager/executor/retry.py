@@ -0,0 +1,57 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Retry policies for failed states. Exponential backoff with jitter."""
+import random
+
+NO_RETRY = {"max_attempts": 1}
+
+
+class RetryPolicy:
+    """How a failed state is retried.
+
+    max_attempts: runs of the state in total, including the first one.
+    base_delay, max_delay: delay before retry n is base_delay * 2 ** (n - 1) seconds, at most max_delay.
+    jitter: fraction of the delay that is randomized, 0 for fixed delays and 1 for full jitter.
+    retry_statuses: HTTP status codes of the last response that are worth retrying.
+    retry_unanswered: True if a state that failed without a response (connection error, timeout or exception) is
+    retried. Only for idempotent states: the request may have been carried out although no response arrived.
+    """
+
+    def __init__(self, max_attempts=1, base_delay=1.0, max_delay=30.0, jitter=1.0, retry_statuses=(),
+                 retry_unanswered=False):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_unanswered = retry_unanswered
+
+    @classmethod
+    def for_state(cls, services, state, graph=None):
+        """Return policy of state from services. The policy of the state in the workflow graph and the per state
+        overrides of services are merged on top of the default policy."""
+        if services is None:
+            return cls(**NO_RETRY)
+        options = dict(services.retry_policy)
+        if graph is not None:
+            options.update(graph.retry_policies.get(state, {}))
+        options.update(services.retry_policies.get(state, {}))
+        return cls(**options)
+
+    def retryable(self, status_code):
+        """Return True if a state failing with status_code of its last response may be retried."""
+        if status_code is None:
+            return self.retry_unanswered
+        return status_code in self.retry_statuses
+
+    def should_retry(self, attempt, status_code):
+        """Return True if the state may run again after failing on attempt (1 for the first run)."""
+        return attempt < self.max_attempts and self.retryable(status_code)
+
+    def delay(self, attempt):
+        """Seconds to wait before running the state again after failing on attempt."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay - delay * self.jitter * random.random()
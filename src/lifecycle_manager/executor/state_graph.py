@@ -0,0 +1,88 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""State graph compiled once at import and shared by all executors."""
+import inspect
+
+from lifecycle_manager.executor import states
+
+
+class InvalidStateGraph(Exception):
+    """Raised when a state graph refers to states that do not exist."""
+
+
+class StateGraph:
+    """State instances and their allowed transitions. States hold no data, so one instance serves all executors."""
+
+    def __init__(self, state_classes):
+        self.states = {name: state_class() for name, state_class in state_classes.items()}
+        self.transitions = {name: frozenset(state.next_states) for name, state in self.states.items()}
+        self.resumes = {name: frozenset(state.resumes) for name, state in self.states.items()}
+        self.forced = frozenset(name for name, state in self.states.items() if state.forced)
+        self.delays = {name: state.delay for name, state in self.states.items() if state.delay > 0}
+        self.any_resume = frozenset().union(*self.resumes.values())
+        self.successors = {}
+        self.retry_policies = {}
+        self.wait_timeouts = {}
+        self.forks = {}
+        self.joins = {}
+        self.ends = frozenset()
+        self.name = None
+        self.start = None
+        self._validate()
+
+    @classmethod
+    def from_module(cls, module):
+        """Compile graph of all State subclasses of module."""
+        return cls({name: member for name, member in inspect.getmembers(module, inspect.isclass)
+                    if issubclass(member, states.State) and member is not states.State})
+
+    def _validate(self):
+        """Check that all referenced states exist."""
+        for name in self.states:
+            unknown = (self.transitions[name] | self.resumes[name]) - set(self.states)
+            if unknown:
+                raise InvalidStateGraph("State {} refers to unknown states: {}".format(name, sorted(unknown)))
+
+    def subset(self, names):
+        """Return graph of the named states only. Transitions to other states are dropped."""
+        graph = StateGraph.__new__(StateGraph)
+        graph.states = {name: self.states[name] for name in names}
+        graph.transitions = {name: self.transitions[name] & set(names) for name in names}
+        graph.resumes = {name: self.resumes[name] & set(names) for name in names}
+        graph.forced = self.forced & set(names)
+        graph.delays = {name: delay for name, delay in self.delays.items() if name in names}
+        graph.any_resume = frozenset().union(*graph.resumes.values())
+        graph.successors = {name: target for name, target in self.successors.items() if name in names}
+        graph.retry_policies = {name: policy for name, policy in self.retry_policies.items() if name in names}
+        graph.wait_timeouts = {name: timeout for name, timeout in self.wait_timeouts.items() if name in names}
+        graph.forks = {name: branches for name, branches in self.forks.items() if name in names}
+        graph.joins = {name: target for name, target in self.joins.items() if name in names}
+        graph.ends = self.ends & set(names)
+        graph.name = self.name
+        graph.start = self.start if self.start in names else None
+        return graph
+
+    def next_state(self, source, returned):
+        """Return the state following source. Workflows fix the successor, otherwise the state returned is used."""
+        return self.successors.get(source, returned)
+
+    def allows_next(self, source, target):
+        """Return True if state source may continue to target."""
+        return target in self.transitions.get(source, ())
+
+    def allows_request(self, waiting_after, target):
+        """Return True if target may be requested while waiting after state waiting_after.
+
+        If it is not known which state the executor waits after, any state resumable by a callback is allowed.
+        """
+        if target in self.forced:
+            return True
+        if waiting_after is None or waiting_after not in self.resumes:
+            return target in self.any_resume
+        return target in self.resumes[waiting_after]
+
+
+STATE_GRAPH = StateGraph.from_module(states)
@@ -5,62 +5,141 @@
 
 """States for statemachine."""
 
-import ast
+import asyncio
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import requests
-from requests.auth import HTTPBasicAuth
+from threading import Lock
+
+from lifecycle_manager.client.circuit_breaker import CircuitOpen
+from lifecycle_manager.client.session_pool import get_session_pool
+from lifecycle_manager.client.token_cache import get_token_cache
+from lifecycle_manager.client.trial_cache import get_trial_cache
+from lifecycle_manager.utils.metrics import HTTP_DURATION
+from lifecycle_manager.utils.tracing import TRACER
+
+_MARKING_POOL = None
+_MARKING_POOL_LOCK = Lock()
+
+
+def get_marking_pool(max_workers):
+    """Return the process wide worker pool for KPI markings sent next to the marking of the calling thread."""
+    global _MARKING_POOL  # pylint: disable=W0603
+    with _MARKING_POOL_LOCK:
+        if _MARKING_POOL is None:
+            _MARKING_POOL = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kpi-marking')
+        return _MARKING_POOL
+
+
+def request_access_token(session, service):
+    """Request a new access token for a token authenticated service. Return the token response.
+
+    The request bypasses the circuit breaker and rate limiter of the service, whose permit the caller holds.
+    """
+    response = session.request('POST', service["auth_url"],
+                               headers={'Content-type': 'application/x-www-form-urlencoded'},
+                               data=service["token_payload"], throttle=False, record=False)
+    response.raise_for_status()
+    return response.json()
 
 
 def form_and_send(executor, _type, service, _endpoint, _data=None, url_payload=None, headers=None):
-    """Create and send requests. Return response object."""
-    response = None
-    auth = None
-    if not headers:
-        if not service["apikey"] == "":
-            headers = {"Authorization": service["apikey"]}
-        elif not service["username"] == "" and not service["token"]:
-            auth = HTTPBasicAuth(service["username"], service["password"])
-        elif service["token"]:
-            try:
-                headers = {'Content-type': 'application/x-www-form-urlencoded'}
-                response = requests.post(service["auth_url"], headers=headers, data=service["token_payload"])
-                auth_token = response.json()["access_token"]
-                headers = {'Authorization': 'bearer ' + auth_token}
-            except Exception as request_error:
-                logging.getLogger('__executor__').error("Getting authentication token failed: %s") % str(request_error)
-                return None
-
-    if service["url"].startswith("https"):
-        if not executor.services.disable_cert_verification:
-            cert = executor.services.ca_bundle_path
-        else:
-            cert = False
-    else:
-        cert = False
+    """Create and send requests through the pooled session of the service. Return response object.
+
+    Return None without sending if the circuit of the service is open. The executor is then parked until the
+    circuit lets requests through again.
+    """
+    session = get_session_pool().session(executor.services, service)
+    try:
+        with session.permit(service["url"] + _endpoint) as waited:
+            return _send(executor, session, service, _type, _endpoint, _data, url_payload, headers, waited)
+    except CircuitOpen as circuit_open:
+        logging.getLogger('__executor__').warning(str(circuit_open))
+        park = getattr(executor, 'park', None)
+        if park is not None:
+            park(circuit_open.name, circuit_open.retry_after)
+        return None
+
+
+def _send(executor, session, service, _type, _endpoint, _data, url_payload, headers, waited):
+    """Send request of form_and_send while holding the permit of the service. Return response object or None."""
+    token_cache = None
+    if session.uses_token and not (headers and 'Authorization' in headers):
+        token_cache = get_token_cache(executor.services.token_refresh_margin, executor.services.token_default_ttl)
+        try:
+            auth_token = token_cache.get(session.name, lambda: request_access_token(session, service))
+            headers = dict(headers or {}, Authorization='bearer ' + auth_token)
+        except Exception as request_error:
+            logging.getLogger('__executor__').error("Getting authentication token failed: %s", str(request_error))
+            return None
 
     logging.getLogger('__executor__').info(service["url"] + _endpoint)
-    if _type == 'Get':
-        response = requests.get(service["url"] + _endpoint, auth=auth,
-                                verify=cert, timeout=30, headers=headers)
-    if _type == 'Post':
-        response = requests.post(service["url"] + _endpoint, auth=auth, verify=cert,
-                                 json=_data, params=url_payload, timeout=30, headers=headers)
-    if _type == 'Put':
-        response = requests.put(service["url"] + _endpoint, auth=auth, verify=cert,
-                                json=_data, params=url_payload, timeout=30, headers=headers)
-    if _type == 'Delete':
-        response = requests.delete(service["url"] + _endpoint, auth=auth, json=_data,
-                                   verify=cert, params=url_payload, timeout=30, headers=headers)
-
-    logging.getLogger('__executor__').debug(response.status_code)
+    start = time.time()
+    started = time.monotonic()
+    status = 'error'
+    try:
+        if _type == 'Get':
+            response = session.request('GET', service["url"] + _endpoint, headers=headers, throttle=False)
+        else:
+            response = session.request(_type.upper(), service["url"] + _endpoint, json=_data, params=url_payload,
+                                       headers=headers, throttle=False)
+        status = 'none' if response is None else str(response.status_code)
+    finally:
+        duration = time.monotonic() - started
+        HTTP_DURATION.observe(duration, session.name, _type.upper(), status)
+        TRACER.record(getattr(executor, 'get_id', None), 'http', start, duration, service=session.name,
+                      method=_type.upper(), endpoint=_endpoint, status=status, rate_limit_wait=round(waited, 3))
+
     if response is not None:
+        logging.getLogger('__executor__').debug(response.status_code)
+        set_last_status = getattr(executor, 'set_last_status', None)
+        if set_last_status is not None:
+            set_last_status(response.status_code)
+        if token_cache is not None and response.status_code == 401:
+            token_cache.invalidate(session.name)
         return response
     logging.getLogger('__executor__').error("No response object to return.")
     return None
 
 
+def get_trial_document(executor):
+    """Get trial document from the trial document cache. Return status code and TrialDocument."""
+    cache = get_trial_cache(executor.services.trial_cache_ttl)
+    return cache.get(executor.get_id, lambda headers: form_and_send(
+        executor, 'Get', executor.services.trial_repository, '/trial/' + executor.get_id + '/', headers=headers))
+
+
+def update_trial(executor, data):
+    """Update trial in trial_repository and drop its cached document. Return response object."""
+    response = form_and_send(executor, 'Put', executor.services.trial_repository, '/trial/' +
+                             executor.get_id + '/', data)
+    get_trial_cache(executor.services.trial_cache_ttl).invalidate(executor.get_id)
+    return response
+
+
+def send_kpi_markings(executor, marking):
+    """Mark KPI data with label for both the trial and the deployed slice. Return True if both succeeded.
+
+    The two markings are sent concurrently, the trial marking in the marking pool and the slice marking in the
+    calling thread, or as one list if kpi_monitoring has "batch_markings" set.
+    """
+    info = executor.get_trial_information
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S%z")
+    markings = []
+    for marking_id in (info["trialID"], info["DeployedSlice"]["Slice"]["id"]):
+        markings.append({"TrialID": marking_id, "MarkingID": marking_id, "Timestamp": timestamp, "Marking": marking})
+    service = executor.services.kpi_monitoring
+    if service.get("batch_markings", False):
+        responses = [form_and_send(executor, 'Post', service, '/markKPIData', markings)]
+    else:
+        future = get_marking_pool(executor.services.kpi_marking_workers).submit(
+            form_and_send, executor, 'Post', service, '/markKPIData', markings[0])
+        last = form_and_send(executor, 'Post', service, '/markKPIData', markings[1])
+        responses = [future.result(), last]
+    return all(response.status_code == 200 for response in responses)
+
+
 def make_body(trial_info: dict, _keys: list):
     """Create and return dict for request body."""
     temp = {}
@@ -70,14 +149,31 @@ def make_body(trial_info: dict, _keys: list):
 
 
 class State:
-    """State class parent."""
+    """State class parent.
+
+    next_states: states run() may return as next state.
+    resumes: states a callback may request while waiting after this state.
+    forced: True if the state can be requested at any time with set_state_force.
+    delay: seconds to wait before running the state. The executor is not blocked while waiting.
+    """
+    next_states = ()
+    resumes = ()
+    forced = False
+    delay = 0
+
     def run(self, executor):
         """State code."""
         assert 0, "not implemented"
 
+    async def run_async(self, executor):
+        """State code as a coroutine. Blocking state code is run in the worker pool of the event loop."""
+        return await asyncio.get_event_loop().run_in_executor(None, self.run, executor)
+
 
 class GetCallbackToken(State):
     """Get token for callback authentication."""
+    next_states = ('GetTrialInfo',)
+
     def run(self, executor):
         response = form_and_send(executor, 'Post', executor.services.lcm, '/token/' + executor.get_id)
         try:
@@ -91,6 +187,8 @@ class GetCallbackToken(State):
 
 class RemoveCallbackToken(State):
     """Clean up token from LCM."""
+    next_states = ('Finish',)
+
     def run(self, executor):
         response = form_and_send(executor, 'Delete', executor.services.lcm, '/token/' + executor.get_id,
                                  None, None, {"Authorization": executor.get_token})
@@ -101,29 +199,33 @@ class RemoveCallbackToken(State):
 
 class GetTrialInfo(State):
     """Initialization state."""
+    next_states = ('SliceDeployment',)
+
     def run(self, executor):
         """State code."""
         executor.set_status('Running')
-        response = form_and_send(executor, 'Get', executor.services.trial_repository, '/trial/' +
-                                 executor.get_id + '/', executor.get_trial_information)
-        executor.add_response('GetTrialInfo', response.status_code)
-        if response.status_code == 200:
+        status_code, document = get_trial_document(executor)
+        executor.add_response('GetTrialInfo', status_code)
+        if status_code == 200:
             temp = {}
             temp['target'] = "dummy"
-            temp['trialID'] = response.json()["id"]
-            temp['facility'] = executor.services.facilities[response.json()["facility"]]
-            temp['kpis'] = response.json()["kpis"]
-            temp['name'] = response.json()["name"]
+            temp['trialID'] = document.data["id"]
+            temp['facility'] = executor.services.facilities[document.data["facility"]]
+            temp['kpis'] = document.data["kpis"]
+            temp['name'] = document.data["name"]
             temp['KpiComponents'] = []
             temp['MeasurementJob'] = {}
             temp['DeployedSlice'] = {}
             executor.update_trial_info(temp)
+            executor.select_workflow(document.data["facility"], document.data.get("workflow"))
             return 0, 'SliceDeployment'
         return 1, None
 
 
 class Waiting(State):
     """Waiting state."""
+    next_states = ('Waiting',)
+
     def run(self, executor):
         """State code."""
         return 0, 'Waiting'
@@ -131,13 +233,15 @@ class Waiting(State):
 
 class SliceDeployment(State):
     """Deploy slice state."""
+    next_states = ('Waiting',)
+    resumes = ('UpdateDeploymentSlice',)
+
     def run(self, executor):
         """State code."""
         info = executor.get_trial_information
-        info_response = form_and_send(executor, 'Get', executor.services.trial_repository, '/trial/' +
-                                      executor.get_id + '/')
-        if info_response.status_code == 200 and info_response.json()["status"] == "APPROVED":
-            nst = {'nst': ast.literal_eval(info_response.json()["nst"])}
+        status_code, document = get_trial_document(executor)
+        if status_code == 200 and document.data["status"] == "APPROVED" and document.nst is not None:
+            nst = {'nst': document.nst}
             data = {"trialID": info["trialID"], 'NST': nst,
                     "facility": info["facility"], "Authorization": executor.get_token}
             url_payload = {'callback_url': executor.services.lcm['url'] + '/trial/' +
@@ -159,21 +263,23 @@ class SliceDeployment(State):
 
 class UpdateDeploymentSlice(State):
     """UpdateConfig."""
+    next_states = ('EnforceUavPlan',)
+
     def run(self, executor):
         """State code."""
         temp = {"status": "ACTIVATING_1"}
-        response = form_and_send(executor, 'Put', executor.services.trial_repository, '/trial/' +
-                                 executor.get_id + '/', temp)
+        response = update_trial(executor, temp)
         executor.add_response('UpdateDeploymentSlice', response.status_code)
         if response.status_code == 204:
-            if executor.services.disable_vnf:
-                return 0, 'EnforceUavPlan'
-            return 0, 'CloudVnfOnboarding'
+            return 0, 'EnforceUavPlan'
         return 1, None
 
 
 class CloudVnfOnboarding(State):
     """CloudVnfOnboarding."""
+    next_states = ('Waiting',)
+    resumes = ('UpdateCloudVnfBoardingStatus',)
+
     def run(self, executor):
         """State code."""
         data = {"Authorization": executor.get_token}
@@ -189,6 +295,8 @@ class CloudVnfOnboarding(State):
 
 class UpdateCloudVnfBoardingStatus(State):
     """UpdateConfig."""
+    next_states = ('CloudVnfDeployment',)
+
     def run(self, executor):
         """State code."""
         return 0, 'CloudVnfDeployment'
@@ -196,11 +304,13 @@ class UpdateCloudVnfBoardingStatus(State):
 
 class CloudVnfDeployment(State):
     """CloudVnfDeployment."""
+    next_states = ('Waiting',)
+    resumes = ('UpdateCloudVnfDeploymentStatus',)
+
     def run(self, executor):
         """State code."""
         data = {"Authorization": executor.get_token}
-        url_payload = {'callback_url': executor.services.lcm['url'] + ':' +
-                       str(executor.services.lcm['port']) + '/trial/' +
+        url_payload = {'callback_url': executor.services.lcm['url'] + '/trial/' +
                        executor.get_id + '/callback/cloudvnfdeployment'}
         response = form_and_send(executor, 'Post', executor.services.trial_enforcement,
                                  '/vnf/cloud/deployment?trialID=' + executor.get_id, data, url_payload)
@@ -212,6 +322,8 @@ class CloudVnfDeployment(State):
 
 class UpdateCloudVnfDeploymentStatus(State):
     """UpdateConfig."""
+    next_states = ('EdgeVnfOnboarding',)
+
     def run(self, executor):
         """State code."""
         return 0, 'EdgeVnfOnboarding'
@@ -219,6 +331,9 @@ class UpdateCloudVnfDeploymentStatus(State):
 
 class EdgeVnfOnboarding(State):
     """EdgeVnfOnboarding."""
+    next_states = ('Waiting',)
+    resumes = ('UpdateEdgeVnfBoardingStatus',)
+
     def run(self, executor):
         """State code."""
         data = {"Authorization": executor.get_token}
@@ -234,6 +349,8 @@ class EdgeVnfOnboarding(State):
 
 class UpdateEdgeVnfBoardingStatus(State):
     """UpdateConfig."""
+    next_states = ('EdgeVnfDeployment',)
+
     def run(self, executor):
         """State code."""
         return 0, 'EdgeVnfDeployment'
@@ -241,6 +358,9 @@ class UpdateEdgeVnfBoardingStatus(State):
 
 class EdgeVnfDeployment(State):
     """EdgeVnfDeployment."""
+    next_states = ('Waiting',)
+    resumes = ('UpdateEdgeVnfDeploymentStatus',)
+
     def run(self, executor):
         """State code."""
         data = {"Authorization": executor.get_token}
@@ -256,6 +376,8 @@ class EdgeVnfDeployment(State):
 
 class UpdateEdgeVnfDeploymentStatus(State):
     """UpdateConfig."""
+    next_states = ('Start5GresourceTesting',)
+
     def run(self, executor):
         """State code."""
         return 0, 'Start5GresourceTesting'
@@ -263,6 +385,8 @@ class UpdateEdgeVnfDeploymentStatus(State):
 
 class Start5GresourceTesting(State):
     """Start5GresourceTesting."""
+    next_states = ('EnforceUavPlan',)
+
     def run(self, executor):
         """State code."""
         data = make_body(executor.get_trial_information, ["trialID", "name", "facility", "target"])
@@ -276,13 +400,14 @@ class Start5GresourceTesting(State):
 
 class EnforceUavPlan(State):
     """EnforceUavPlan."""
+    next_states = ('UpdateUavPlanStatus',)
+
     def run(self, executor):
         """State code."""
         info = executor.get_trial_information
-        info_response = form_and_send(executor, 'Get', executor.services.trial_repository, '/trial/' +
-                                      executor.get_id + '/')
-        if info_response.status_code == 200:
-            flight_plan = {'flights': info_response.json()["flights"]}
+        status_code, document = get_trial_document(executor)
+        if status_code == 200:
+            flight_plan = {'flights': document.flights}
             data = {"trialID": info["trialID"], "flight_plan": flight_plan}
             response = form_and_send(executor, 'Post', executor.services.trial_enforcement, '/flightplan', data)
             executor.add_response('EnforceUavPlan', response.status_code)
@@ -293,12 +418,13 @@ class EnforceUavPlan(State):
 
 class UpdateUavPlanStatus(State):
     """UpdateConfig."""
+    next_states = ('CreateMeasurementJob',)
+
     def run(self, executor):
         """State code."""
         temp = {"status": "ACTIVATING_2"}
         executor.update_trial_info(temp)
-        response = form_and_send(executor, 'Put', executor.services.trial_repository, '/trial/' +
-                                 executor.get_id + '/', temp)
+        response = update_trial(executor, temp)
         executor.add_response('UpdateUavPlanStatus', response.status_code)
         if response.status_code == 204:
             return 0, 'CreateMeasurementJob'
@@ -307,13 +433,14 @@ class UpdateUavPlanStatus(State):
 
 class CreateMeasurementJob(State):
     """KpisRequest."""
+    next_states = ('SendKpiIdle',)
+
     def run(self, executor):
         """State code."""
         info = executor.get_trial_information
         layer = executor.services.abstraction_layer
-        info_response = form_and_send(executor, 'Get', executor.services.trial_repository, '/trial/' +
-                                      executor.get_id + '/')
-        if info_response.status_code == 200:
+        status_code, _document = get_trial_document(executor)
+        if status_code == 200:
             temp = {
                 "trialID": info["trialID"],
                 "facility": info["facility"],
@@ -339,16 +466,11 @@ class CreateMeasurementJob(State):
 
 class SendKpiIdle(State):
     """Send KPI label IDLE."""
+    next_states = ('UpdateStatusIdle',)
+
     def run(self, executor):
         """State code."""
-        info = executor.get_trial_information
-        temp = {"TrialID": info["trialID"], "MarkingID": info["trialID"],
-                "Timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S%z"), "Marking": "Idle"}
-        response_trial_id = form_and_send(executor, 'Post', executor.services.kpi_monitoring, '/markKPIData', temp)
-        temp["TrialID"] = info["DeployedSlice"]["Slice"]["id"]
-        temp["MarkingID"] = info["DeployedSlice"]["Slice"]["id"]
-        response_slice_id = form_and_send(executor, 'Post', executor.services.kpi_monitoring, '/markKPIData', temp)
-        if response_trial_id.status_code == 200 and response_slice_id.status_code == 200:
+        if send_kpi_markings(executor, "Idle"):
             executor.set_kpi_status("Idle")
             return 0, 'UpdateStatusIdle'
         return 1, None
@@ -356,12 +478,14 @@ class SendKpiIdle(State):
 
 class UpdateStatusIdle(State):
     """UpdateConfig."""
+    next_states = ('Waiting',)
+    resumes = ('SendKpiActive',)
+
     def run(self, executor):
         """State code."""
         temp = {"status": "IDLE"}
         executor.update_trial_info(temp)
-        response = form_and_send(executor, 'Put', executor.services.trial_repository, '/trial/' +
-                                 executor.get_id + '/', temp)
+        response = update_trial(executor, temp)
         executor.add_response('RequestKpiComponents', response.status_code)
         if response.status_code == 204:
             return 0, 'Waiting'
@@ -370,16 +494,11 @@ class UpdateStatusIdle(State):
 
 class SendKpiActive(State):
     """Send KPI label ACTIVE."""
+    next_states = ('UpdateStatusActive',)
+
     def run(self, executor):
         """State code."""
-        info = executor.get_trial_information
-        temp = {"TrialID": info["trialID"], "MarkingID": info["trialID"],
-                "Timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S%z"), "Marking": "Active"}
-        response_trial_id = form_and_send(executor, 'Post', executor.services.kpi_monitoring, '/markKPIData', temp)
-        temp["TrialID"] = info["DeployedSlice"]["Slice"]["id"]
-        temp["MarkingID"] = info["DeployedSlice"]["Slice"]["id"]
-        response_slice_id = form_and_send(executor, 'Post', executor.services.kpi_monitoring, '/markKPIData', temp)
-        if response_trial_id.status_code == 200 and response_slice_id.status_code == 200:
+        if send_kpi_markings(executor, "Active"):
             executor.set_kpi_status("Active")
             return 0, 'UpdateStatusActive'
         return 1, None
@@ -387,12 +506,13 @@ class SendKpiActive(State):
 
 class UpdateStatusActive(State):
     """UpdateConfig."""
+    next_states = ('Waiting',)
+
     def run(self, executor):
         """State code."""
         data = {"status": "ACTIVE"}
         executor.update_trial_info(data)
-        response = form_and_send(executor, 'Put', executor.services.trial_repository, '/trial/' +
-                                 executor.get_id + '/', data)
+        response = update_trial(executor, data)
         executor.add_response('UpdateStatusActive', response.status_code)
         if response.status_code == 204:
             return 0, 'Waiting'
@@ -401,12 +521,14 @@ class UpdateStatusActive(State):
 
 class UpdateStatusStopping(State):
     """UpdateConfig."""
+    next_states = ('SendKpiFinish',)
+    forced = True
+
     def run(self, executor):
         """State code."""
         data = {"status": "STOPPING"}
         executor.update_trial_info(data)
-        response = form_and_send(executor, 'Put', executor.services.trial_repository, '/trial/' +
-                                 executor.get_id + '/', data)
+        response = update_trial(executor, data)
         executor.add_response('UpdateStatusStopping', response.status_code)
         if response.status_code == 204:
             return 0, 'SendKpiFinish'
@@ -415,15 +537,10 @@ class UpdateStatusStopping(State):
 
 class SendKpiFinish(State):
     """Send KPI label FINISHED."""
+    next_states = ('DeleteMeasurementJob',)
+
     def run(self, executor):
-        info = executor.get_trial_information
-        temp = {"TrialID": info["trialID"], "MarkingID": info["trialID"],
-                "Timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S%z"), "Marking": "Finished"}
-        response_trial_id = form_and_send(executor, 'Post', executor.services.kpi_monitoring, '/markKPIData', temp)
-        temp["TrialID"] = info["DeployedSlice"]["Slice"]["id"]
-        temp["MarkingID"] = info["DeployedSlice"]["Slice"]["id"]
-        response_slice_id = form_and_send(executor, 'Post', executor.services.kpi_monitoring, '/markKPIData', temp)
-        if response_trial_id.status_code == 200 and response_slice_id.status_code == 200:
+        if send_kpi_markings(executor, "Finished"):
             executor.set_kpi_status('Finished')
             return 0, 'DeleteMeasurementJob'
         return 1, None
@@ -431,6 +548,8 @@ class SendKpiFinish(State):
 
 class DeleteMeasurementJob(State):
     """Delete MeasurementJob."""
+    next_states = ('CloseService',)
+
     def run(self, executor):
         """State code."""
         info = executor.get_trial_information
@@ -446,6 +565,9 @@ class DeleteMeasurementJob(State):
 
 class CloseService(State):
     """Close request."""
+    next_states = ('Waiting',)
+    resumes = ('UpdateStatusFinish',)
+
     def run(self, executor):
         """State code."""
         data = {"Authorization": executor.get_token}
@@ -461,12 +583,13 @@ class CloseService(State):
 
 class UpdateStatusFinish(State):
     """Update status to finish."""
+    next_states = ('RemoveCallbackToken',)
+
     def run(self, executor):
         """State code."""
         temp = {"status": "FINISHED"}
         executor.update_trial_info(temp)
-        response = form_and_send(executor, 'Put', executor.services.trial_repository, '/trial/' +
-                                 executor.get_id + '/', temp)
+        response = update_trial(executor, temp)
         executor.add_response('UpdateStatusFinish', response.status_code)
         if response.status_code == 204:
             return 0, 'RemoveCallbackToken'
@@ -475,9 +598,11 @@ class UpdateStatusFinish(State):
 
 class Finish(State):
     """Finish state."""
+    next_states = ()
+    delay = 2
+
     def run(self, executor):
         """State code."""
-        time.sleep(2)
         executor.set_status('Finished')
         logging.getLogger('__executor__').debug('Executor reached finish.')
         return 0, None
@@ -485,11 +610,12 @@ class Finish(State):
 
 class Fail(State):
     """Update failure status."""
+    next_states = ('Waiting',)
+
     def run(self, executor):
         """State code."""
         data = {"status": "FAILED"}
-        response = form_and_send(executor, 'Put', executor.services.trial_repository, '/trial/' +
-                                 executor.get_id + '/', data)
+        response = update_trial(executor, data)
         executor.add_response('Fail', response.status_code)
         if response.status_code == 204:
             return 0, 'Waiting'
@@ -498,14 +624,19 @@ class Fail(State):
 
 class FakeRun(State):
     """Fake state for testing."""
+    next_states = ('Waiting',)
+    resumes = ('FakeRun', 'Finish')
+    delay = 1
+
     def run(self, executor):
         """State code."""
-        time.sleep(1)
         return 0, 'Waiting'
 
 
 class FakeRunFail(State):
     """Fake state for testing."""
+    next_states = ()
+
     def run(self, executor):
         """State code."""
         return 1, None
@@ -513,8 +644,10 @@ class FakeRunFail(State):
 
 class FakeInit(State):
     """Init."""
+    next_states = ('FakeRun',)
+    delay = 2
+
     def run(self, executor):
         """State code."""
         executor.set_status('Running')
-        time.sleep(2)
         return 0, 'FakeRun'
@@ -0,0 +1,149 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Trial workflows defined in JSON files and compiled into state graphs.
+
+A workflow file names the first state and, for each state, the state that follows it:
+{
+    "start": "GetCallbackToken",
+    "states": {
+        "GetCallbackToken": {"next": "GetTrialInfo"},
+        "SliceDeployment": {"next": "UpdateDeploymentSlice", "wait": true, "wait_timeout": 600,
+                            "retry": {"max_attempts": 5}},
+        ...
+    }
+}
+"wait": the executor waits after the state until a callback requests "next" (or one of "resumes").
+"wait_timeout": seconds to wait for the callback before failing.
+"retry": retry policy options of the state, see executor/retry.py, or the name of a policy in the "retry_policies"
+dict of the workflow, e.g. {"retry_policies": {"idempotent": {"max_attempts": 3}}, "states": {...}}.
+"fork": states starting branches that run concurrently after the state. The executor waits until every branch
+has reached a state with "end": true and then continues to "next". Branches wait for their callbacks
+independently. "wait_timeout" of the forking state limits the time for all branches.
+Waiting, Fail and Finish are part of every workflow.
+"""
+import json
+import logging
+import os
+from threading import Lock
+
+from lifecycle_manager.executor.state_graph import STATE_GRAPH, StateGraph, InvalidStateGraph
+
+ALWAYS_INCLUDED = ('Waiting', 'Fail', 'Finish')
+
+_WORKFLOWS = {}
+_WORKFLOWS_LOCK = Lock()
+
+
+def compile_workflow(name, definition, base=STATE_GRAPH):
+    """Compile workflow definition into a state graph using the state instances of base."""
+    entries = definition.get("states", {})
+    names = set(entries) | set(ALWAYS_INCLUDED)
+    unknown = names - set(base.states)
+    if unknown:
+        raise InvalidStateGraph("Workflow {} refers to unknown states: {}".format(name, sorted(unknown)))
+    if definition.get("start") not in entries:
+        raise InvalidStateGraph("Workflow {} has no start state in its states.".format(name))
+
+    graph = StateGraph.__new__(StateGraph)
+    graph.name = name
+    graph.start = definition["start"]
+    graph.states = {state: base.states[state] for state in names}
+    graph.transitions = {state: base.transitions[state] & names for state in ALWAYS_INCLUDED}
+    graph.resumes = {state: frozenset() for state in names}
+    graph.successors = {}
+    graph.retry_policies = {}
+    graph.wait_timeouts = {}
+    graph.forks = {}
+    graph.joins = {}
+    graph.ends = frozenset(state for state, entry in entries.items() if entry.get("end", False))
+    for state, entry in entries.items():
+        target = entry.get("next")
+        if target is not None and target not in names:
+            raise InvalidStateGraph("Workflow {}: {} continues to unknown state {}".format(name, state, target))
+        if entry.get("fork"):
+            if target is None or set(entry["fork"]) - names:
+                raise InvalidStateGraph("Workflow {}: fork of {} needs next state and known branches.".format(
+                    name, state))
+            graph.forks[state] = tuple(entry["fork"])
+            graph.joins[state] = target
+            graph.successors[state] = 'Waiting'
+        elif state in graph.ends:
+            graph.successors[state] = None
+        elif entry.get("wait", False):
+            graph.successors[state] = 'Waiting'
+            graph.resumes[state] = frozenset(entry.get("resumes", [target] if target else []))
+        elif target is not None:
+            graph.successors[state] = target
+        elif state != 'Finish':
+            raise InvalidStateGraph("Workflow {}: {} has no next state.".format(name, state))
+        graph.transitions[state] = frozenset([graph.successors[state]]) if graph.successors.get(state) else frozenset()
+        if "retry" in entry:
+            graph.retry_policies[state] = _retry_policy(name, definition, state, entry["retry"])
+        if entry.get("wait_timeout") is not None:
+            graph.wait_timeouts[state] = entry["wait_timeout"]
+    for state, resumes in graph.resumes.items():
+        if resumes - names:
+            raise InvalidStateGraph("Workflow {}: {} resumes unknown states: {}".format(
+                name, state, sorted(resumes - names)))
+    graph.forced = base.forced & names
+    graph.delays = {state: delay for state, delay in base.delays.items() if state in names}
+    graph.any_resume = frozenset().union(*graph.resumes.values())
+    return graph
+
+
+def _retry_policy(name, definition, state, retry):
+    """Return retry policy options of state, looking up named policies in the workflow definition."""
+    if not isinstance(retry, str):
+        return dict(retry)
+    policies = definition.get("retry_policies", {})
+    if retry not in policies:
+        raise InvalidStateGraph("Workflow {}: {} refers to unknown retry policy {}".format(name, state, retry))
+    return dict(policies[retry])
+
+
+def load_workflows(directory):
+    """Compile all *.json workflow files of directory. Return {name: state graph}, name being the file name."""
+    workflows = {}
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith('.json'):
+            name = file_name[:-len('.json')]
+            with open(os.path.join(directory, file_name)) as workflow_file:
+                workflows[name] = compile_workflow(name, json.load(workflow_file))
+    return workflows
+
+
+def get_workflows(directory):
+    """Return the workflows of directory, compiled on first use."""
+    with _WORKFLOWS_LOCK:
+        if directory not in _WORKFLOWS:
+            _WORKFLOWS[directory] = load_workflows(directory)
+            logging.getLogger('__executor__').info("Compiled workflows: %s", sorted(_WORKFLOWS[directory]))
+        return _WORKFLOWS[directory]
+
+
+def default_workflow(services):
+    """Return name of the workflow used when neither the facility nor the trial selects one."""
+    if not services.disable_vnf:
+        return 'vnf'
+    return services.default_workflow
+
+
+def select_workflow(services, facility=None, requested=None):
+    """Return name of the workflow of a trial: by facility, else as requested by the trial, else the default."""
+    workflows = get_workflows(services.workflow_dir)
+    for name in (services.facility_workflows.get(facility), requested):
+        if name is not None:
+            if name in workflows:
+                return name
+            logging.getLogger('__executor__').error("Unknown workflow %s, using the default.", name)
+    return default_workflow(services)
+
+
+def workflow_graph(services, name=None):
+    """Return state graph of workflow name, or of the default workflow. Without services the shared state graph."""
+    if services is None:
+        return STATE_GRAPH
+    return get_workflows(services.workflow_dir)[name or default_workflow(services)]
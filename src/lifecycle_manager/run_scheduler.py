@@ -8,6 +8,7 @@ import logging
 
 from apscheduler.jobstores.base import ConflictingIdError
 
+from lifecycle_manager.client.session_pool import get_session_pool
 from lifecycle_manager.scheduler.scheduler_handler import SchedulerHandler
 from lifecycle_manager.heartbeat.heartbeat_handler import HeartbeatHandler
 
@@ -63,10 +64,27 @@ class RunScheduler:
         """Return a list of running Executor Engine instance ids and statuses."""
         return self.scheduler_handler.engine_instance_statuses
 
+    def get_admission_stats(self):
+        """Return executing and queued trials and admission wait times."""
+        return self.scheduler_handler.admission.stats()
+
+    @staticmethod
+    def get_circuit_breakers():
+        """Return circuit breaker state of the downstream services."""
+        return get_session_pool().circuits()
+
     def get_executor_engine_instances(self):
         """Return a list of running Executor Engine instances."""
         return self.scheduler_handler.engine_instances
 
+    def get_executor_engine_instance(self, trial_id):
+        """Return the Executor Engine instance of trial ID or None."""
+        return self.scheduler_handler.get_engine_instance(trial_id)
+
+    def count_executor_engine_instances(self):
+        """Return number of Executor Engine instances by status."""
+        return self.scheduler_handler.engines.count_by_status()
+
     def fetch_all_trials(self):
         """Interface for querying all trials from Trial registry."""
         success, message = self.scheduler_handler.fetch_all_trials()
@@ -77,11 +95,15 @@ class RunScheduler:
         success, message = self.scheduler_handler.fetch_trial(trial_id=trial_id)
         return success, message
 
-    def add_new_job(self, start_time_utc, trial_id):
+    def recover_engine_instances(self):
+        """Interface for recreating Engine instances from checkpoints after restart."""
+        return self.scheduler_handler.recover_engine_instances()
+
+    def add_new_job(self, start_time_utc, trial_id, priority=0):
         """Interface for adding a new job to Scheduler."""
         try:
             self.scheduler_handler.internal_scheduler.add_scheduled_job(start_date=start_time_utc,
-                                                                        trial_id=trial_id)
+                                                                        trial_id=trial_id, priority=priority)
             return True
         except ConflictingIdError:
             return False
@@ -0,0 +1,129 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module provides AdmissionQueue class, limiting the number of engines executing at the same time.
+
+Example usage:
+admission = AdmissionQueue(start_engine, max_active=50)
+admission.submit(trial_id)  # Starts the engine now or when a running one releases its slot.
+admission.release(trial_id)  # Called when the engine has finished, failed or stopped.
+
+Trials over the limit wait in the queue, in arrival order ("fifo") or by priority, lower first, and in arrival order
+within a priority ("priority").
+"""
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from threading import Lock
+
+
+class AdmissionQueue:
+    """Admission of trials to execution. start(trial_id, *args) is called for each admitted trial."""
+
+    def __init__(self, start, max_active=0, policy='fifo', wait_samples=100):
+        if policy not in ('fifo', 'priority'):
+            raise ValueError("Unknown admission policy: {}".format(policy))
+        self._start = start
+        self.max_active = max_active
+        self.policy = policy
+        self._active = set()
+        self._queue = []
+        self._queued = {}
+        self._counter = itertools.count()
+        self._waits = deque(maxlen=wait_samples)
+        self._lock = Lock()
+
+    def submit(self, trial_id, *args, priority=0):
+        """Start trial or queue it until a slot is free. Return True if started now."""
+        with self._lock:
+            if trial_id in self._active or trial_id in self._queued:
+                logging.warning("Trial %s is already admitted or queued.", trial_id)
+                return False
+            if self._has_slot():
+                self._active.add(trial_id)
+                self._waits.append(0.0)
+                admitted = True
+            else:
+                order = priority if self.policy == 'priority' else 0
+                entry = [order, next(self._counter), trial_id, time.monotonic(), args]
+                heapq.heappush(self._queue, entry)
+                self._queued[trial_id] = entry
+                admitted = False
+        if admitted:
+            self._start(trial_id, *args)
+        else:
+            logging.warning("Trial %s queued for admission, %d trials waiting.", trial_id, len(self._queued))
+        return admitted
+
+    def release(self, trial_id):
+        """Free the slot of trial and start the next queued trials."""
+        with self._lock:
+            self._active.discard(trial_id)
+        self._admit_next()
+
+    def readmit(self, trial_id):
+        """Count trial as executing again, e.g. after a restore. Restores are not queued."""
+        with self._lock:
+            self._active.add(trial_id)
+
+    def remove(self, trial_id):
+        """Remove queued trial. Return True if it was queued."""
+        with self._lock:
+            entry = self._queued.pop(trial_id, None)
+            if entry is None:
+                return False
+            entry[2] = None
+            return True
+
+    def _has_slot(self):
+        """Return True if one more trial may execute. Called with lock held."""
+        return self.max_active <= 0 or len(self._active) < self.max_active
+
+    def _admit_next(self):
+        """Start queued trials while there are free slots."""
+        while True:
+            with self._lock:
+                entry = self._pop()
+                if entry is None:
+                    return
+                _order, _count, trial_id, queued_at, args = entry
+                self._active.add(trial_id)
+                waited = time.monotonic() - queued_at
+                self._waits.append(waited)
+            logging.info("Trial %s admitted after %.1f s in queue.", trial_id, waited)
+            try:
+                self._start(trial_id, *args)
+            except Exception as _err:
+                logging.error("Starting admitted trial %s failed: %s", trial_id, str(_err))
+                with self._lock:
+                    self._active.discard(trial_id)
+
+    def _pop(self):
+        """Remove and return the next queued entry if a slot is free. Called with lock held."""
+        while self._queue and self._has_slot():
+            entry = heapq.heappop(self._queue)
+            if entry[2] is not None:
+                del self._queued[entry[2]]
+                return entry
+        return None
+
+    def stats(self):
+        """Return limit, executing and queued trials and wait times in seconds."""
+        now = time.monotonic()
+        with self._lock:
+            waits = sorted(self._waits)
+            oldest = min((entry[3] for entry in self._queued.values()), default=None)
+            return {
+                "policy": self.policy,
+                "max_active": self.max_active,
+                "active": len(self._active),
+                "queued": len(self._queued),
+                "oldest_wait_s": round(now - oldest, 3) if oldest is not None else 0.0,
+                "wait_p50_s": round(waits[len(waits) // 2], 3) if waits else 0.0,
+                "wait_max_s": round(waits[-1], 3) if waits else 0.0,
+            }
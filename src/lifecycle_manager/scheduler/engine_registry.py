@@ -0,0 +1,107 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module provides EngineRegistry class, holding the Engine instances of the process by trial ID.
+
+Example usage:
+engines = EngineRegistry()
+engines.add(engine_instance)  # Status "Active".
+engines.get(trial_id)  # Engine instance or None, without scanning the other instances.
+engines.set_status(trial_id, "Finished")
+engines.count_by_status()  # {"Active": ..., "Finished": ...}
+
+Trial IDs are also indexed by status, so counting or listing the engines of a status does not visit the others.
+"""
+from threading import Lock
+
+
+class EngineRegistry:
+    """Engine instances and their statuses by trial ID, in the order they were added. Thread safe."""
+
+    def __init__(self):
+        self._engines = {}
+        self._statuses = {}
+        self._by_status = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._engines)
+
+    def __contains__(self, trial_id):
+        return trial_id in self._engines
+
+    def add(self, engine_instance, status='Active'):
+        """Add engine instance under its trial ID. An instance of the same trial ID is replaced."""
+        with self._lock:
+            self._unindex(engine_instance.id)
+            self._engines[engine_instance.id] = engine_instance
+            self._index(engine_instance.id, status)
+
+    def get(self, trial_id):
+        """Return engine instance of trial ID or None."""
+        return self._engines.get(trial_id)
+
+    def remove(self, trial_id):
+        """Remove and return engine instance of trial ID or None."""
+        with self._lock:
+            self._unindex(trial_id)
+            return self._engines.pop(trial_id, None)
+
+    def clear(self):
+        """Remove and return all engine instances."""
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+            self._statuses.clear()
+            self._by_status.clear()
+            return engines
+
+    def set_status(self, trial_id, status):
+        """Set status of trial ID. Return False if there is no engine instance of the trial."""
+        with self._lock:
+            if trial_id not in self._engines:
+                return False
+            self._unindex(trial_id)
+            self._index(trial_id, status)
+            return True
+
+    def status(self, trial_id):
+        """Return status of trial ID or None."""
+        return self._statuses.get(trial_id)
+
+    def engines(self):
+        """Return list of engine instances."""
+        with self._lock:
+            return list(self._engines.values())
+
+    def trial_ids(self, status):
+        """Return trial IDs of engine instances with status."""
+        with self._lock:
+            return list(self._by_status.get(status, ()))
+
+    def statuses(self):
+        """Return [{"ID": trial_id, "status": status}] of all engine instances."""
+        with self._lock:
+            return [{"ID": trial_id, "status": self._statuses[trial_id]} for trial_id in self._engines]
+
+    def count_by_status(self):
+        """Return number of engine instances by status."""
+        with self._lock:
+            return {status: len(trial_ids) for status, trial_ids in self._by_status.items()}
+
+    def _index(self, trial_id, status):
+        """Index trial ID by status. Called with lock held."""
+        self._statuses[trial_id] = status
+        self._by_status.setdefault(status, {})[trial_id] = None
+
+    def _unindex(self, trial_id):
+        """Remove trial ID from the status index. Called with lock held."""
+        status = self._statuses.pop(trial_id, None)
+        if status is not None:
+            trial_ids = self._by_status[status]
+            del trial_ids[trial_id]
+            if not trial_ids:
+                del self._by_status[status]
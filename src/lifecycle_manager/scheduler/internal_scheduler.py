@@ -60,14 +60,17 @@ class InternalScheduler(Thread):
         start_time_dt = datetime.datetime.strptime(start_time_str, "%Y-%m-%dT%H:%M:%S")
         return start_time_dt
 
-    def add_scheduled_job(self, start_date, trial_id):
+    def add_scheduled_job(self, start_date, trial_id, priority=0):
         """Create and add a scheduled job to the BackgroundScheduler instance.
-        Calls the target function when a set time has been reached.
+        Calls the target function when a set time has been reached. priority orders admission of the trial when
+        the number of executing trials is limited, lower first.
         """
         try:
             logging.info("Creating and adding a scheduled job with ID: %s", str(trial_id))
+            run_date = self.create_dt_start_time(start_date)
             self.scheduler.add_job(self.scheduler_handler.create_executor_engine_instance, 'date',
-                                   run_date=self.create_dt_start_time(start_date), args=[trial_id], id=trial_id)
+                                   run_date=run_date, args=[trial_id],
+                                   kwargs={'run_date': run_date, 'priority': priority}, id=trial_id)
             if not self.scheduler.running:
                 self.scheduler.start()
         except ConflictingIdError as conflicting_id_error:
@@ -11,9 +11,15 @@ from threading import Thread, Event
 
 from apscheduler.jobstores.base import ConflictingIdError
 from lifecycle_manager.config import services
+from lifecycle_manager.executor.async_engine import AsyncEngine
+from lifecycle_manager.executor.checkpoint import get_checkpoint_store, ACTIVE, FAILED
 from lifecycle_manager.executor.engine import Engine
+from lifecycle_manager.executor.workflow import get_workflows
+from lifecycle_manager.scheduler.admission import AdmissionQueue
+from lifecycle_manager.scheduler.engine_registry import EngineRegistry
 from lifecycle_manager.scheduler.internal_scheduler import InternalScheduler
 from lifecycle_manager.scheduler.trial_registry_client import TrialRegistryClient
+from lifecycle_manager.utils.metrics import SCHEDULER_LAG
 
 
 class RunSchedulerException(Exception):
@@ -28,10 +34,13 @@ class SchedulerHandler(Thread):
         self.internal_scheduler = InternalScheduler(self)
         self.trial_repo_client = TrialRegistryClient()
         self._automatic_scheduling = False
-        self._engine_instances = []
-        self._engine_instance_statuses = []
+        self.engines = EngineRegistry()
         self._shutdown = False
         self._status = 'Idle'
+        settings = services.Settings()
+        get_workflows(settings.workflow_dir)
+        self.admission = AdmissionQueue(self._start_engine_instance, settings.max_active_engines,
+                                        settings.admission_policy)
 
     @property
     def status(self):
@@ -46,12 +55,16 @@ class SchedulerHandler(Thread):
     @property
     def engine_instances(self):
         """Getter for engine instance list."""
-        return self._engine_instances
+        return self.engines.engines()
 
     @property
     def engine_instance_statuses(self):
         """Getter for engine instance statuses."""
-        return self._engine_instance_statuses
+        return self.engines.statuses()
+
+    def get_engine_instance(self, trial_id):
+        """Return Engine instance of trial ID or None."""
+        return self.engines.get(trial_id)
 
     def toggle_automatic_scheduling(self):
         """Toggle boolean."""
@@ -81,11 +94,9 @@ class SchedulerHandler(Thread):
             trial_id = str(trial['trial_id'])
             start_time = trial['start_time']
             start_time_dt = self.internal_scheduler.create_dt_start_time(start_time)
-            for engine_instance in self._engine_instances:
-                if engine_instance.id == trial_id:
-                    already_executing.append(trial_id)
-                    flag = True
-                    break
+            if trial_id in self.engines:
+                already_executing.append(trial_id)
+                flag = True
             scheduled_jobs = self.internal_scheduler.get_scheduled_jobs()
             for job in scheduled_jobs:
                 if not flag:
@@ -126,9 +137,8 @@ class SchedulerHandler(Thread):
         success, message, start_time = self.trial_repo_client.get_trial_start_time(trial_id=trial_id)
         if success:
             if start_time:
-                for engine_instance in self._engine_instances:
-                    if engine_instance.id == trial_id:
-                        return False, "Engine instance with trial ID: {} already exists.".format(trial_id)
+                if trial_id in self.engines:
+                    return False, "Engine instance with trial ID: {} already exists.".format(trial_id)
                 if self.execute_scheduled_job(start_time, trial_id):
                     return True, "Trial scheduled with trial ID: {}".format(trial_id)
             return False, message
@@ -142,24 +152,79 @@ class SchedulerHandler(Thread):
         except ConflictingIdError:
             return False
 
-    def create_executor_engine_instance(self, trial_id):
-        """Call Executor engine to create an Engine instance."""
+    def create_executor_engine_instance(self, trial_id, run_date=None, priority=0):
+        """Admit trial to execution. The engine is created now or, when max_active_engines are executing, after
+        one of them has ended. run_date is the scheduled start time, if any."""
+        self.admission.submit(trial_id, run_date, priority=priority)
+        self.set_status()
+
+    def _start_engine_instance(self, trial_id, run_date=None):
+        """Call Executor engine to create an Engine instance and start its executor."""
         logging.info("Calling Execution engine to create an Executor instance with Trial ID: %s", trial_id)
-        engine_instance = Engine(trial_id, services.Settings())
-        self._engine_instances.append(engine_instance)
-        self._engine_instance_statuses.append({"ID": trial_id, "status": "Active"})
-        engine_instance.start()
+        engine_instance = self._add_engine_instance(trial_id, services.Settings())
         engine_instance.set_execute_event()
+        if run_date is not None:
+            SCHEDULER_LAG.observe(max((datetime.now() - run_date).total_seconds(), 0))
+
+    def _add_engine_instance(self, trial_id, settings, restore_dict=None):
+        """Create and start an Engine instance. The executor is not started."""
+        if settings.executor_mode == 'asyncio':
+            engine_instance = AsyncEngine(trial_id, settings, restore_dict)
+        else:
+            engine_instance = Engine(trial_id, settings, restore_dict)
+        self.engines.add(engine_instance)
+        engine_instance.add_listener(self.handle_engine_event)
+        engine_instance.start()
+        return engine_instance
+
+    def recover_engine_instances(self):
+        """Recreate Engine instances from the checkpoints of the previous run. Return the recovered instances.
+
+        Active trials resume from their last checkpointed state. Failed trials get their checkpoint as backup
+        and can be restored like after a failure in this run.
+        """
+        settings = services.Settings()
+        if not settings.checkpoint_path:
+            return []
+        store = get_checkpoint_store(settings.checkpoint_path, settings.checkpoint_compact_interval)
+        active = store.latest((ACTIVE,))
+        failed = store.latest((FAILED,))
+        store.compact()
+        recovered = []
+        for trial_id, snapshot in list(active.items()) + list(failed.items()):
+            if trial_id not in self.engines:
+                engine_instance = self._add_engine_instance(trial_id, settings, snapshot)
+                if trial_id in active:
+                    self.admission.readmit(trial_id)
+                if trial_id in failed:
+                    engine_instance.backup = snapshot
+                    engine_instance.set_failed()
+                recovered.append(engine_instance)
+        for engine_instance in recovered:
+            if not engine_instance.failed:
+                engine_instance.set_execute_event()
+        logging.warning("Recovered %d Executor Engine instances from checkpoints.", len(recovered))
         self.set_status()
+        return recovered
+
+    def handle_engine_event(self, engine_instance, event):
+        """Update engine instance status when an engine reports an executor event."""
+        status = {"failed": "Failed", "finished": "Finished", "stopped": "Stopped", "restored": "Active"}[event]
+        logging.info("Engine instance with ID: %s reported: %s", engine_instance.id, event)
+        self.engines.set_status(engine_instance.id, status)
+        if event == 'restored':
+            self.admission.readmit(engine_instance.id)
+        else:
+            self.admission.release(engine_instance.id)
 
     def restore_engine_instance(self, trial_id):
         """Restore an Executor Engine instance thread."""
         logging.info("Restoring Executor Engine thread...")
-        for instance in self._engine_instances:
-            if instance.id == trial_id:
-                instance.restore()
-                return True
-        return False
+        instance = self.engines.get(trial_id)
+        if instance is None:
+            return False
+        instance.restore()
+        return True
 
     def run(self):
         """Run Scheduler Handler main functionalities."""
@@ -175,21 +240,11 @@ class SchedulerHandler(Thread):
                 self.fetch_all_trials()
                 last_poll = current_poll
             time.sleep(1)
-            for instance in self._engine_instances:
-                if instance.failed:
-                    for engine in self._engine_instance_statuses:
-                        if engine["ID"] == instance.id:
-                            engine["status"] = "Failed"
-                if instance.finished:
-                    for engine in self._engine_instance_statuses:
-                        if engine["ID"] == instance.id:
-                            engine["status"] = "Finished"
 
             if self._shutdown:
                 logging.warning("Shutting down Scheduler instance.")
                 stop_event.set()
-                self.internal_scheduler.signal_stop()
-                self.internal_scheduler.join()
+                self.stop_internal_scheduler()
                 break
 
     def is_process_alive(self, stop_event, process_instance):
@@ -215,23 +270,22 @@ class SchedulerHandler(Thread):
     def stop_engine_instance(self, trial_id):
         """Stop an Engine instance."""
         logging.info("Stopping an Engine instance with ID: %s)", str(trial_id))
-        for instance in self._engine_instances:
-            if trial_id == instance.id:
-                instance.set_stop_event()
-                instance.join()
-                self._engine_instances.remove(instance)
-        for instance in self._engine_instance_statuses:
-            if trial_id == instance["ID"]:
-                self._engine_instance_statuses.remove(instance)
+        self.admission.remove(trial_id)
+        instance = self.engines.get(trial_id)
+        if instance is not None:
+            instance.set_stop_event()
+            instance.join()
+            instance.close_checkpoints()
+            self.engines.remove(trial_id)
+            self.admission.release(trial_id)
 
     def stop_all_engine_instances(self):
         """Stop all Executor Engine instances."""
         logging.info("Stopping all Executor Engine threads...")
-        for instance in self._engine_instances:
+        instances = self.engines.clear()
+        for instance in instances:
             instance.set_stop_event()
-        for instance in self._engine_instances:
+        for instance in instances:
             instance.join()
-        self._engine_instances = []
-        self._engine_instance_statuses = []
         logging.info("All Executor Engine threads stopped.")
         return True
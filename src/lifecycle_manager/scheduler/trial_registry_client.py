@@ -11,6 +11,9 @@ import requests
 
 from requests.auth import HTTPBasicAuth
 
+from lifecycle_manager.client.circuit_breaker import CircuitOpen
+from lifecycle_manager.client.session_pool import get_session_pool
+from lifecycle_manager.client.trial_cache import get_trial_cache
 from lifecycle_manager.config.services import Settings
 
 
@@ -20,6 +23,7 @@ class TrialRegistryClient:
     def __init__(self):
         self.settings = Settings()
         self.service = self.settings.trial_repository
+        self.session = get_session_pool().session(self.settings, self.service)
 
     @staticmethod
     def parse_all_trials_information(response):
@@ -53,7 +57,13 @@ class TrialRegistryClient:
             return None, "Failed to parse reply from Trial registry: {}".format(excep)
 
     def get_all_trial_ids_and_start_times(self):
-        """Get trial IDs and start times of all available trials from Trial registry."""
+        """Get trial IDs and start times of all available trials from Trial registry.
+        Concurrent callers share one request."""
+        return get_trial_cache(self.settings.trial_cache_ttl).read_shared('/trial/',
+                                                                          self._get_all_trial_ids_and_start_times)
+
+    def _get_all_trial_ids_and_start_times(self):
+        """Request trial IDs and start times of all available trials from Trial registry."""
         logging.info("Sending GET request to %s/trial/", self.service["url"])
         try:
             if self.service["apikey"] != "":
@@ -69,8 +79,7 @@ class TrialRegistryClient:
             else:
                 cert = None
 
-            response = requests.get(self.service["url"] + "/trial/", auth=auth,
-                                    verify=cert, timeout=30)
+            response = self.session.request('GET', self.service["url"] + "/trial/", auth=auth, verify=cert)
 
             if response.status_code == 200:
                 response_dict = response.json()
@@ -82,7 +91,8 @@ class TrialRegistryClient:
             logging.warning(message)
             return False, message, None
 
-        except (requests.ConnectionError, requests.exceptions.InvalidURL, requests.exceptions.InvalidSchema) as excep:
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.InvalidURL,
+                requests.exceptions.InvalidSchema, CircuitOpen) as excep:
             message = "Failed to connect to Trial registry at: {}: {}".format(self.service["url"], excep)
             logging.warning(message)
             return False, message, None
@@ -104,20 +114,26 @@ class TrialRegistryClient:
             else:
                 cert = None
 
-            response = requests.get(self.service["url"] + "/trial/" + trial_id + "/",
-                                    verify=cert, auth=auth, timeout=30)
+            responses = []
 
-            if response.status_code == 200:
-                response_dict = response.json()
-                start_time, message = self.parse_trial_start_time(response_dict)
+            def fetch(headers):
+                responses.append(self.session.request('GET', self.service["url"] + "/trial/" + trial_id + "/",
+                                                      verify=cert, auth=auth, headers=headers))
+                return responses[-1]
+
+            status_code, document = get_trial_cache(self.settings.trial_cache_ttl).get(trial_id, fetch)
+            if status_code == 200:
+                start_time, message = self.parse_trial_start_time(document.data)
                 if start_time:
                     return True, message, start_time
                 return False, message, start_time
-            message = "Trial registry responded with: {}.".format(response.content)
+            # Another caller may have made the shared request.
+            message = "Trial registry responded with: {}.".format(responses[-1].content if responses else status_code)
             logging.warning(message)
             return False, message, None
 
-        except (requests.ConnectionError, requests.exceptions.InvalidURL, requests.exceptions.InvalidSchema) as excep:
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.InvalidURL,
+                requests.exceptions.InvalidSchema, CircuitOpen) as excep:
             message = "Failed to connect to Trial registry at: {}: {}".format(self.service["url"], excep)
             logging.warning(message)
             return False, message, None
@@ -0,0 +1,6 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Simulator of the services LCM calls, for running and load testing LCM on one machine. See README.md."""
@@ -0,0 +1,37 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Run the service simulator.
+
+Run with: python -m lifecycle_manager.simulator [--host 127.0.0.1] [--port 5001] [--config simulator.json]
+
+The JSON file sets fields of SimulatorSettings, e.g. {"trials": 100, "latencies": {"/sliceDeployment":
+{"distribution": "lognormal", "median": 0.2, "sigma": 0.5}}, "error_rate": 0.01}.
+"""
+import argparse
+import json
+
+import uvicorn
+
+from lifecycle_manager.simulator.app import create_app
+from lifecycle_manager.simulator.settings import SimulatorSettings
+
+
+def main():
+    """Parse arguments and serve the simulator."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on.")
+    parser.add_argument('--port', type=int, default=5001, help="Port of the services in config/services.py.")
+    parser.add_argument('--config', help="JSON file of SimulatorSettings fields.")
+    args = parser.parse_args()
+    options = {}
+    if args.config:
+        with open(args.config) as config:
+            options = json.load(config)
+    uvicorn.run(create_app(SimulatorSettings(**options)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Simulated trial_repository, trial_enforcement and kpi_monitoring in one FastAPI application.
+
+Example usage:
+server = SimulatorServer(SimulatorSettings(), port=5001)
+server.start()  # Serves on http://127.0.0.1:5001 until server.shutdown().
+
+Requests are delayed and failed as configured by path in SimulatorSettings before they are served. Requests that
+carry a callback_url are answered at once and the callback follows after the callback delay. Trial status updates
+are followed by the trial controller command of the status, e.g. /active after IDLE.
+"""
+import asyncio
+import json
+import logging
+import random
+import socket
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from threading import Thread
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+from lifecycle_manager.simulator.callbacks import CallbackSender
+from lifecycle_manager.simulator.distributions import Distribution, PathTable
+from lifecycle_manager.simulator.settings import SimulatorSettings
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def endpoint_name(method, path):
+    """Return method and first path segment of a request, e.g. "PUT /trial"."""
+    return '{} /{}'.format(method.upper(), path.lstrip('/').split('/')[0])
+
+
+class TrialStore:
+    """Trial documents by trial ID, versioned for ETag revalidation. Used from the event loop only."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._trials = {}
+        self._versions = {}
+        start_time = datetime.utcnow() + timedelta(seconds=settings.trial_start_delay)
+        for number in range(settings.trials):
+            self.create('sim-{}'.format(number), start_time)
+
+    def create(self, trial_id, start_time=None):
+        """Create trial document from the template. Return the document."""
+        if start_time is None:
+            start_time = datetime.utcnow() + timedelta(seconds=self.settings.trial_start_delay)
+        document = json.loads(json.dumps(self.settings.trial_template))
+        document.update({"id": trial_id, "start_time": start_time.strftime(TIME_FORMAT)})
+        self._trials[trial_id] = document
+        self._versions[trial_id] = 1
+        return document
+
+    def get(self, trial_id):
+        """Return trial document and its ETag or None, None if there is no such trial."""
+        document = self._trials.get(trial_id)
+        if document is None:
+            if not self.settings.auto_create_trials:
+                return None, None
+            document = self.create(trial_id)
+        return document, self.etag(trial_id)
+
+    def etag(self, trial_id):
+        """Return ETag of the current version of the trial."""
+        return '"{}-{}"'.format(trial_id, self._versions[trial_id])
+
+    def update(self, trial_id, data):
+        """Update fields of trial. Return False if there is no such trial."""
+        document = self._trials.get(trial_id)
+        if document is None:
+            return False
+        document.update(data)
+        self._versions[trial_id] += 1
+        return True
+
+    def all(self):
+        """Return all trial documents."""
+        return list(self._trials.values())
+
+
+class Simulation:
+    """State and configured behaviour of the simulated services."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.rng = random.Random(settings.seed)
+        self.latencies = PathTable(Distribution(settings.latency, self.rng),
+                                   {key: Distribution(options, self.rng)
+                                    for key, options in settings.latencies.items()})
+        self.error_rates = PathTable(settings.error_rate, settings.error_rates)
+        self.callback_delays = PathTable(Distribution(settings.callback_delay, self.rng),
+                                         {key: Distribution(options, self.rng)
+                                          for key, options in settings.callback_delays.items()})
+        self.callbacks = CallbackSender(settings.callback_workers, settings.callback_retries,
+                                        settings.callback_retry_delay, settings.callback_timeout)
+        self.command_delays = {command: Distribution(options, self.rng)
+                               for command, options in settings.command_delays.items()}
+        self.command_delay = Distribution(settings.command_delay, self.rng)
+        self.commands = CallbackSender(settings.callback_workers, settings.callback_retries,
+                                       settings.callback_retry_delay, settings.callback_timeout)
+        self.trials = TrialStore(settings)
+        self.slices = {}
+        self.measurement_jobs = {}
+        self.requests = Counter()
+        self.errors = Counter()
+        self.markings = 0
+
+    def fails(self, method, path):
+        """Return True if the request should be answered with an error."""
+        rate = self.error_rates.get(method, path)
+        return rate > 0 and self.rng.random() < rate
+
+    def callback(self, request, body):
+        """Schedule the callback requested with callback_url, authorized with the token in the request body."""
+        url = request.query_params.get('callback_url')
+        token = body.get("Authorization") if isinstance(body, dict) else None
+        if not url or not token:
+            logging.warning("%s %s without callback_url or token, no callback sent.", request.method,
+                            request.url.path)
+            return
+        if self.rng.random() < self.settings.callback_loss_rate:
+            self.callbacks.lose()
+            return
+        self.callbacks.schedule(url, token, self.callback_delays.get(request.method, request.url.path).sample())
+
+    def command(self, trial_id, status):
+        """Schedule the trial controller command of the trial status set by LCM, if any."""
+        command = self.settings.status_commands.get(status)
+        if command is None:
+            return
+        delay = self.command_delays.get(command, self.command_delay).sample()
+        self.commands.schedule('{}/trial/{}/{}'.format(self.settings.lcm_url, trial_id, command),
+                               self.settings.lcm_apikey, delay)
+
+    def stats(self):
+        """Return numbers of requests and injected errors by endpoint, callbacks, commands and simulated
+        resources."""
+        return {"requests": dict(self.requests), "errors": dict(self.errors), "callbacks": self.callbacks.stats(),
+                "commands": self.commands.stats(),
+                "slices": len(self.slices), "measurement_jobs": len(self.measurement_jobs),
+                "markings": self.markings}
+
+
+class SimulationMiddleware:
+    """ASGI middleware delaying requests and failing them as configured before they are served."""
+
+    def __init__(self, app, simulation):  # pylint: disable=W0621
+        self.app = app
+        self.simulation = simulation
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith('/simulator/'):
+            await self.app(scope, receive, send)
+            return
+        simulation = self.simulation
+        method, path = scope["method"], scope["path"]
+        name = endpoint_name(method, path)
+        simulation.requests[name] += 1
+        delay = simulation.latencies.get(method, path).sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if simulation.fails(method, path):
+            simulation.errors[name] += 1
+            response = JSONResponse({"detail": "Simulated error"}, status_code=simulation.settings.error_status)
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+async def _body(request):
+    """Return JSON body of request, {} if there is none."""
+    body = await request.body()
+    return json.loads(body) if body else {}
+
+
+def create_app(settings=None):
+    """Return simulator application. Its Simulation is app.state.simulation."""
+    simulation = Simulation(settings or SimulatorSettings())
+    app = FastAPI(title="LCM service simulator")
+    app.state.simulation = simulation
+    app.add_middleware(SimulationMiddleware, simulation=simulation)
+
+    @app.on_event("shutdown")
+    def stop_callbacks():
+        simulation.callbacks.shutdown()
+        simulation.commands.shutdown()
+
+    @app.get('/simulator/stats')
+    async def get_stats():
+        return simulation.stats()
+
+    @app.get('/trial/')
+    async def get_trials():
+        return simulation.trials.all()
+
+    @app.get('/trial/{trial_id}/')
+    async def get_trial(trial_id: str, request: Request):
+        document, etag = simulation.trials.get(trial_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Trial not found")
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse(document, headers={"ETag": etag})
+
+    @app.put('/trial/{trial_id}/')
+    async def put_trial(trial_id: str, request: Request):
+        body = await _body(request)
+        if not simulation.trials.update(trial_id, body):
+            raise HTTPException(status_code=404, detail="Trial not found")
+        simulation.command(trial_id, body.get("status"))
+        return Response(status_code=204)
+
+    @app.post('/sliceDeployment')
+    async def post_slice(request: Request):
+        body = await _body(request)
+        trial_id = str(body.get("trialID"))
+        if trial_id in simulation.slices:
+            raise HTTPException(status_code=409, detail="Slice already deployed")
+        simulation.slices[trial_id] = {"id": "slice-" + trial_id}
+        simulation.callback(request, body)
+        return JSONResponse({"Slice": simulation.slices[trial_id]}, status_code=201)
+
+    @app.delete('/sliceDeployment/{trial_id}')
+    async def delete_slice(trial_id: str, request: Request):
+        if simulation.slices.pop(trial_id, None) is None:
+            raise HTTPException(status_code=404, detail="Slice not found")
+        simulation.callback(request, await _body(request))
+        return {"message": "Slice deletion started"}
+
+    @app.post('/vnf/{site}/{step}')
+    async def post_vnf(site: str, step: str, request: Request):
+        if site not in ('cloud', 'edge') or step not in ('boarding', 'deployment'):
+            raise HTTPException(status_code=404, detail="Unknown VNF operation")
+        simulation.callback(request, await _body(request))
+        return JSONResponse({"trialID": request.query_params.get('trialID'), "site": site, "step": step},
+                            status_code=201)
+
+    @app.post('/tap')
+    async def post_tap(request: Request):
+        body = await _body(request)
+        return {"trialID": body.get("trialID"), "status": "STARTED"}
+
+    @app.post('/flightplan')
+    async def post_flight_plan(request: Request):
+        body = await _body(request)
+        return JSONResponse({"trialID": body.get("trialID"), "status": "ENFORCED"}, status_code=201)
+
+    @app.post('/measurementjobs')
+    async def post_measurement_job(request: Request):
+        body = await _body(request)
+        measurement_id = "mj-{}".format(body.get("trialID"))
+        simulation.measurement_jobs[measurement_id] = body
+        return JSONResponse({"MeasurementID": measurement_id}, status_code=201)
+
+    @app.delete('/measurementjobs/{measurement_id}')
+    async def delete_measurement_job(measurement_id: str):
+        if simulation.measurement_jobs.pop(measurement_id, None) is None:
+            raise HTTPException(status_code=404, detail="Measurement job not found")
+        return Response(status_code=204)
+
+    @app.post('/markKPIData')
+    async def post_markings(request: Request):
+        body = await _body(request)
+        simulation.markings += len(body) if isinstance(body, list) else 1
+        return {"message": "Marked"}
+
+    @app.post('/monitoring/token')
+    async def post_token():
+        return {"access_token": "sim-{:x}".format(simulation.rng.getrandbits(64)), "token_type": "bearer",
+                "expires_in": simulation.settings.token_ttl}
+
+    return app
+
+
+class AppServer(Thread):
+    """ASGI application served by uvicorn on a loopback port in a background thread. Port 0 picks a free port."""
+
+    def __init__(self, app, host='127.0.0.1', port=0, name='app-server'):
+        super().__init__(name=name, daemon=True)
+        self.app = app
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self.url = 'http://{}:{}'.format(host, self._socket.getsockname()[1])
+        self._server = uvicorn.Server(uvicorn.Config(self.app, log_level="warning"))
+
+    def run(self):
+        """Serve until shutdown."""
+        self._server.run(sockets=[self._socket])
+
+    def start(self, timeout=10):
+        """Start serving and wait until requests are accepted."""
+        super().start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self.is_alive():
+                raise RuntimeError("{} did not start.".format(self.name))
+            time.sleep(0.01)
+
+    def shutdown(self):
+        """Stop serving."""
+        self._server.should_exit = True
+        self.join()
+
+
+class SimulatorServer(AppServer):
+    """Simulator served on a loopback port in a background thread."""
+
+    def __init__(self, settings=None, host='127.0.0.1', port=0):
+        super().__init__(create_app(settings), host, port, name='simulator')
+        self.simulation = self.app.state.simulation
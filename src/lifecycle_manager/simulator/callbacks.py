@@ -0,0 +1,76 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Asynchronous callbacks of the simulator to LCM /trial/{id}/callback/* routes.
+
+A callback is a POST to the callback_url of the request with the callback token of the trial in the Authorization
+header. Callbacks LCM does not accept, e.g. because the executor is not waiting for it yet, are resent up to
+retries times.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import requests
+
+from lifecycle_manager.utils.timer_service import get_timer_service
+
+
+class CallbackSender:
+    """Sends callbacks from a pool of worker threads once they are due."""
+
+    def __init__(self, workers=16, retries=5, retry_delay=0.2, timeout=5):
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sim-callback')
+        self._session = requests.Session()
+        self._lock = Lock()
+        self._stats = {"scheduled": 0, "lost": 0, "delivered": 0, "resent": 0, "failed": 0}
+
+    def schedule(self, url, token, delay):
+        """Send callback to url after delay seconds."""
+        self._count("scheduled")
+        get_timer_service().call_later(delay, self._submit, url, token, 0)
+
+    def lose(self):
+        """Count a callback that is never sent."""
+        self._count("lost")
+
+    def _submit(self, url, token, attempt):
+        """Hand callback over to the worker threads. Runs on the timer thread."""
+        try:
+            self._pool.submit(self._send, url, token, attempt)
+        except RuntimeError:
+            logging.debug("Callback to %s dropped, sender is shut down.", url)
+
+    def _send(self, url, token, attempt):
+        """Send callback and schedule a resend if it was not accepted."""
+        try:
+            status = self._session.post(url, headers={"Authorization": token}, timeout=self.timeout).status_code
+        except requests.RequestException as request_error:
+            status = str(request_error)
+        if status == 200:
+            self._count("delivered")
+        elif attempt < self.retries:
+            self._count("resent")
+            get_timer_service().call_later(self.retry_delay, self._submit, url, token, attempt + 1)
+        else:
+            self._count("failed")
+            logging.warning("Callback to %s failed: %s", url, status)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        """Return numbers of callbacks by outcome."""
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self):
+        """Stop worker threads. Callbacks not sent yet are dropped."""
+        self._pool.shutdown(wait=False)
+        self._session.close()
@@ -0,0 +1,62 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Random durations in seconds and behaviour looked up by request path.
+
+Distributions: {"distribution": "constant", "value": s}, {"distribution": "uniform", "low": s, "high": s},
+{"distribution": "normal", "mean": s, "stddev": s}, {"distribution": "lognormal", "median": s, "sigma": x} and
+{"distribution": "exponential", "mean": s}. Samples are never negative.
+"""
+import math
+
+
+class Distribution:
+    """Distribution of durations in seconds, sampled with the random generator rng."""
+
+    KINDS = ('constant', 'uniform', 'normal', 'lognormal', 'exponential')
+
+    def __init__(self, options, rng):
+        self.kind = options.get("distribution", "constant")
+        if self.kind not in self.KINDS:
+            raise ValueError("Unknown distribution: {}".format(self.kind))
+        self.options = options
+        self._rng = rng
+
+    def sample(self):
+        """Return a duration in seconds."""
+        options = self.options
+        if self.kind == 'constant':
+            value = options.get("value", 0.0)
+        elif self.kind == 'uniform':
+            value = self._rng.uniform(options.get("low", 0.0), options["high"])
+        elif self.kind == 'normal':
+            value = self._rng.gauss(options["mean"], options.get("stddev", 0.0))
+        elif self.kind == 'lognormal':
+            value = self._rng.lognormvariate(math.log(options["median"]), options.get("sigma", 0.0))
+        else:
+            value = self._rng.expovariate(1.0 / options["mean"]) if options["mean"] > 0 else 0.0
+        return max(value, 0.0)
+
+
+class PathTable:
+    """Default value and overrides by path prefix, optionally qualified with the method, e.g. "PUT /trial".
+
+    The longest matching prefix wins, a method qualified one before an unqualified one of the same length.
+    """
+
+    def __init__(self, default, overrides):
+        self.default = default
+        entries = []
+        for key, value in overrides.items():
+            method, _, prefix = key.rpartition(' ')
+            entries.append((len(prefix), bool(method), method.upper(), prefix, value))
+        self._entries = sorted(entries, key=lambda entry: entry[:2], reverse=True)
+
+    def get(self, method, path):
+        """Return value of request method and path."""
+        for _length, _qualified, entry_method, prefix, value in self._entries:
+            if path.startswith(prefix) and entry_method in ('', method.upper()):
+                return value
+        return self.default
@@ -0,0 +1,59 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Settings of the service simulator. Latencies and delays are distributions, see simulator/distributions.py."""
+from typing import Optional
+
+from pydantic import BaseSettings
+
+from lifecycle_manager.api_customization import API_KEY
+
+
+class SimulatorSettings(BaseSettings):
+    """Set simulated behaviour here or in a JSON file given with --config."""
+
+    seed: Optional[int] = None  # Seed of the random generator for repeatable runs.
+
+    # Trials listed by GET /trial/, with IDs sim-0, sim-1, ... starting trial_start_delay seconds after the simulator.
+    trials = 10
+    trial_start_delay = 60
+    auto_create_trials = True  # GET /trial/{id}/ of an unknown trial creates its document from the template.
+    trial_template = {
+        "name": "Simulated trial",
+        "facility": "EUR",
+        "status": "APPROVED",
+        "kpis": ["latency", "throughput"],
+        "nst": "{'name': 'simulated-slice', 'sliceType': 'eMBB'}",
+        "flights": [{"uav": "sim-uav", "waypoints": []}]
+    }
+
+    # Seconds before a request is answered. Overrides by path prefix, optionally with the method, e.g.
+    # {"/sliceDeployment": {"distribution": "lognormal", "median": 0.2, "sigma": 0.5}, "PUT /trial": {...}}
+    latency = {"distribution": "constant", "value": 0.0}
+    latencies = {}
+
+    # Fraction of requests answered with error_status instead of being served. Overrides as for latencies.
+    error_rate = 0.0
+    error_rates = {}
+    error_status = 503
+
+    # Seconds from a request that asks for a callback to the callback. Overrides by path prefix of the request.
+    callback_delay = {"distribution": "constant", "value": 0.5}
+    callback_delays = {}
+    callback_loss_rate = 0.0  # Fraction of callbacks never sent.
+    callback_retries = 5  # Resends of a callback LCM did not accept, e.g. because the executor is not waiting yet.
+    callback_retry_delay = 0.2
+    callback_timeout = 5
+    callback_workers = 16  # Threads sending callbacks.
+
+    # Trial controller commands to LCM. When LCM sets the trial status of a key, the command is posted to
+    # lcm_url/trial/{id}/{command} with lcm_apikey after the command delay. {} sends no commands.
+    lcm_url = "http://localhost:5000"
+    lcm_apikey = API_KEY
+    status_commands = {"IDLE": "active", "ACTIVE": "finish"}
+    command_delay = {"distribution": "constant", "value": 1.0}
+    command_delays = {}  # By command, e.g. {"finish": {...}} for the time trials stay active.
+
+    token_ttl = 300  # expires_in of access tokens from /monitoring/token.
@@ -0,0 +1,21 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Fixtures shared by all tests."""
+import json
+
+import pytest
+
+from lifecycle_manager.config.services import Settings
+
+
+@pytest.fixture(autouse=True)
+def fixture_isolated_files(tmp_path, monkeypatch):
+    """Write the checkpoints, failure reports and traces of a test to its temporary directory, not the working
+    directory."""
+    monkeypatch.setenv('CHECKPOINT_PATH', str(tmp_path / 'checkpoints' / 'executor.db'))
+    monkeypatch.setenv('TRACE_DIR', str(tmp_path / 'traces'))
+    failure_reports = dict(Settings().failure_reports, path=str(tmp_path / 'logs' / 'executor_failures.jsonl'))
+    monkeypatch.setenv('FAILURE_REPORTS', json.dumps(failure_reports))
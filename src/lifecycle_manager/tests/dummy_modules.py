@@ -1,6 +1,10 @@
 """Dummy versions of modules for testing."""
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from threading import Thread, Event
 
+from lifecycle_manager.scheduler.engine_registry import EngineRegistry
+
 
 class DummyEngine(Thread):
     """Dummy class for Executor Engine."""
@@ -46,20 +50,39 @@ class DummyRunScheduler:
         """Return a list of running Executor Engine instances."""
         instances = []
         for instance in self.scheduler_handler.engine_instances:
-            instances.append({"Trial ID": instance.id, "failed": instance.failed})
+            instances.append({"ID": instance.id, "status": "Active"})
         return instances
 
+    @staticmethod
+    def get_admission_stats():
+        """Return admission statistics."""
+        return {"policy": "fifo", "max_active": 0, "active": 0, "queued": 0, "oldest_wait_s": 0.0,
+                "wait_p50_s": 0.0, "wait_max_s": 0.0}
+
+    @staticmethod
+    def get_circuit_breakers():
+        """Return circuit breaker states."""
+        return {}
+
     def get_executor_engine_instances(self):
         """Return a list of running Executor Engine instances."""
         return self.scheduler_handler.engine_instances
 
+    def get_executor_engine_instance(self, trial_id):
+        """Return the Executor Engine instance of trial ID or None."""
+        return self.scheduler_handler.engines.get(trial_id)
+
+    def count_executor_engine_instances(self):
+        """Return number of Executor Engine instances by status."""
+        return self.scheduler_handler.engines.count_by_status()
+
     def get_heartbeat_instances(self):
         """Return a list of running Heartbeat instances."""
         return self.heartbeat_handler.heartbeat_instances
 
-    def add_new_job(self, start_time, trial_id):
+    def add_new_job(self, start_time, trial_id, priority=0):
         """Interface for adding a new job to Scheduler."""
-        self.scheduler_handler.engine_instances.append(DummyEngine(trial_id))
+        self.scheduler_handler.engines.add(DummyEngine(trial_id))
         return True
 
     @staticmethod
@@ -94,7 +117,7 @@ class DummySchedulerHandler(Thread):
     def __init__(self):
         super().__init__()
         self.internal_scheduler = DummyInternalScheduler(self)
-        self._engine_instances = []
+        self.engines = EngineRegistry()
         self.config = self._read_config(config_name='startup')
         self._dummy_status = 'Idle'
         self._automatic_scheduling = False
@@ -107,7 +130,7 @@ class DummySchedulerHandler(Thread):
     @property
     def engine_instances(self):
         """Getter for dummy engine instance list."""
-        return self._engine_instances
+        return self.engines.engines()
 
     @staticmethod
     def _read_config(config_name):
@@ -145,16 +168,16 @@ class DummySchedulerHandler(Thread):
         except Exception:
             return False
 
-    def create_executor_engine_instance(self, trial_id):
+    def create_executor_engine_instance(self, trial_id, run_date=None, priority=0):
         """Create an Engine instance."""
 
     def restore_engine_instance(self, trial_id):
         """Restore an Executor Engine thread."""
-        for engine in self._engine_instances:
-            if engine.id == trial_id:
-                engine.restore()
-                return True
-        return False
+        engine = self.engines.get(trial_id)
+        if engine is None:
+            return False
+        engine.restore()
+        return True
 
     def run(self):
         """Run Scheduler Handler main functionalities."""
@@ -261,3 +284,47 @@ class DummyHeartbeat(Thread):
         self.id = _id
         self._dummy_stop = False
         self._dummy_stop_event = Event()
+
+
+class DummyHttpService(Thread):
+    """Dummy HTTP service on loopback. Responses are set per method and path."""
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.routes = {}
+        self.requests = []
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Request handler using routes of the service."""
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length) if length else b''
+                service.requests.append({"method": self.command, "path": self.path,
+                                         "headers": dict(self.headers), "body": body})
+                route = service.routes.get((self.command, self.path.split('?')[0]), (200, {}))
+                status, payload = route(self) if callable(route) else route
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+            def log_message(self, *args):
+                """Silence request logging."""
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+
+    def run(self):
+        """Serve until shutdown."""
+        self.server.serve_forever()
+
+    def shutdown(self):
+        """Stop serving."""
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,50 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for the admission queue of scheduled trials."""
+from lifecycle_manager.scheduler.admission import AdmissionQueue
+
+
+def test_limit_and_fifo_order():
+    """Test that trials over the limit are queued and started in arrival order when slots are released."""
+    started = []
+    admission = AdmissionQueue(lambda trial_id, run_date: started.append(trial_id), max_active=2)
+    for trial_id in ('1', '2', '3', '4'):
+        admission.submit(trial_id, None)
+    assert started == ['1', '2']
+    assert admission.stats()["queued"] == 2
+    admission.release('1')
+    assert started == ['1', '2', '3']
+    assert admission.stats()["active"] == 2
+    admission.release('2')
+    admission.release('3')
+    assert started == ['1', '2', '3', '4']
+    assert admission.stats()["queued"] == 0
+
+
+def test_priority_and_remove():
+    """Test that the priority policy starts lower priorities first and removed trials are skipped."""
+    started = []
+    admission = AdmissionQueue(started.append, max_active=1, policy='priority')
+    admission.submit('running')
+    admission.submit('late', priority=5)
+    admission.submit('urgent', priority=1)
+    admission.submit('removed', priority=0)
+    assert admission.remove('removed')
+    assert not admission.submit('late')
+    admission.release('running')
+    assert started == ['running', 'urgent']
+    admission.release('urgent')
+    assert started == ['running', 'urgent', 'late']
+
+
+def test_unlimited():
+    """Test that a limit of 0 starts every trial at once."""
+    started = []
+    admission = AdmissionQueue(started.append)
+    for trial_id in range(100):
+        admission.submit(trial_id)
+    assert len(started) == 100
+    assert admission.stats()["wait_max_s"] == 0.0
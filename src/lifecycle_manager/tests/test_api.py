@@ -6,6 +6,7 @@
 """ Unit tests to check all functions of the application works correctly"""
 import datetime
 import time
+from types import SimpleNamespace
 
 from fastapi.testclient import TestClient
 from tzlocal import get_localzone
@@ -29,6 +30,9 @@ def test_read_status_page():
                                "Automatic_scheduling": False,
                                "scheduled_trials": "[]",
                                "Executor_Engine_instances": "[]",
+                               "Admission": {"policy": "fifo", "max_active": 0, "active": 0, "queued": 0,
+                                             "oldest_wait_s": 0.0, "wait_p50_s": 0.0, "wait_max_s": 0.0},
+                               "Circuit_breakers": {},
                                "Heartbeat_instances": "[]"}
 
 
@@ -185,3 +189,31 @@ def test_finish_engine_not_found():
     response = client.post("/trial/invalid/active", headers={"Authorization": API_KEY})
     assert response.status_code == 400
     assert response.json() == {"detail": "Engine with requested ID does not exist"}
+
+
+def test_metrics():
+    """Test that metrics are served without authentication in the Prometheus text format."""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE lcm_state_duration_seconds histogram" in response.text
+    assert "lcm_threads " in response.text
+
+
+def test_trial_trace():
+    """Test that authenticated callbacks of trials with an engine are traced and the trace can be read back."""
+    engines = dummy_run_scheduler.scheduler_handler.engines
+    engines.add(SimpleNamespace(id='traced_trial', executor=SimpleNamespace(
+        get_slice_created=True, add_response=lambda name, status: None), set_executor_state=lambda state: False))
+    token = client.post("/token/traced_trial", headers={"Authorization": API_KEY}).json()["Authorization"]
+    client.post("/trial/traced_trial/callback/slice", headers={"Authorization": "invalid"})
+    client.post("/trial/traced_trial/callback/slice", headers={"Authorization": token})
+    client.post("/trial/unknown_trial/callback/slice", headers={"Authorization": "invalid"})
+    engines.remove('traced_trial')
+    response = client.get("/debug/trace/traced_trial", headers={"Authorization": API_KEY})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert response.json()[0]["name"] == "callback"
+    assert response.json()[0]["attributes"] == {"path": "callback/slice", "status": 400}
+    response = client.get("/debug/trace/unknown_trial", headers={"Authorization": API_KEY})
+    assert response.status_code == 404
@@ -0,0 +1,91 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""Test functions for asyncio engine and executor."""
+import threading
+import time
+
+from lifecycle_manager.executor.async_engine import AsyncEngine
+
+
+def create_engine(_id='test'):
+    """Create engine with fake states."""
+    engine = AsyncEngine(_id, None)
+    engine.executor._create_states(['FakeInit', 'FakeRun', 'FakeRunFail', 'Waiting', 'Finish', 'Fail'])
+    engine.start()
+    return engine
+
+
+class TestAsyncEngineExecutor():
+    """Test class for asyncio engine and excutor."""
+
+    def setup_method(self, method):
+        """Setup method for each test."""
+        self.engine = create_engine()
+
+    def teardown_method(self, method):
+        """Teardown of each test."""
+        self.engine.set_stop_event()
+        self.engine.join(5)
+
+    def test_run_engine(self):
+        """Run engine and only engine."""
+        assert self.engine.is_alive()
+        assert not self.engine.failed
+        assert not self.engine.executor.is_alive()
+
+    def test_waiting_game(self):
+        """Test that wait sets flags and allows state change when flag set."""
+        self.engine.executor._run_params['current_state'] = 'FakeInit'
+        self.engine.set_execute_event()
+        time.sleep(1)
+        assert self.engine.get_executor_status() == 'Running'
+        time.sleep(3)
+        assert self.engine.get_executor_status() == 'Waiting'
+        assert self.engine.set_executor_state('FakeRun')
+
+    def test_executor_fail_and_restore(self):
+        """Test executor fail case and restore."""
+        self.engine.executor._run_params['current_state'] = 'FakeRunFail'
+        self.engine.set_execute_event()
+        time.sleep(1)
+        assert self.engine.failed
+        assert self.engine.backup is not None
+        assert self.engine.is_alive()
+        self.engine.backup['_run_params']['current_state'] = 'Waiting'
+        self.engine.restore()
+        time.sleep(1)
+        assert not self.engine.failed
+        assert self.engine.executor.is_alive()
+        assert self.engine.get_executor_status() == 'Waiting'
+
+    def test_executor_finish(self):
+        """Test executor finish and shutdown."""
+        self.engine.executor._run_params['current_state'] = 'Waiting'
+        self.engine.set_execute_event()
+        time.sleep(1)
+        assert self.engine.set_executor_state('Finish')
+        self.engine.join(5)
+        assert self.engine.finished
+        assert not self.engine.is_alive()
+        assert not self.engine.executor.is_alive()
+
+
+def test_many_engines_share_threads():
+    """Test that waiting executors do not consume a thread each."""
+    engines = [create_engine(str(_id)) for _id in range(200)]
+    threads_before = threading.active_count()
+    for engine in engines:
+        engine.executor._run_params['current_state'] = 'Waiting'
+        engine.set_execute_event()
+    time.sleep(1)
+    assert all(engine.get_executor_status() == 'Waiting' for engine in engines)
+    assert threading.active_count() - threads_before < 10
+    for engine in engines:
+        engine.set_stop_event()
+    for engine in engines:
+        engine.join(5)
+        assert not engine.is_alive()
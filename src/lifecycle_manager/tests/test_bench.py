@@ -0,0 +1,33 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit tests of the end-to-end benchmark analysis."""
+from lifecycle_manager.bench.trials import _percentiles, analyse
+from lifecycle_manager.utils.tracing import Tracer
+
+
+def test_analyse_trial_spans():
+    """Test state durations, elapsed time and callback to transition latency from trial spans."""
+    tracer = Tracer()
+    for trial_id, offset in (('a', 0.0), ('b', 1.0)):
+        tracer.record(trial_id, 'state', 100.0 + offset, 0.5, state='SliceDeployment')
+        tracer.record(trial_id, 'callback', 101.0 + offset, 0.01, path='callback/slice', status=200)
+        tracer.record(trial_id, 'callback', 101.0 + offset, 0.01, path='active', status=400)
+        tracer.record(trial_id, 'state', 101.02 + offset, 0.2, state='UpdateDeploymentSlice')
+    results = analyse(tracer, ['a', 'b'])
+    assert results["elapsed_s"] == 2.22
+    assert results["states"]["SliceDeployment"] == {"count": 2, "p50_ms": 500.0, "p99_ms": 500.0}
+    assert list(results["callback_to_transition"]) == ['callback/slice']
+    assert results["callback_to_transition"]["callback/slice"]["count"] == 2
+    assert round(results["callback_to_transition"]["callback/slice"]["p50_ms"]) == 20
+
+
+def test_percentiles_nearest_rank():
+    """Test that p99 is never below p50 and is the maximum of small samples."""
+    assert _percentiles([0.5, 0.1]) == {"count": 2, "p50_ms": 100.0, "p99_ms": 500.0}
+    samples = [number / 1000 for number in range(1, 51)]
+    assert _percentiles(samples)["p99_ms"] == 50.0
+    assert _percentiles(samples)["p50_ms"] == 25.0
+    assert _percentiles([number / 1000 for number in range(1, 201)])["p99_ms"] == 198.0
@@ -0,0 +1,91 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for durable executor checkpoints and recovery."""
+import time
+
+from lifecycle_manager.config.services import Settings
+from lifecycle_manager.executor.checkpoint import CheckpointStore, get_checkpoint_store, FAILED
+from lifecycle_manager.executor.engine import Engine
+from lifecycle_manager.scheduler.scheduler_handler import SchedulerHandler
+
+
+def snapshot(state, previous_state=None):
+    """Return executor snapshot in state."""
+    return {'_trial_info': {'trialID': 'x'}, '_responses': {},
+            '_run_params': {'current_state': state, 'previous_state': previous_state, 'retries': 0,
+                            'state_lock': False, 'finished': False, 'kpi_status': None, 'status': 'Running',
+                            'token': 'token', 'slice_created': False, 'last_status': None}}
+
+
+def test_store_latest_checkpoint(tmp_path):
+    """Test that the latest checkpoint of each open trial is returned, also after compacting."""
+    store = CheckpointStore(str(tmp_path / 'checkpoints.db'))
+    store.save('1', snapshot('GetTrialInfo'))
+    store.save('1', snapshot('SliceDeployment'))
+    store.save('2', snapshot('GetTrialInfo'))
+    store.close_trial('2')
+    store.save('3', snapshot('Fail'), FAILED)
+    assert store.flush(5)
+    assert list(store.latest()) == ['1']
+    assert store.latest()['1']['_run_params']['current_state'] == 'SliceDeployment'
+    store.compact()
+    assert store.latest((FAILED,))['3']['_run_params']['current_state'] == 'Fail'
+    reopened = CheckpointStore(str(tmp_path / 'checkpoints.db'))
+    assert reopened.latest()['1']['_run_params']['current_state'] == 'SliceDeployment'
+
+
+def test_store_compacts_after_close(tmp_path):
+    """Test that the writer compacts the journal when a trial is closed, so it doesn't grow while running."""
+    store = CheckpointStore(str(tmp_path / 'checkpoints.db'), compact_interval=0)
+    store.save('1', snapshot('GetTrialInfo'))
+    store.save('1', snapshot('SliceDeployment'))
+    store.save('2', snapshot('GetTrialInfo'))
+    assert store.flush(5)
+    store.close_trial('2')
+    assert store.flush(5)
+    rows = store._connection.execute('SELECT trial_id, state FROM checkpoints').fetchall()  # pylint: disable=W0212
+    assert rows == [('1', 'SliceDeployment')]
+
+
+def test_engine_saves_checkpoints(tmp_path):
+    """Test that executor transitions are checkpointed and finishing closes the trial."""
+    settings = Settings()
+    settings.checkpoint_path = str(tmp_path / 'checkpoints.db')
+    engine = Engine('checkpointed', settings)
+    engine.executor._create_states(['FakeInit', 'FakeRun', 'Waiting', 'Finish'])
+    engine.executor._run_params['current_state'] = 'FakeInit'
+    engine.start()
+    engine.set_execute_event()
+    time.sleep(2.5)
+    engine.checkpoints.flush(5)
+    assert engine.checkpoints.latest()['checkpointed']['_run_params']['current_state'] == 'FakeRun'
+    time.sleep(1)
+    assert engine.set_executor_state('Finish')
+    engine.join(10)
+    engine.checkpoints.flush(5)
+    assert 'checkpointed' not in engine.checkpoints.latest()
+
+
+def test_recover_engine_instances(tmp_path, monkeypatch):
+    """Test that open trials are resumed and failed trials can be restored after restart."""
+    path = str(tmp_path / 'checkpoints.db')
+    monkeypatch.setenv('CHECKPOINT_PATH', path)
+    store = get_checkpoint_store(path)
+    store.save('waiting', snapshot('Waiting', 'UpdateStatusIdle'))
+    store.save('failed', snapshot('SliceDeployment'), FAILED)
+    store.flush(5)
+    scheduler_handler = SchedulerHandler()
+    recovered = {engine.id: engine for engine in scheduler_handler.recover_engine_instances()}
+    time.sleep(1)
+    assert recovered['waiting'].get_executor_status() == 'Waiting'
+    assert recovered['waiting'].executor.get_token == 'token'
+    assert recovered['failed'].failed
+    assert recovered['failed'].backup['_run_params']['current_state'] == 'SliceDeployment'
+    statuses = {status["ID"]: status["status"] for status in scheduler_handler.engine_instance_statuses}
+    assert statuses == {'waiting': 'Active', 'failed': 'Failed'}
+    assert scheduler_handler.recover_engine_instances() == []
+    scheduler_handler.stop_all_engine_instances()
+    scheduler_handler.internal_scheduler.signal_stop()
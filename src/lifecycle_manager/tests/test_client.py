@@ -0,0 +1,384 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for the downstream service client layer."""
+import time
+from threading import Event, Thread
+from types import SimpleNamespace
+
+import pytest
+
+from lifecycle_manager.client.circuit_breaker import CircuitBreaker, CircuitOpen
+from lifecycle_manager.client.rate_limiter import ServiceRateLimiter
+from lifecycle_manager.client.session_pool import SessionPool, get_session_pool, service_name
+from lifecycle_manager.client.timeouts import TimeoutPolicy
+from lifecycle_manager.client.token_cache import TokenCache, get_token_cache
+from lifecycle_manager.client.trial_cache import TrialCache
+from lifecycle_manager.config.services import Settings
+from lifecycle_manager.executor import states
+from lifecycle_manager.tests.dummy_modules import DummyHttpService
+
+
+@pytest.fixture(name="dummy_service")
+def fixture_dummy_service():
+    """Start dummy HTTP service for a test."""
+    service = DummyHttpService()
+    service.start()
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture(name="settings")
+def fixture_settings(dummy_service):
+    """Settings with all services pointing to the dummy service."""
+    settings = Settings()
+    for name in ('lcm', 'trial_enforcement', 'trial_repository', 'kpi_monitoring'):
+        getattr(settings, name)["url"] = dummy_service.url
+    settings.kpi_monitoring["auth_url"] = dummy_service.url + '/monitoring/token'
+    return settings
+
+
+def test_service_name(settings):
+    """Test that service entries are resolved to their names."""
+    assert service_name(settings, settings.trial_repository) == 'trial_repository'
+    assert service_name(settings, settings.trial_enforcement) == 'trial_enforcement'
+    assert service_name(settings, {"url": "http://other"}) == 'http://other'
+
+
+def test_session_reuses_connections(dummy_service, settings):
+    """Test that requests to a service reuse one kept alive connection."""
+    pool = SessionPool()
+    session = pool.session(settings, settings.trial_repository)
+    assert pool.session(settings, settings.trial_repository) is session
+    for _ in range(5):
+        assert session.request('GET', dummy_service.url + '/trial/').status_code == 200
+    stats = pool.stats()['trial_repository']
+    assert stats['requests'] == 5
+    assert stats['connections'] == 1
+    assert stats['reused'] == 4
+    pool.close()
+
+
+def test_form_and_send_authorization(dummy_service, settings):
+    """Test that precomputed api key is sent and explicit headers take precedence."""
+    executor = SimpleNamespace(services=settings)
+    states.form_and_send(executor, 'Post', settings.lcm, '/token/1')
+    assert dummy_service.requests[-1]['headers']['Authorization'] == settings.lcm['apikey']
+    states.form_and_send(executor, 'Delete', settings.lcm, '/token/1', None, None, {"Authorization": "token"})
+    assert dummy_service.requests[-1]['headers']['Authorization'] == 'token'
+
+
+def test_token_cache_single_flight():
+    """Test that concurrent requests for a token share one fetch."""
+    cache = TokenCache()
+
+    def fetch():
+        time.sleep(0.2)
+        return {"access_token": "abc", "expires_in": 300}
+
+    results = []
+    threads = [Thread(target=lambda: results.append(cache.get('kpi_monitoring', fetch))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["abc"] * 10
+    assert cache.fetches == 1
+    cache.clear()
+
+
+def test_token_cache_expiry_and_refresh():
+    """Test that expired tokens are fetched again and tokens are refreshed ahead of expiry."""
+    cache = TokenCache(refresh_margin=0.5)
+    counter = iter(range(100))
+
+    def fetch():
+        return {"access_token": str(next(counter)), "expires_in": 1}
+
+    assert cache.get('kpi_monitoring', fetch) == "0"
+    assert cache.get('kpi_monitoring', fetch) == "0"
+    time.sleep(0.8)
+    assert cache.fetches == 2
+    assert cache.get('kpi_monitoring', fetch) == "1"
+    cache.invalidate('kpi_monitoring')
+    assert cache.get('kpi_monitoring', fetch) == "2"
+    cache.clear()
+
+
+def test_token_cache_idle_token_not_refreshed():
+    """Test that a token not used since it was fetched is not refreshed and is fetched again on demand."""
+    cache = TokenCache(refresh_margin=0.5)
+    counter = iter(range(100))
+
+    def fetch():
+        return {"access_token": str(next(counter)), "expires_in": 1}
+
+    assert cache.get('kpi_monitoring', fetch) == "0"
+    time.sleep(0.8)
+    assert cache.fetches == 1
+    assert not cache._timers
+    time.sleep(0.3)
+    assert cache.get('kpi_monitoring', fetch) == "1"
+    assert cache.fetches == 2
+    cache.clear()
+
+
+def test_form_and_send_caches_token(dummy_service, settings):
+    """Test that token authenticated requests fetch the token only once."""
+    dummy_service.routes[('POST', '/monitoring/token')] = (200, {"access_token": "abc", "expires_in": 300})
+    executor = SimpleNamespace(services=settings)
+    get_token_cache().clear()
+    for _ in range(4):
+        states.form_and_send(executor, 'Post', settings.kpi_monitoring, '/markKPIData', {})
+    paths = [request['path'] for request in dummy_service.requests]
+    assert paths.count('/monitoring/token') == 1
+    assert paths.count('/markKPIData') == 4
+    assert dummy_service.requests[-1]['headers']['Authorization'] == 'bearer abc'
+    get_token_cache().clear()
+
+
+def test_trial_cache_revalidation():
+    """Test that trial documents are cached, revalidated after ttl and dropped on invalidation."""
+    cache = TrialCache(ttl=0.2)
+    sent_headers = []
+
+    def fetch(headers):
+        sent_headers.append(headers)
+        if headers.get('If-None-Match') == '"v1"':
+            return SimpleNamespace(status_code=304, headers={})
+        return SimpleNamespace(status_code=200, headers={'ETag': '"v1"'},
+                               json=lambda: {"id": 1, "nst": "{'name': 'slice'}", "flights": [1]})
+
+    status_code, document = cache.get(1, fetch)
+    assert status_code == 200
+    assert document.nst == {'name': 'slice'}
+    assert document.flights == [1]
+    assert cache.get('1', fetch)[1] is document
+    assert len(sent_headers) == 1
+    time.sleep(0.3)
+    assert cache.get(1, fetch)[1] is document
+    assert sent_headers[-1] == {'If-None-Match': '"v1"'}
+    cache.invalidate(1)
+    assert cache.get(1, fetch)[1] is not document
+    assert sent_headers[-1] == {}
+    assert cache.stats() == {"hits": 1, "misses": 2, "revalidated": 1, "size": 1, "coalesced": 0}
+
+
+def test_trial_cache_error_not_cached():
+    """Test that failed requests are not cached."""
+    cache = TrialCache()
+    assert cache.get(1, lambda headers: SimpleNamespace(status_code=404, headers={})) == (404, None)
+    assert cache.stats()["size"] == 0
+
+
+def test_trial_cache_invalidated_read_not_cached():
+    """Test that a read in flight when its trial is invalidated is not cached and no entry of it is kept."""
+    cache = TrialCache()
+    started, release = Event(), Event()
+
+    def fetch(headers):
+        started.set()
+        release.wait(5)
+        return SimpleNamespace(status_code=200, headers={}, json=lambda: {"id": 1})
+
+    reader = Thread(target=cache.get, args=(1, fetch))
+    reader.start()
+    assert started.wait(5)
+    cache.invalidate(1)
+    release.set()
+    reader.join()
+    assert cache.stats()["size"] == 0
+    assert cache.get(1, fetch)[0] == 200
+    assert cache.stats()["size"] == 1
+    assert not cache._reads
+
+
+def test_trial_cache_coalesces_concurrent_reads():
+    """Test that concurrent reads of a trial and of the trial list share one request each."""
+    cache = TrialCache()
+    sent = []
+
+    def fetch(headers):
+        sent.append(headers)
+        time.sleep(0.3)
+        return SimpleNamespace(status_code=200, headers={}, json=lambda: {"id": 1})
+
+    def read_all():
+        sent.append('all')
+        time.sleep(0.3)
+        return True, "", [{"trial_id": "1"}]
+
+    documents = []
+    results = []
+    threads = [Thread(target=lambda: documents.append(cache.get(1, fetch)[1])) for _ in range(5)]
+    threads += [Thread(target=lambda: results.append(cache.read_shared('/trial/', read_all))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(sent) == 2
+    assert len(documents) == 5 and all(document is documents[0] for document in documents)
+    assert results == [(True, "", [{"trial_id": "1"}])] * 3
+    assert cache.stats()["coalesced"] == 6
+
+
+def test_kpi_markings_sent_concurrently(dummy_service, settings):
+    """Test that trial and slice markings are sent concurrently, or batched when enabled."""
+    def slow_marking(_handler):
+        time.sleep(0.5)
+        return 200, {}
+
+    dummy_service.routes[('POST', '/monitoring/token')] = (200, {"access_token": "abc", "expires_in": 300})
+    dummy_service.routes[('POST', '/markKPIData')] = slow_marking
+    executor = SimpleNamespace(services=settings, get_trial_information={
+        "trialID": "1", "DeployedSlice": {"Slice": {"id": "slice"}}})
+    get_token_cache().clear()
+    states.form_and_send(executor, 'Get', settings.kpi_monitoring, '/')
+    started = time.monotonic()
+    assert states.send_kpi_markings(executor, "Idle")
+    assert time.monotonic() - started < 0.9
+    marked = [request['body'] for request in dummy_service.requests if request['path'] == '/markKPIData']
+    assert len(marked) == 2
+
+    settings.kpi_monitoring["batch_markings"] = True
+    assert states.send_kpi_markings(executor, "Active")
+    assert b'"MarkingID": "slice"' in dummy_service.requests[-1]['body']
+    assert b'"MarkingID": "1"' in dummy_service.requests[-1]['body']
+    get_token_cache().clear()
+
+
+class FakeClock:
+    """Monotonic clock advanced only by sleep."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        """Advance the clock."""
+        self.now += seconds
+
+
+def test_rate_limiter_queues_requests():
+    """Test that requests over the rate of a service and its endpoint wait for their turn instead of failing."""
+    clock = FakeClock()
+    options = {"rate": 20, "burst": 2, "endpoints": {"/trial/slow": {"rate": 5}}}
+    limiter = ServiceRateLimiter('trial_repository', options, clock, clock.sleep)
+    waits = [limiter.acquire('/trial/') for _ in range(6)]
+    assert waits == pytest.approx([0, 0, 0.05, 0.05, 0.05, 0.05])
+    assert clock.now == pytest.approx(0.2)
+    assert limiter.acquire('/trial/slow') == pytest.approx(0.05)
+    assert limiter.acquire('/trial/slow') == pytest.approx(0.15)
+    stats = limiter.stats()
+    assert stats['delayed'] == 6
+    assert stats['wait_max_s'] == 0.15
+
+
+def test_session_throttles_with_rate_limits(settings):
+    """Test that sessions of limited services get a rate limiter keyed by endpoint path without query."""
+    settings.rate_limits = {"trial_repository": {"rate": 20, "burst": 2}}
+    pool = SessionPool()
+    session = pool.session(settings, settings.trial_repository)
+    assert session.rate_limiter is not None
+    assert pool.session(settings, settings.trial_enforcement).rate_limiter is None
+    assert session.throttle(session.url + '/trial/?x=1') == 0
+    assert 'rate_limit' in pool.stats()['trial_repository']
+    pool.close()
+
+
+def test_circuit_breaker_states():
+    """Test that failures open the circuit, which fails fast until a probe after the cooldown succeeds."""
+    breaker = CircuitBreaker('trial_enforcement', failure_rate=0.5, min_requests=2, window=4, cooldown=0.2)
+    for success in (True, False, True, False):
+        breaker.before_request()
+        breaker.record(success)
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpen):
+        breaker.before_request()
+    time.sleep(0.25)
+    assert breaker.state == 'half-open'
+    breaker.before_request()
+    with pytest.raises(CircuitOpen):
+        breaker.before_request()
+    breaker.record(False)
+    assert breaker.state == 'open'
+    time.sleep(0.25)
+    breaker.before_request()
+    breaker.record(True)
+    assert breaker.stats() == {"state": "closed", "failures": 0, "requests": 0, "rejected": 2}
+
+
+def test_form_and_send_parks_on_open_circuit(dummy_service, settings):
+    """Test that 5xx responses open the circuit and later requests park the executor without being sent."""
+    dummy_service.routes[('POST', '/slice')] = (503, {})
+    settings.circuit_breakers = {"trial_enforcement": {"min_requests": 2, "cooldown": 5}}
+    parked = []
+    executor = SimpleNamespace(services=settings, park=lambda service, retry_after: parked.append(service))
+    for _ in range(2):
+        assert states.form_and_send(executor, 'Post', settings.trial_enforcement, '/slice').status_code == 503
+    sent = len(dummy_service.requests)
+    assert states.form_and_send(executor, 'Post', settings.trial_enforcement, '/slice') is None
+    assert len(dummy_service.requests) == sent
+    assert parked == ['trial_enforcement']
+
+
+def test_half_open_probe_released_when_token_fetch_fails(dummy_service, settings):
+    """Test that a half-open probe whose access token fetch fails frees its slot instead of blocking the circuit."""
+    dummy_service.routes[('POST', '/monitoring/token')] = (200, {"access_token": "abc", "expires_in": 300})
+    dummy_service.routes[('POST', '/markKPIData')] = (503, {})
+    settings.circuit_breakers = {"kpi_monitoring": {"min_requests": 2, "cooldown": 0.2}}
+    executor = SimpleNamespace(services=settings, park=lambda service, retry_after: None)
+    get_token_cache().clear()
+    for _ in range(2):
+        assert states.form_and_send(executor, 'Post', settings.kpi_monitoring, '/markKPIData').status_code == 503
+    time.sleep(0.25)
+    get_token_cache().clear()
+    dummy_service.routes[('POST', '/monitoring/token')] = (500, {})
+    assert states.form_and_send(executor, 'Post', settings.kpi_monitoring, '/markKPIData') is None
+    breaker = get_session_pool().session(settings, settings.kpi_monitoring).circuit_breaker
+    assert breaker.state == 'half-open'
+    dummy_service.routes[('POST', '/monitoring/token')] = (200, {"access_token": "abc", "expires_in": 300})
+    dummy_service.routes[('POST', '/markKPIData')] = (200, {})
+    assert states.form_and_send(executor, 'Post', settings.kpi_monitoring, '/markKPIData').status_code == 200
+    assert breaker.state == 'closed'
+    get_token_cache().clear()
+    get_session_pool().close()
+
+
+def test_endpoint_timeouts(settings):
+    """Test that endpoint timeouts override service defaults and adaptive ones follow observed latency."""
+    settings.http_timeouts = {"kpi_monitoring": {
+        "read": 20,
+        "adaptive": {"enabled": True, "min_samples": 10, "floor": 1.0, "cap": 5.0},
+        "endpoints": {"/sliceDeployment": {"read": 120, "adaptive": {"enabled": False}}}}}
+    policy = TimeoutPolicy('kpi_monitoring', settings)
+    slow = policy.endpoint('POST', '/sliceDeployment/42')
+    marking = policy.endpoint('post', '/markKPIData?x=1')
+    assert policy.endpoint('POST', '/markKPIData') is marking
+    assert (slow.connect, slow.read_timeout()) == (settings.http_timeout["connect"], 120)
+    assert marking.read_timeout() == 20
+    for _ in range(10):
+        marking.observe(0.1)
+        slow.observe(0.1)
+    assert marking.read_timeout() == 1.0
+    marking.observe(2.0)
+    assert marking.read_timeout() == 4.0
+    marking.observe(30.0)
+    assert marking.read_timeout() == 5.0
+    assert slow.read_timeout() == 120
+    assert policy.stats()['POST /markKPIData']['samples'] == 12
+
+
+def test_session_applies_timeouts(dummy_service, settings):
+    """Test that requests without explicit timeout use and feed the endpoint timeout."""
+    pool = SessionPool()
+    session = pool.session(settings, settings.trial_repository)
+    session.request('GET', dummy_service.url + '/trial/7/')
+    stats = pool.stats()['trial_repository']['timeouts']['GET /trial']
+    assert stats['samples'] == 1
+    assert stats['current_read'] == settings.http_timeout["read"]
+    pool.close()
@@ -29,7 +29,6 @@ class TestEngineExecutor():
         assert self.engine.is_alive()
         assert not self.engine._failed
         assert not self.engine.executor.is_alive()
-        assert not self.engine.process_check_thread.is_alive()
 
     def test_run_executor(self):
         """Run engine and executor."""
@@ -73,6 +72,15 @@ class TestEngineExecutor():
         assert self.engine._failed
         assert self.engine.is_alive()
 
+    def test_executor_fail_notification(self):
+        """Test that listeners are notified when executor fails."""
+        events = []
+        self.engine.add_listener(lambda engine, event: events.append(event))
+        self.engine.executor._run_params['current_state'] = 'FakeRunFail'
+        self.engine.set_execute_event()
+        time.sleep(1)
+        assert events == ['failed']
+
     def test_executor_backup(self):
         """Test that backup to engine is created."""
         self.engine.executor._run_params['current_state'] = 'FakeRunFail'
@@ -99,9 +107,12 @@ class TestEngineExecutor():
         self.engine.executor._run_params['current_state'] = 'Waiting'
         self.engine.set_execute_event()
         time.sleep(5)
+        events = []
+        self.engine.add_listener(lambda engine, event: events.append(event))
         response = self.engine.set_executor_state('Finish')
         assert response
         time.sleep(5)
+        assert events == ['finished']
         assert self.engine.executor._run_params['finished']
         assert not self.engine._failed
         assert not self.engine.is_alive()
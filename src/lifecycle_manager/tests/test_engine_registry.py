@@ -0,0 +1,42 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit tests of EngineRegistry."""
+from lifecycle_manager.scheduler.engine_registry import EngineRegistry
+from lifecycle_manager.tests.dummy_modules import DummyEngine
+
+
+def test_lookup_and_status_index():
+    """Test that engines are found by trial ID and counted and listed by status."""
+    engines = EngineRegistry()
+    for trial_id in ('a', 'b', 'c'):
+        engines.add(DummyEngine(trial_id))
+    assert engines.get('b').id == 'b'
+    assert engines.get('x') is None
+    assert 'c' in engines and len(engines) == 3
+    assert engines.set_status('b', 'Finished')
+    assert not engines.set_status('x', 'Finished')
+    assert engines.status('b') == 'Finished'
+    assert engines.count_by_status() == {"Active": 2, "Finished": 1}
+    assert engines.trial_ids('Active') == ['a', 'c']
+    assert engines.statuses() == [{"ID": 'a', "status": 'Active'}, {"ID": 'b', "status": 'Finished'},
+                                  {"ID": 'c', "status": 'Active'}]
+
+
+def test_replace_remove_and_clear():
+    """Test that the status index follows replaced and removed engines."""
+    engines = EngineRegistry()
+    engines.add(DummyEngine('a'))
+    engines.set_status('a', 'Failed')
+    replacement = DummyEngine('a')
+    engines.add(replacement)
+    assert engines.get('a') is replacement
+    assert engines.count_by_status() == {"Active": 1}
+    engines.add(DummyEngine('b'))
+    assert engines.remove('a') is replacement
+    assert engines.remove('a') is None
+    assert engines.count_by_status() == {"Active": 1}
+    assert [engine.id for engine in engines.clear()] == ['b']
+    assert not engines.engines() and engines.count_by_status() == {}
@@ -0,0 +1,44 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for the failure report sink."""
+import gzip
+import json
+
+from lifecycle_manager.executor.failure_reports import FailureReportSink
+
+
+def create_sink(tmp_path, **options):
+    """Create sink writing to tmp_path."""
+    arguments = {"path": str(tmp_path / 'failures.jsonl'), "max_bytes": 1024 * 1024, "backup_count": 2,
+                 "queue_size": 100, "recent": 3}
+    arguments.update(options)
+    return FailureReportSink(**arguments)
+
+
+def test_reports_written_as_json_lines(tmp_path):
+    """Test that reports are written as JSON lines and latest ones can be queried."""
+    sink = create_sink(tmp_path)
+    for trial_id in range(5):
+        sink.report(trial_id, 'SliceDeployment', {'retries': 2}, {'SliceDeployment': {'status_code': 503}})
+    assert sink.flush(5)
+    with open(str(tmp_path / 'failures.jsonl')) as report_file:
+        reports = [json.loads(line) for line in report_file]
+    assert [report["trialID"] for report in reports] == ['0', '1', '2', '3', '4']
+    assert reports[0]["responses"]["SliceDeployment"]["status_code"] == 503
+    assert [report["trialID"] for report in sink.recent()] == ['4', '3', '2']
+    assert [report["trialID"] for report in sink.recent(trial_id=3)] == ['3']
+
+
+def test_reports_rotated_and_compressed(tmp_path):
+    """Test that full files are compressed and only backup_count of them are kept."""
+    sink = create_sink(tmp_path, max_bytes=200)
+    for trial_id in range(10):
+        sink.report(trial_id, 'Fail', {'padding': 'x' * 200}, {})
+        sink.flush(5)
+    assert not (tmp_path / 'failures.jsonl').exists()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['failures.jsonl.1.gz', 'failures.jsonl.2.gz']
+    with gzip.open(str(tmp_path / 'failures.jsonl.1.gz'), 'rt') as report_file:
+        assert json.loads(report_file.readline())["trialID"] == '9'
@@ -0,0 +1,41 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for module mailbox."""
+import pytest
+
+from lifecycle_manager.utils.mailbox import Mailbox, MailboxFull, Message, RUN, STATE, STOP
+
+
+def test_messages_in_order():
+    """Test that messages are returned in order with their targets."""
+    mailbox = Mailbox()
+    mailbox.put(STATE, 'SendKpiActive')
+    mailbox.put(STATE, 'UpdateStatusStopping')
+    assert mailbox.get() == Message(STATE, 'SendKpiActive')
+    assert mailbox.get() == Message(STATE, 'UpdateStatusStopping')
+    assert mailbox.get(timeout=0.1) is None
+
+
+def test_urgent_and_coalesced_messages():
+    """Test that urgent messages go first and coalesced duplicates are dropped."""
+    mailbox = Mailbox(maxsize=2)
+    mailbox.put(RUN, coalesce=True)
+    mailbox.put(RUN, coalesce=True)
+    assert len(mailbox) == 1
+    mailbox.put(STATE, 'Finish')
+    mailbox.put(STOP, urgent=True)
+    assert mailbox.get_nowait().kind == STOP
+    assert mailbox.get_nowait().kind == RUN
+
+
+def test_full_mailbox():
+    """Test that a full mailbox rejects messages and calls notify for accepted ones."""
+    notified = []
+    mailbox = Mailbox(maxsize=1, notify=lambda: notified.append(True))
+    mailbox.put(STATE, 'Finish')
+    with pytest.raises(MailboxFull):
+        mailbox.put(STATE, 'Fail')
+    assert len(notified) == 1
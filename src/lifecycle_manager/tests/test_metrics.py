@@ -0,0 +1,33 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for metrics rendering."""
+from lifecycle_manager.utils.metrics import Gauge, Histogram, Registry
+
+
+def test_histogram_render():
+    """Test cumulative buckets, sum and count per label values."""
+    histogram = Histogram('test_seconds', 'Test.', ('state',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'A')
+    histogram.observe(0.5, 'A')
+    histogram.observe(5, 'A')
+    histogram.observe(0.1, 'B')
+    lines = histogram.render()
+    assert 'test_seconds_bucket{state="A",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{state="A",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{state="A",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{state="A"} 5.55' in lines
+    assert 'test_seconds_count{state="A"} 3' in lines
+    assert 'test_seconds_bucket{state="B",le="0.1"} 1' in lines
+
+
+def test_registry_render():
+    """Test that gauges are read from their callbacks."""
+    registry = Registry()
+    registry.register(Gauge('test_engines', 'Test.', ('status',), lambda: {('Active',): 2, ('Failed',): 1}))
+    text = registry.render()
+    assert '# TYPE test_engines gauge' in text
+    assert 'test_engines{status="Active"} 2' in text
+    assert 'test_engines{status="Failed"} 1' in text
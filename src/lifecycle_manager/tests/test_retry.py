@@ -0,0 +1,74 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for retry policies of failed states."""
+import time
+
+from lifecycle_manager.config.services import Settings
+from lifecycle_manager.executor.engine import Engine
+from lifecycle_manager.executor.retry import RetryPolicy
+
+
+def test_policy_from_settings():
+    """Test that per state overrides are merged on top of the default policy."""
+    settings = Settings()
+    settings.retry_policies = {"SliceDeployment": {"max_attempts": 5}}
+    assert RetryPolicy.for_state(settings, 'SliceDeployment').max_attempts == 5
+    assert RetryPolicy.for_state(settings, 'GetTrialInfo').max_attempts == settings.retry_policy["max_attempts"]
+    assert RetryPolicy.for_state(None, 'GetTrialInfo').max_attempts == 1
+
+
+def test_policy_backoff():
+    """Test exponential delays, cap and jitter."""
+    policy = RetryPolicy(max_attempts=10, base_delay=1, max_delay=5, jitter=0)
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == [1, 2, 4, 5, 5]
+    policy.jitter = 0.5
+    for attempt in range(1, 6):
+        assert min(5, 2 ** (attempt - 1)) / 2 <= policy.delay(attempt) <= min(5, 2 ** (attempt - 1))
+
+
+def test_policy_retryable_statuses():
+    """Test that only listed status codes are retried, and missing responses only if enabled."""
+    policy = RetryPolicy(max_attempts=3, retry_statuses=[503])
+    assert policy.should_retry(1, 503)
+    assert not policy.should_retry(1, None)
+    assert not policy.should_retry(1, 422)
+    assert not policy.should_retry(3, 503)
+    policy.retry_unanswered = True
+    assert policy.should_retry(2, None)
+
+
+def test_executor_retries_failed_state():
+    """Test that a failed state is retried on a timer before the executor fails."""
+    services = Settings()
+    services.retry_policy = {"max_attempts": 3, "base_delay": 0.2, "jitter": 0, "retry_unanswered": True}
+    engine = Engine('test_retry', services)
+    engine.executor._create_states(['FakeRunFail', 'Waiting', 'Finish', 'Fail'])
+    engine.executor._run_params['current_state'] = 'FakeRunFail'
+    engine.start()
+    engine.set_execute_event()
+    time.sleep(0.1)
+    assert engine.get_executor_status() == 'Retrying'
+    assert not engine.failed
+    time.sleep(1)
+    assert engine.failed
+    assert engine.backup['_run_params']['retries'] == 2
+    engine.set_stop_event()
+    engine.join()
+
+
+def test_executor_parks_on_open_circuit():
+    """Test that a state failing on an open circuit is parked and run again instead of failing the trial."""
+    services = Settings()
+    engine = Engine('test_park', services)
+    engine.executor._create_states(['FakeRunFail', 'Waiting', 'Finish', 'Fail'])
+    engine.executor._run_params['current_state'] = 'FakeRunFail'
+    engine.executor.park('trial_enforcement', 0.2)
+    engine.executor._handle_fail_event()
+    assert engine.get_executor_status() == 'Parked'
+    assert not engine.failed
+    assert engine.executor._get_retries() == 0
+    time.sleep(0.4)
+    assert engine.executor.mailbox.get(timeout=0).kind == 'run'
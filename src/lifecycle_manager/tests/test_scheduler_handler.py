@@ -4,9 +4,15 @@
 # SPDX-License-Identifier: Apache-2.0
 
 """Tests for module scheduler_handler."""
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 
+from lifecycle_manager.client.session_pool import get_session_pool
+from lifecycle_manager.config.services import Settings
+from lifecycle_manager.scheduler import scheduler_handler as scheduler_handler_module
 from lifecycle_manager.scheduler.scheduler_handler import SchedulerHandler
-from lifecycle_manager.tests.dummy_modules import DummyInternalScheduler
+from lifecycle_manager.tests.dummy_modules import DummyHttpService, DummyInternalScheduler
 
 # Initialize Scheduler Handler instance
 scheduler_handler = SchedulerHandler()
@@ -36,6 +42,15 @@ def test_create_engine_instance():
     assert scheduler_handler.engine_instances
 
 
+def test_handle_engine_event():
+    """Test scheduler_handler.handle_engine_event.
+    Assert that engine status is updated from the event.
+    """
+    engine_instance = scheduler_handler.engine_instances[0]
+    scheduler_handler.handle_engine_event(engine_instance, 'failed')
+    assert scheduler_handler.engine_instance_statuses[0]["status"] == "Failed"
+
+
 def test_restore_engine_instance():
     """Test scheduler_handler.restore_engine_instance for an existing instance.
     Assert correct response.
@@ -58,3 +73,41 @@ def test_stop_all_engine_instances():
     """
     assert scheduler_handler.stop_all_engine_instances()
     assert not scheduler_handler.engine_instances
+
+
+def test_polling_survives_open_circuit(monkeypatch):
+    """Test scheduler_handler.run while Trial registry is down.
+    Assert that polls after the circuit of trial_repository opens fail without a request and the loop keeps running.
+    """
+    service = DummyHttpService()
+    service.start()
+    service.routes[('GET', '/trial/')] = (503, {})
+    monkeypatch.setenv('TRIAL_REPOSITORY', json.dumps(dict(Settings().trial_repository, url=service.url)))
+    monkeypatch.setenv('CIRCUIT_BREAKERS', json.dumps({"trial_repository": {"min_requests": 2, "cooldown": 60}}))
+    handler = SchedulerHandler()
+    handler.internal_scheduler = DummyInternalScheduler(handler)
+    handler.toggle_automatic_scheduling()
+    polls = []
+    fetch_all_trials = handler.fetch_all_trials
+    monkeypatch.setattr(handler, 'fetch_all_trials', lambda: polls.append(fetch_all_trials()))
+    now = [datetime.utcnow()]
+
+    def utcnow():
+        now[0] += timedelta(minutes=2)
+        return now[0]
+
+    def sleep(_seconds):
+        if len(polls) == 4:
+            handler.shutdown()
+
+    monkeypatch.setattr(scheduler_handler_module, 'datetime', SimpleNamespace(utcnow=utcnow))
+    monkeypatch.setattr(scheduler_handler_module.time, 'sleep', sleep)
+    try:
+        handler.run()
+    finally:
+        service.shutdown()
+        get_session_pool().close()
+    assert len(polls) == 4
+    assert not any(success for success, _ in polls)
+    assert "Circuit of trial_repository is open" in polls[-1][1]
+    assert len(service.requests) == 2
@@ -0,0 +1,141 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit tests of the service simulator."""
+import random
+import time
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from lifecycle_manager.simulator.app import SimulatorServer, create_app
+from lifecycle_manager.simulator.distributions import Distribution, PathTable
+from lifecycle_manager.simulator.settings import SimulatorSettings
+from lifecycle_manager.tests.dummy_modules import DummyHttpService
+
+
+@pytest.fixture(name="lcm")
+def fixture_lcm():
+    """Start dummy LCM receiving callbacks."""
+    service = DummyHttpService()
+    service.start()
+    yield service
+    service.shutdown()
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_distributions():
+    """Test that distributions sample non-negative durations around their parameters."""
+    rng = random.Random(1)
+    assert Distribution({"distribution": "constant", "value": 0.3}, rng).sample() == 0.3
+    samples = [Distribution({"distribution": "uniform", "low": 1, "high": 2}, rng).sample() for _ in range(100)]
+    assert all(1 <= sample <= 2 for sample in samples)
+    samples = sorted(Distribution({"distribution": "lognormal", "median": 0.1, "sigma": 0.5}, rng).sample()
+                     for _ in range(1001))
+    assert 0.08 < samples[500] < 0.12
+    assert Distribution({"distribution": "normal", "mean": -5, "stddev": 0}, rng).sample() == 0.0
+    with pytest.raises(ValueError):
+        Distribution({"distribution": "pareto"}, rng)
+
+
+def test_path_table():
+    """Test that the longest prefix wins and a method qualified prefix only matches its method."""
+    table = PathTable('default', {"/trial": 'trial', "PUT /trial": 'put', "/trial/sim-1": 'one'})
+    assert table.get('GET', '/trial/sim-0/') == 'trial'
+    assert table.get('PUT', '/trial/sim-0/') == 'put'
+    assert table.get('PUT', '/trial/sim-1/') == 'one'
+    assert table.get('POST', '/tap') == 'default'
+
+
+def test_trial_repository(lcm):
+    """Test trial listing, conditional GET and update followed by the command of the status."""
+    lcm.routes[('POST', '/trial/sim-0/finish')] = (200, {"message": "State change registered"})
+    app = create_app(SimulatorSettings(trials=2, auto_create_trials=False, lcm_url=lcm.url, lcm_apikey="key",
+                                       command_delay={"distribution": "constant", "value": 0.0}))
+    client = TestClient(app)
+    trials = client.get('/trial/').json()
+    assert [trial["id"] for trial in trials] == ['sim-0', 'sim-1']
+    response = client.get('/trial/sim-0/')
+    assert response.json()["status"] == "APPROVED"
+    etag = response.headers["ETag"]
+    assert client.get('/trial/sim-0/', headers={"If-None-Match": etag}).status_code == 304
+    assert client.put('/trial/sim-0/', json={"status": "ACTIVE"}).status_code == 204
+    response = client.get('/trial/sim-0/', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["status"] == "ACTIVE"
+    assert client.get('/trial/other/').status_code == 404
+    simulation = app.state.simulation
+    assert _wait_for(lambda: simulation.commands.stats()["delivered"] == 1)
+    assert lcm.requests[-1]["headers"]["Authorization"] == "key"
+    simulation.commands.shutdown()
+
+
+def test_slice_deployment_calls_back(lcm):
+    """Test that a slice deployment is answered at once and called back with the token, resent until accepted."""
+    answers = [(400, {"detail": "Executor not ready for state change."}), (200, {})]
+    lcm.routes[('POST', '/trial/sim-0/callback/slice')] = lambda handler: answers.pop(0)
+    app = create_app(SimulatorSettings(callback_delay={"distribution": "constant", "value": 0.05},
+                                       callback_retry_delay=0.05))
+    client = TestClient(app)
+    callback_url = lcm.url + '/trial/sim-0/callback/slice'
+    response = client.post('/sliceDeployment', json={"trialID": "sim-0", "Authorization": "token"},
+                           params={"callback_url": callback_url})
+    assert response.status_code == 201
+    assert response.json() == {"Slice": {"id": "slice-sim-0"}}
+    assert client.post('/sliceDeployment', json={"trialID": "sim-0", "Authorization": "token"},
+                       params={"callback_url": callback_url}).status_code == 409
+    simulation = app.state.simulation
+    assert _wait_for(lambda: simulation.callbacks.stats()["delivered"] == 1)
+    assert simulation.callbacks.stats()["resent"] == 1
+    assert lcm.requests[-1]["headers"]["Authorization"] == "token"
+    simulation.callbacks.shutdown()
+
+
+def test_enforcement_and_monitoring():
+    """Test measurement jobs, markings and access tokens."""
+    app = create_app(SimulatorSettings())
+    client = TestClient(app)
+    response = client.post('/measurementjobs', json={"trialID": "sim-0"})
+    assert response.status_code == 201
+    measurement_id = response.json()["MeasurementID"]
+    assert client.post('/markKPIData', json=[{"Marking": "Idle"}, {"Marking": "Idle"}]).status_code == 200
+    assert client.delete('/measurementjobs/' + measurement_id, json={"trialID": "sim-0"}).status_code == 204
+    assert client.delete('/measurementjobs/' + measurement_id).status_code == 404
+    token = client.post('/monitoring/token', data={"grant_type": "client_credentials"}).json()
+    assert token["expires_in"] == 300
+    assert app.state.simulation.stats()["markings"] == 2
+
+
+def test_injected_errors_and_latency():
+    """Test that requests are delayed and failed as configured by path."""
+    app = create_app(SimulatorSettings(error_rates={"/tap": 1.0},
+                                       latencies={"/flightplan": {"distribution": "constant", "value": 0.2}}))
+    client = TestClient(app)
+    assert client.post('/tap', json={"trialID": "sim-0"}).status_code == 503
+    started = time.monotonic()
+    assert client.post('/flightplan', json={"trialID": "sim-0"}).status_code == 201
+    assert time.monotonic() - started >= 0.2
+    stats = app.state.simulation.stats()
+    assert stats["errors"] == {"POST /tap": 1}
+    assert stats["requests"] == {"POST /tap": 1, "POST /flightplan": 1}
+
+
+def test_simulator_server():
+    """Test that the simulator serves on a loopback port until shut down."""
+    server = SimulatorServer(SimulatorSettings(trials=1))
+    server.start()
+    try:
+        response = requests.get(server.url + '/trial/sim-0/', timeout=5)
+        assert response.status_code == 200
+    finally:
+        server.shutdown()
+    assert not server.is_alive()
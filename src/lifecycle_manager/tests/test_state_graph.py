@@ -0,0 +1,67 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for module state_graph."""
+import pytest
+
+from lifecycle_manager.executor import states
+from lifecycle_manager.executor.engine import Engine
+from lifecycle_manager.executor.state_graph import STATE_GRAPH, StateGraph, InvalidStateGraph
+
+
+def test_graph_of_all_states():
+    """Test that the compiled graph holds every state and the main transitions."""
+    assert 'GetCallbackToken' in STATE_GRAPH.states
+    assert STATE_GRAPH.allows_next('SliceDeployment', 'Waiting')
+    assert not STATE_GRAPH.allows_next('SliceDeployment', 'Finish')
+    assert STATE_GRAPH.allows_request('SliceDeployment', 'UpdateDeploymentSlice')
+    assert not STATE_GRAPH.allows_request('SliceDeployment', 'CloseService')
+    assert STATE_GRAPH.allows_request('SliceDeployment', 'UpdateStatusStopping')
+
+
+def test_unknown_state_is_rejected():
+    """Test that a graph referring to a missing state does not compile."""
+    class Broken(states.State):
+        """State with a transition to a missing state."""
+        next_states = ('Missing',)
+
+    with pytest.raises(InvalidStateGraph):
+        StateGraph({'Broken': Broken})
+
+
+def test_states_are_shared():
+    """Test that executors share the state instances."""
+    first = Engine('first', None)
+    second = Engine('second', None)
+    assert first.executor._states['Finish'] is second.executor._states['Finish']
+
+
+def test_state_request_checked():
+    """Test that only states allowed after the waited state can be requested."""
+    engine = Engine('test', None)
+    executor = engine.executor
+    executor._create_states(['FakeInit', 'FakeRun', 'Waiting', 'Finish'])
+    executor._run_params['current_state'] = 'Waiting'
+    executor._run_params['previous_state'] = 'FakeRun'
+    executor._handle_state_event('FakeInit')
+    assert executor.get_current_state == 'Waiting'
+    executor._handle_state_event('Finish')
+    assert executor.get_current_state == 'Finish'
+
+
+def test_illegal_state_request_rejected_synchronously():
+    """Test that a state not allowed after the waited state is rejected by set_state without posting it."""
+    engine = Engine('test', None)
+    executor = engine.executor
+    executor._create_states(['FakeInit', 'FakeRun', 'Waiting', 'Finish'])
+    executor._run_params['current_state'] = 'Waiting'
+    executor._run_params['previous_state'] = 'FakeRun'
+    executor.set_status('Waiting')
+    executor.is_alive = lambda: True
+    assert executor.set_state('FakeInit') == 1
+    assert executor.set_state('Missing') == 1
+    assert len(executor.mailbox) == 0
+    assert executor.set_state('Finish') == 0
+    assert len(executor.mailbox) == 1
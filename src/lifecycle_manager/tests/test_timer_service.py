@@ -0,0 +1,85 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for the timer service and delayed executor transitions."""
+import time
+
+from lifecycle_manager.config.services import Settings
+from lifecycle_manager.executor.engine import Engine
+from lifecycle_manager.utils.timer_service import TimerService, get_timer_service
+
+
+def test_timers_run_in_deadline_order():
+    """Test that callbacks run in deadline order and cancelled ones do not run."""
+    service = TimerService()
+    calls = []
+    service.call_later(0.3, calls.append, 'third')
+    service.call_later(0.1, calls.append, 'first')
+    service.call_later(0.2, calls.append, 'second')
+    service.call_later(0.15, calls.append, 'cancelled').cancel()
+    time.sleep(0.5)
+    assert calls == ['first', 'second', 'third']
+    assert not service
+
+
+def test_delayed_states_use_timer_service():
+    """Test that executors in a delayed state wait on the timer service."""
+    engines = []
+    for index in range(5):
+        engine = Engine('delayed_' + str(index), None)
+        engine.executor._create_states(['FakeInit', 'FakeRun', 'Waiting'])
+        engine.executor._run_params['current_state'] = 'FakeInit'
+        engine.start()
+        engines.append(engine)
+    for engine in engines:
+        engine.set_execute_event()
+    time.sleep(0.5)
+    pending = len(get_timer_service())
+    time.sleep(3)
+    statuses = [engine.get_executor_status() for engine in engines]
+    for engine in engines:
+        engine.set_stop_event()
+        engine.join()
+    assert pending >= len(engines)
+    assert statuses == ['Waiting'] * len(engines)
+
+
+def test_wait_timeout_fails_executor():
+    """Test that the executor fails if no callback arrives in the wait timeout."""
+    settings = Settings()
+    settings.wait_timeouts = {'FakeRun': 0.5}
+    engine = Engine('wait_timeout', settings)
+    engine.executor._create_states(['FakeRun', 'Waiting', 'Finish', 'Fail'])
+    engine.executor._run_params['current_state'] = 'FakeRun'
+    engine.start()
+    engine.set_execute_event()
+    time.sleep(1.5)
+    assert engine.get_executor_status() == 'Waiting'
+    assert not engine.failed
+    time.sleep(1)
+    assert engine.failed
+    engine.set_stop_event()
+    engine.join()
+
+
+def test_stale_timer_message_is_dropped():
+    """Test that a wait timeout posted before a queued state change is not handled after the change."""
+    settings = Settings()
+    settings.wait_timeouts = {'FakeRun': 0}
+    engine = Engine('stale_timer', settings)
+    executor = engine.executor
+    executor._create_states(['FakeRun', 'Waiting', 'Finish', 'Fail'])
+    executor._run_params['current_state'] = 'Waiting'
+    executor._run_params['previous_state'] = 'FakeRun'
+    executor.set_state_event('Finish')
+    executor._prepare_run()
+    time.sleep(0.1)
+    state_message, timeout_message = executor.mailbox.get_nowait(), executor.mailbox.get_nowait()
+    assert timeout_message.kind == 'fail'
+    assert not executor._is_stale(timeout_message)
+    executor._handle_state_event(state_message.target)
+    assert executor.get_current_state == 'Finish'
+    assert executor._is_stale(timeout_message)
+    executor._cancel_timer()
@@ -0,0 +1,54 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Unit tests of the callback token store."""
+import time
+
+import jwt
+
+from lifecycle_manager.utils import token_store
+from lifecycle_manager.utils.token_store import TokenStore
+
+SECRET = "test-secret"
+
+
+def test_issue_validate_revoke():
+    """Test that an issued token validates to its trial ID until it is revoked."""
+    tokens = TokenStore(SECRET, ttl=60, sweep_interval=0)
+    token = tokens.issue("1")
+    assert jwt.decode(token, SECRET, algorithms=['HS256'])["trial_id"] == "1"
+    assert tokens.validate(token) == "1"
+    assert tokens.validate("unknown") is None
+    assert tokens.revoke(token)
+    assert not tokens.revoke(token)
+    assert tokens.validate(token) is None
+    assert tokens.stats() == {"tokens": 0, "expired": 0, "revoked": 1}
+
+
+def test_expiry_and_sweep(monkeypatch):
+    """Test that expired tokens are not valid and are removed by sweep."""
+    tokens = TokenStore(SECRET, ttl=60, sweep_interval=0)
+    expiring = tokens.issue("2")
+    tokens.ttl = 3600
+    valid = tokens.issue("3")
+    now = time.time() + 120
+    monkeypatch.setattr(token_store.time, 'time', lambda: now)
+    assert tokens.validate(expiring) is None
+    assert tokens.sweep() == 1
+    assert len(tokens) == 1
+    assert tokens.validate(valid) == "3"
+    assert tokens.stats()["expired"] == 1
+
+
+def test_add_rejects_invalid_tokens():
+    """Test that recovered tokens are verified: wrong secret and expired tokens are not stored."""
+    tokens = TokenStore(SECRET, sweep_interval=0)
+    forged = jwt.encode({"trial_id": "4"}, "other-secret", "HS256").decode('utf-8')
+    expired = jwt.encode({"trial_id": "4", "exp": int(time.time()) - 10}, SECRET, "HS256").decode('utf-8')
+    legacy = jwt.encode({"trial_id": "4"}, SECRET, "HS256").decode('utf-8')
+    assert tokens.add(forged) is None
+    assert tokens.add(expired) is None
+    assert tokens.add(legacy) == "4"
+    assert len(tokens) == 1
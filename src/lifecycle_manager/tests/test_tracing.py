@@ -0,0 +1,71 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for trial trace spans."""
+import json
+import time
+
+import pytest
+
+from lifecycle_manager.executor.engine import Engine
+from lifecycle_manager.utils.tracing import Tracer, TRACER
+
+
+def test_spans_bounded():
+    """Test that only the latest spans of the latest trials are kept."""
+    tracer = Tracer(spans_per_trial=3, max_trials=2)
+    for index in range(5):
+        tracer.event('1', 'event', index=index)
+    tracer.event('2', 'event')
+    tracer.event('3', 'event')
+    assert [span["attributes"]["index"] for span in tracer.timeline('1')] == []
+    assert tracer.trials() == ['2', '3']
+    tracer = Tracer(spans_per_trial=3)
+    for index in range(5):
+        tracer.event('1', 'event', index=index)
+    assert [span["attributes"]["index"] for span in tracer.timeline('1')] == [2, 3, 4]
+
+
+def test_span_records_error():
+    """Test that a span records the duration and error of the block."""
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        with tracer.span('1', 'state', state='GetTrialInfo'):
+            time.sleep(0.05)
+            raise ValueError('failed')
+    span = tracer.timeline('1')[0]
+    assert span["duration"] >= 0.05
+    assert span["attributes"] == {"state": "GetTrialInfo", "error": "failed"}
+
+
+def test_otlp_export(tmp_path):
+    """Test that spans are exported in the OTLP JSON format."""
+    tracer = Tracer()
+    tracer.record('1', 'http', 1.5, 0.25, service='trial_repository', status='200')
+    with open(tracer.export_otlp('1', str(tmp_path / 'trace.json'))) as trace_file:
+        exported = json.load(trace_file)
+    span = exported["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["name"] == 'http'
+    assert span["startTimeUnixNano"] == '1500000000'
+    assert span["endTimeUnixNano"] == '1750000000'
+    assert {"key": "status", "value": {"stringValue": "200"}} in span["attributes"]
+    assert len(span["traceId"]) == 32
+
+
+def test_executor_trace():
+    """Test that states and waiting for a state change are traced."""
+    engine = Engine('traced', None)
+    engine.executor._create_states(['FakeRun', 'Waiting', 'Finish'])
+    engine.executor._run_params['current_state'] = 'FakeRun'
+    engine.start()
+    engine.set_execute_event()
+    time.sleep(1.5)
+    assert engine.set_executor_state('FakeRun')
+    time.sleep(1.5)
+    engine.set_stop_event()
+    engine.join()
+    timeline = [(span["name"], span["attributes"].get("state")) for span in TRACER.timeline('traced')]
+    assert timeline == [('state', 'FakeRun'), ('wait', None), ('state', 'FakeRun')]
+    assert TRACER.timeline('traced')[1]["attributes"] == {"after": "FakeRun", "resumed": "FakeRun"}
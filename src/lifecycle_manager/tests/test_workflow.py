@@ -0,0 +1,159 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""Tests for declarative trial workflows."""
+import time
+
+import pytest
+
+from lifecycle_manager.config.services import Settings
+from lifecycle_manager.executor.engine import Engine
+from lifecycle_manager.executor.retry import RetryPolicy
+from lifecycle_manager.executor.state_graph import InvalidStateGraph
+from lifecycle_manager.executor.workflow import compile_workflow, get_workflows, select_workflow
+from lifecycle_manager.simulator.app import SimulatorServer
+from lifecycle_manager.simulator.settings import SimulatorSettings
+from lifecycle_manager.tests.dummy_modules import DummyHttpService
+
+
+def test_shipped_workflows_compile():
+    """Test that the workflow files compile and VNF phases are only in the vnf workflow."""
+    workflows = get_workflows(Settings().workflow_dir)
+    assert RetryPolicy.for_state(Settings(), 'SliceDeployment', workflows['default']).max_attempts == 1
+    assert RetryPolicy.for_state(Settings(), 'UpdateStatusIdle', workflows['vnf']).retry_unanswered
+    assert workflows['default'].next_state('UpdateDeploymentSlice', None) == 'EnforceUavPlan'
+    assert workflows['vnf'].forks['UpdateDeploymentSlice'] == ('CloudVnfOnboarding', 'EdgeVnfOnboarding')
+    assert workflows['vnf'].joins['UpdateDeploymentSlice'] == 'Start5GresourceTesting'
+    assert 'CloudVnfOnboarding' not in workflows['default'].states
+    assert workflows['vnf'].allows_request('CloudVnfOnboarding', 'UpdateCloudVnfBoardingStatus')
+    assert workflows['default'].allows_request('SliceDeployment', 'UpdateStatusStopping')
+    assert workflows['default'].start == 'GetCallbackToken'
+
+
+def test_invalid_workflows_rejected():
+    """Test that workflows with unknown or missing states do not compile."""
+    with pytest.raises(InvalidStateGraph):
+        compile_workflow('broken', {"start": "Missing", "states": {"Missing": {"next": "Finish"}}})
+    with pytest.raises(InvalidStateGraph):
+        compile_workflow('broken', {"start": "FakeRun", "states": {"FakeRun": {"next": "GetTrialInfo"}}})
+    with pytest.raises(InvalidStateGraph):
+        compile_workflow('broken', {"start": "FakeRun", "states": {"FakeRun": {}}})
+    with pytest.raises(InvalidStateGraph):
+        compile_workflow('broken', {"start": "FakeRun", "states": {"FakeRun": {"next": "Finish", "retry": "x"}}})
+
+
+def test_workflow_selection():
+    """Test that facility mapping wins over the trial document and disable_vnf selects the default."""
+    settings = Settings()
+    settings.facility_workflows = {"EUR": "vnf"}
+    assert select_workflow(settings, "EUR", "default") == 'vnf'
+    assert select_workflow(settings, "OULU", "vnf") == 'vnf'
+    assert select_workflow(settings, "OULU", "missing") == 'default'
+    settings.disable_vnf = False
+    assert select_workflow(settings, "OULU") == 'vnf'
+
+
+def test_executor_follows_workflow():
+    """Test that the workflow decides the next state, its waits, timeouts and retry policies."""
+    graph = compile_workflow('fake', {
+        "start": "FakeInit",
+        "states": {
+            "FakeInit": {"next": "FakeRun", "retry": {"max_attempts": 4}},
+            "FakeRun": {"next": "Finish", "wait": True, "wait_timeout": 30}
+        }
+    })
+    assert RetryPolicy.for_state(Settings(), 'FakeInit', graph).max_attempts == 4
+    assert graph.wait_timeouts == {'FakeRun': 30}
+    engine = Engine('workflow', Settings())
+    engine.executor._graph = graph
+    engine.executor._states = graph.states
+    engine.executor._complete_run('FakeRun', 0, 'Something')
+    assert engine.executor.get_current_state == 'Waiting'
+    assert graph.allows_request('FakeRun', 'Finish')
+    assert not graph.allows_request('FakeRun', 'FakeInit')
+
+
+def test_fork_and_join():
+    """Test that cloud and edge branches wait for their own callbacks and join before resource testing."""
+    engine = Engine('fork', Settings())
+    executor = engine.executor
+    executor.select_workflow(requested='vnf')
+    executor._complete_run('UpdateDeploymentSlice', 0, 'EnforceUavPlan')
+    assert executor.get_current_state == 'Waiting'
+    assert set(executor._run_params['branches']) == {'CloudVnfOnboarding', 'EdgeVnfOnboarding'}
+    executor._complete_branch('CloudVnfOnboarding', 'CloudVnfOnboarding', 0, 'Waiting')
+    assert executor._waiting_branch('UpdateEdgeVnfBoardingStatus') is None
+    executor._complete_branch('EdgeVnfOnboarding', 'EdgeVnfOnboarding', 0, 'Waiting')
+    executor._handle_state_event('UpdateEdgeVnfBoardingStatus')
+    assert executor._run_params['branches']['EdgeVnfOnboarding']['current'] == 'UpdateEdgeVnfBoardingStatus'
+    assert executor._run_params['branches']['CloudVnfOnboarding']['current'] == 'Waiting'
+    for branch, end in (('CloudVnfOnboarding', 'UpdateCloudVnfDeploymentStatus'),
+                        ('EdgeVnfOnboarding', 'UpdateEdgeVnfDeploymentStatus')):
+        executor._run_params['branches'][branch]['current'] = end
+        executor._complete_branch(branch, end, 0, None)
+    assert executor.get_current_state == 'Start5GresourceTesting'
+    assert executor._run_params['branches'] == {}
+
+
+def test_failed_branch_state_is_retried():
+    """Test that a state failing in a branch is retried by its own policy and named when the trial fails."""
+    settings = Settings()
+    settings.retry_policies = {"CloudVnfOnboarding": {"max_attempts": 2, "base_delay": 60, "retry_unanswered": True}}
+    engine = Engine('fork_retry', settings)
+    executor = engine.executor
+    executor.select_workflow(requested='vnf')
+    executor._complete_run('UpdateDeploymentSlice', 0, 'EnforceUavPlan')
+    pending = len(executor.mailbox)
+    executor._complete_branch('CloudVnfOnboarding', 'CloudVnfOnboarding', 1, None)
+    assert executor._run_params['branches']['CloudVnfOnboarding']['retries'] == 1
+    assert len(executor.mailbox) == pending
+    executor._complete_branch('CloudVnfOnboarding', 'CloudVnfOnboarding', 1, None)
+    assert executor._run_params['failed_state'] == 'CloudVnfOnboarding'
+    executor._handle_fail_event()
+    assert engine.failed
+    assert engine.backup['_run_params']['failed_state'] == 'CloudVnfOnboarding'
+
+
+def test_vnf_workflow_against_simulator():
+    """Test that the VNF states of both branches run against the simulator, are called back and join."""
+    simulator = SimulatorServer(SimulatorSettings(trials=1, status_commands={}, callback_retry_delay=0.05,
+                                                  callback_delay={"distribution": "constant", "value": 0.05}))
+    lcm = DummyHttpService()
+    simulator.start()
+    lcm.start()
+    settings = Settings()
+    for name in ('trial_enforcement', 'trial_repository', 'kpi_monitoring', 'abstraction_layer'):
+        setattr(settings, name, dict(getattr(settings, name), url=simulator.url))
+    settings.kpi_monitoring["auth_url"] = simulator.url + '/monitoring/token'
+    settings.lcm = dict(settings.lcm, url=lcm.url)
+    settings.disable_vnf = False
+    engine = Engine('sim-0', settings)
+    lcm.routes[('POST', '/token/sim-0')] = (200, {"Authorization": "token"})
+    for callback, state in (('slice', 'UpdateDeploymentSlice'),
+                            ('cloudvnfboarding', 'UpdateCloudVnfBoardingStatus'),
+                            ('cloudvnfdeployment', 'UpdateCloudVnfDeploymentStatus'),
+                            ('edgevnfonboarding', 'UpdateEdgeVnfBoardingStatus'),
+                            ('edgevnfdeployment', 'UpdateEdgeVnfDeploymentStatus')):
+        lcm.routes[('POST', '/trial/sim-0/callback/' + callback)] = \
+            lambda handler, state=state: (200, {}) if engine.set_executor_state(state) else (400, {})
+    engine.start()
+    engine.set_execute_event()
+    try:
+        deadline = time.monotonic() + 20
+        while 'UpdateUavPlanStatus' not in engine.get_executor_responses() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        responses = engine.get_executor_responses()
+        assert not engine.failed
+        for state in ('CloudVnfOnboarding', 'CloudVnfDeployment', 'EdgeVnfOnboarding', 'EdgeVnfDeployment'):
+            assert responses[state] == {"status_code": 201}
+        assert responses['Start5GresourceTesting'] == {"status_code": 200}
+        assert engine.executor._run_params['branches'] == {}
+        assert simulator.simulation.stats()["callbacks"]["delivered"] == 5
+    finally:
+        engine.set_stop_event()
+        engine.join()
+        simulator.simulation.callbacks.shutdown()
+        simulator.shutdown()
+        lcm.shutdown()
@@ -0,0 +1,81 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module provides Mailbox class, an ordered and bounded queue of typed messages for a thread.
+
+Example usage:
+mailbox = Mailbox()
+mailbox.put(STATE, 'SendKpiActive')  # From any thread.
+while True:
+    message = mailbox.get()  # Blocking get call.
+    if message.kind == STOP:
+        break
+    if message.kind == STATE:
+        # handle message.target
+"""
+from collections import deque, namedtuple
+from threading import Condition
+
+RUN = 'run'
+STATE = 'state'
+FAIL = 'fail'
+STOP = 'stop'
+BRANCH = 'branch'
+EXECUTE = 'execute'
+
+Message = namedtuple('Message', ['kind', 'target'])
+
+
+class MailboxFull(Exception):
+    """Raised when a message is put to a full mailbox."""
+
+
+class Mailbox:
+    """Ordered, bounded queue of messages.
+
+    Urgent messages are put in front of the queue and are accepted even when the mailbox is full.
+    Coalesced messages are dropped if an identical message is already waiting.
+    notify is called after each accepted message, e.g. to wake up an event loop.
+    """
+
+    def __init__(self, maxsize=32, notify=None):
+        self.maxsize = maxsize
+        self._notify = notify
+        self._queue = deque()
+        self._condition = Condition()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, kind, target=None, urgent=False, coalesce=False):
+        """Put message to the mailbox. Raise MailboxFull if there is no room."""
+        message = Message(kind, target)
+        with self._condition:
+            if coalesce and message in self._queue:
+                return
+            if urgent:
+                self._queue.appendleft(message)
+            elif len(self._queue) >= self.maxsize:
+                raise MailboxFull("Mailbox full, dropped: {}".format(message))
+            else:
+                self._queue.append(message)
+            self._condition.notify()
+        if self._notify is not None:
+            self._notify()
+
+    def get(self, timeout=None):
+        """Remove and return the next message. Block until one is available. Return None on timeout."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queue, timeout):
+                return None
+            return self._queue.popleft()
+
+    def get_nowait(self):
+        """Remove and return the next message or None if the mailbox is empty."""
+        with self._condition:
+            if self._queue:
+                return self._queue.popleft()
+            return None
@@ -0,0 +1,127 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module provides histograms and gauges rendered in the Prometheus text format.
+
+Example usage:
+STATE_DURATION.observe(0.25, 'GetTrialInfo')
+REGISTRY.render()  # Text for the /metrics route.
+
+Observing takes a lock and a bisect, so instrumented code can call it on every state and request.
+"""
+from bisect import bisect_left
+from threading import Lock
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels(names, values, extra=()):
+    """Return label set string {name="value",...}."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for name, value in pairs) + '}'
+
+
+def _number(value):
+    """Format number for the text format."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Histogram with label values given on observe."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value, *labelvalues):
+        """Add observation value for the label values."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        """Return lines of the histogram in the text format."""
+        with self._lock:
+            series = [(labelvalues, list(counts), total) for labelvalues, (counts, total) in self._series.items()]
+        lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} histogram'.format(self.name)]
+        for labelvalues, counts, total in sorted(series, key=lambda item: item[0]):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, _labels(self.labelnames, labelvalues, [('le', _number(bound))]), cumulative))
+            lines.append('{}_sum{} {}'.format(self.name, _labels(self.labelnames, labelvalues), _number(total)))
+            lines.append('{}_count{} {}'.format(self.name, _labels(self.labelnames, labelvalues), cumulative))
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback when rendered. callback() returns {labelvalues tuple: value}."""
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self):
+        """Return lines of the gauge in the text format."""
+        lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} gauge'.format(self.name)]
+        if self.callback is not None:
+            for labelvalues, value in sorted(self.callback().items()):
+                lines.append('{}{} {}'.format(self.name, _labels(self.labelnames, labelvalues), _number(value)))
+        return lines
+
+
+class Registry:
+    """Collection of metrics."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add metric. Return the metric."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        """Return metric by name."""
+        return self._metrics[name]
+
+    def render(self):
+        """Return all metrics in the text format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+STATE_DURATION = REGISTRY.register(Histogram(
+    'lcm_state_duration_seconds', 'Time spent running an executor state.', ('state',)))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    'lcm_http_request_duration_seconds', 'Latency of requests to downstream services.',
+    ('service', 'method', 'status')))
+RATE_LIMIT_WAIT = REGISTRY.register(Histogram(
+    'lcm_rate_limit_wait_seconds', 'Time requests to downstream services waited for the rate limiter.',
+    ('service', 'endpoint'), buckets=(0.0, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)))
+SCHEDULER_LAG = REGISTRY.register(Histogram(
+    'lcm_scheduler_lag_seconds', 'Delay from the scheduled run date of a trial to the start of its engine.',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)))
@@ -0,0 +1,92 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module provides TimerService class, one thread running delayed callbacks of all executors.
+
+Example usage:
+timer = get_timer_service().call_later(2, executor.set_run_event)
+timer.cancel()  # If the callback is not needed anymore.
+
+Callbacks are run in the timer thread one after another, so they must be short, e.g. posting a message to a mailbox.
+"""
+import heapq
+import itertools
+import logging
+import time
+from threading import Condition, Lock, Thread
+
+_TIMER_SERVICE = None
+_TIMER_SERVICE_LOCK = Lock()
+
+
+class TimerHandle:
+    """Scheduled callback."""
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancel the callback if it has not run yet."""
+        self.cancelled = True
+
+
+class TimerService(Thread):
+    """Heap of timers served by one thread."""
+
+    def __init__(self):
+        super().__init__(name='timer-service', daemon=True)
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = Condition()
+        self.start()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def call_later(self, delay, callback, *args):
+        """Run callback(*args) after delay seconds. Return TimerHandle."""
+        timer = TimerHandle(time.monotonic() + max(delay, 0), callback, args)
+        with self._condition:
+            heapq.heappush(self._heap, (timer.deadline, next(self._counter), timer))
+            if self._heap[0][2] is timer:
+                self._condition.notify()
+        return timer
+
+    def run(self):
+        """Run callbacks when they are due."""
+        while True:
+            with self._condition:
+                timer = self._next_due()
+            if not timer.cancelled:
+                try:
+                    timer.callback(*timer.args)
+                except Exception as _err:
+                    logging.getLogger('__executor__').error("Timer callback failed: %s", str(_err))
+
+    def _next_due(self):
+        """Wait for and remove the next due timer. Called with condition held."""
+        while True:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._condition.wait()
+                continue
+            timeout = self._heap[0][0] - time.monotonic()
+            if timeout <= 0:
+                return heapq.heappop(self._heap)[2]
+            self._condition.wait(timeout)
+
+
+def get_timer_service():
+    """Return the process wide timer service."""
+    global _TIMER_SERVICE  # pylint: disable=W0603
+    with _TIMER_SERVICE_LOCK:
+        if _TIMER_SERVICE is None:
+            _TIMER_SERVICE = TimerService()
+        return _TIMER_SERVICE
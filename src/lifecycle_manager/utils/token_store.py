@@ -0,0 +1,125 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module provides TokenStore class, the callback tokens accepted by LCM and the trial IDs they were issued for.
+
+Example usage:
+tokens = TokenStore(SECRET, ttl=3600)
+token = tokens.issue(trial_id)  # JWT with trial_id and exp claims.
+tokens.validate(token)  # Trial ID, or None for an unknown, revoked or expired token.
+tokens.revoke(token)
+
+A token is verified once, when it is issued or added, and validation is a dict lookup without decoding the JWT.
+Expired tokens are removed every sweep_interval seconds by the timer service.
+"""
+import heapq
+import logging
+import time
+from threading import Lock
+
+import jwt
+
+from lifecycle_manager.utils.timer_service import get_timer_service
+
+
+class TokenStore:
+    """Callback tokens by value, with their trial IDs and expiry times. Thread safe."""
+
+    def __init__(self, secret, ttl=0, sweep_interval=60):
+        self.secret = secret
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._tokens = {}
+        self._expiry = []
+        self._expired = 0
+        self._revoked = 0
+        self._lock = Lock()
+        self._timer = None
+        if sweep_interval:
+            self._timer = get_timer_service().call_later(sweep_interval, self._sweep_periodically)
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __contains__(self, token):
+        return self.validate(token) is not None
+
+    def issue(self, trial_id):
+        """Create and store token for the callbacks of trial ID. Return token."""
+        claims = {"trial_id": trial_id}
+        expires_at = None
+        if self.ttl:
+            expires_at = int(time.time()) + self.ttl
+            claims["exp"] = expires_at
+        token = jwt.encode(claims, self.secret, "HS256").decode('utf-8')
+        self._store(token, str(trial_id), expires_at)
+        return token
+
+    def add(self, token):
+        """Verify and store a token issued before, e.g. by the previous run. Return its trial ID or None if invalid."""
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=['HS256'])
+        except jwt.InvalidTokenError as _err:
+            logging.getLogger('__executor__').warning("Callback token not accepted: %s", str(_err))
+            return None
+        trial_id = str(claims["trial_id"])
+        self._store(token, trial_id, claims.get("exp"))
+        return trial_id
+
+    def validate(self, token):
+        """Return trial ID of token, or None if the token is unknown, revoked or expired."""
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        trial_id, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return trial_id
+
+    def revoke(self, token):
+        """Remove token. Return False if it was not stored."""
+        with self._lock:
+            if self._tokens.pop(token, None) is None:
+                return False
+            self._revoked += 1
+            return True
+
+    def sweep(self):
+        """Remove expired tokens. Return number of removed tokens."""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, token = heapq.heappop(self._expiry)
+                entry = self._tokens.get(token)
+                if entry is not None and entry[1] == expires_at:
+                    del self._tokens[token]
+                    removed += 1
+            self._expired += removed
+        return removed
+
+    def stats(self):
+        """Return number of stored, expired and revoked tokens."""
+        return {"tokens": len(self._tokens), "expired": self._expired, "revoked": self._revoked}
+
+    def close(self):
+        """Stop sweeping."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _store(self, token, trial_id, expires_at):
+        """Store token of trial ID expiring at expires_at, None for never."""
+        with self._lock:
+            self._tokens[token] = (trial_id, expires_at)
+            if expires_at is not None:
+                heapq.heappush(self._expiry, (expires_at, token))
+
+    def _sweep_periodically(self):
+        """Sweep and schedule the next sweep. Run in the timer thread."""
+        self.sweep()
+        if self._timer is not None:
+            self._timer = get_timer_service().call_later(self.sweep_interval, self._sweep_periodically)
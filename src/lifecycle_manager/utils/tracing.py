@@ -0,0 +1,109 @@
+# © 2021 Nokia
+#
+# Licensed under the Apache license 2.0
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module provides Tracer class, recording spans of each trial into bounded ring buffers.
+
+Example usage:
+with TRACER.span(trial_id, 'state', state='GetTrialInfo') as attributes:
+    attributes['result'] = run_state()
+TRACER.timeline(trial_id)  # Spans of the trial, oldest first.
+
+Recording a span is a deque append under a lock, cheap enough to leave on in production.
+"""
+import hashlib
+import json
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from threading import Lock
+
+
+class Tracer:
+    """Spans by trial. Each trial keeps its latest spans_per_trial spans and at most max_trials trials are kept."""
+
+    def __init__(self, spans_per_trial=512, max_trials=1000, enabled=True):
+        self.spans_per_trial = spans_per_trial
+        self.max_trials = max_trials
+        self.enabled = enabled
+        self._trials = OrderedDict()
+        self._lock = Lock()
+
+    def record(self, trial_id, name, start, duration, **attributes):
+        """Record span that started at start (epoch seconds) and lasted duration seconds."""
+        if not self.enabled or trial_id is None:
+            return
+        span = {"name": name, "start": start, "duration": duration, "attributes": attributes}
+        trial_id = str(trial_id)
+        with self._lock:
+            spans = self._trials.get(trial_id)
+            if spans is None:
+                spans = self._trials[trial_id] = deque(maxlen=self.spans_per_trial)
+                if len(self._trials) > self.max_trials:
+                    self._trials.popitem(last=False)
+            spans.append(span)
+
+    def event(self, trial_id, name, **attributes):
+        """Record span without duration."""
+        self.record(trial_id, name, time.time(), 0.0, **attributes)
+
+    @contextmanager
+    def span(self, trial_id, name, **attributes):
+        """Record span around the with block. The yielded dict can be updated with more attributes."""
+        start = time.time()
+        started = time.monotonic()
+        try:
+            yield attributes
+        except Exception as _err:
+            attributes['error'] = str(_err)
+            raise
+        finally:
+            self.record(trial_id, name, start, time.monotonic() - started, **attributes)
+
+    def timeline(self, trial_id):
+        """Return spans of trial, oldest first."""
+        with self._lock:
+            return [dict(span) for span in self._trials.get(str(trial_id), ())]
+
+    def trials(self):
+        """Return IDs of traced trials."""
+        with self._lock:
+            return list(self._trials)
+
+    def to_otlp(self, trial_id, service_name='lifecycle_manager'):
+        """Return spans of trial in the OTLP JSON format. The trace ID is derived from the trial ID."""
+        trace_id = hashlib.md5(str(trial_id).encode()).hexdigest()
+        spans = []
+        for span in self.timeline(trial_id):
+            start = int(span["start"] * 1e9)
+            spans.append({
+                "traceId": trace_id,
+                "spanId": '{:016x}'.format(random.getrandbits(64)),
+                "name": span["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(start),
+                "endTimeUnixNano": str(start + int(span["duration"] * 1e9)),
+                "attributes": [{"key": key, "value": {"stringValue": str(value)}}
+                               for key, value in span["attributes"].items()]
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}},
+                                        {"key": "trial.id", "value": {"stringValue": str(trial_id)}}]},
+            "scopeSpans": [{"scope": {"name": "lifecycle_manager"}, "spans": spans}]
+        }]}
+
+    def export_otlp(self, trial_id, path):
+        """Write spans of trial to path in the OTLP JSON format. Return path."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as trace_file:
+            json.dump(self.to_otlp(trial_id), trace_file)
+        return path
+
+
+TRACER = Tracer()